@@ -0,0 +1,74 @@
+"""
+Условные GET-запросы по ETag.
+
+ETag строится из дешёвых маркеров версии (ревизия и updated_at опроса,
+прогресс сессии, строки страницы), поэтому совпавший If-None-Match
+получает 304 без сериализации ответа.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+
+from apps.core.compression import encoded_etag
+
+# Ответы зависят от пользователя, а тело может быть сжато
+VARY_HEADERS = ("Authorization", "Cookie", "Accept-Encoding")
+
+
+def make_etag(*parts):
+    """Сильный ETag по значениям маркеров версии."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def matching_etag(request, etag):
+    """
+    Тег из If-None-Match, совпавший с etag при слабом сравнении (RFC 9110).
+
+    Тег сжатого представления (в том числе ослабленный middleware сжатия)
+    считается той же версией ресурса. Возвращает None, если совпадения нет.
+    """
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return None
+    opaque = etag.strip('"')
+    for candidate in parse_etags(header):
+        if candidate == "*":
+            return etag
+        if candidate.removeprefix("W/").strip('"').split("-", 1)[0] == opaque:
+            return candidate
+    return None
+
+
+def cache_control(kind):
+    """Параметры Cache-Control из HTTP_CACHING для вида ответа (имени действия)."""
+    return settings.HTTP_CACHING.get(kind.upper(), {})
+
+
+def with_cache_headers(response, etag, kind):
+    """Добавляет к ответу ETag, Cache-Control и Vary."""
+    if etag is not None and not response.has_header("ETag"):
+        if response.get("Content-Encoding"):
+            etag = encoded_etag(etag, response["Content-Encoding"])
+        response["ETag"] = etag
+    patch_cache_control(response, **cache_control(kind))
+    patch_vary_headers(response, VARY_HEADERS)
+    return response
+
+
+def not_modified(request, etag, kind):
+    """
+    Ответ 304, если клиент прислал текущий ETag, иначе None.
+
+    В 304 возвращается тег клиента: он мог получить сжатое представление.
+    """
+    matched = matching_etag(request, etag)
+    if matched is None:
+        return None
+    response = HttpResponseNotModified()
+    response["ETag"] = matched
+    return with_cache_headers(response, etag, kind)
@@ -0,0 +1,333 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import LiveServerTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from apps.core.slow_queries import SlowQueryLog, slow_query_log
+from apps.surveys.models import AnswerOption, Question, Survey
+
+User = get_user_model()
+
+SLOW_QUERY_LOG = {
+    "ENABLED": True,
+    "THRESHOLD_MS": 0,
+    "BUFFER_SIZE": 200,
+    "EXPLAIN_SAMPLE_RATE": 1,
+    "EXPLAIN_PER_MINUTE": 1000,
+    "STACK_DEPTH": 15,
+}
+
+
+@override_settings(SLOW_QUERY_LOG=SLOW_QUERY_LOG)
+class SlowQueryLogTestCase(APITestCase):
+    """Тесты журнала медленных запросов и его эндпоинта."""
+
+    def setUp(self):
+        self.url = reverse("slow-queries")
+        self.admin = User.objects.create_user(
+            username="admin", password="testpass123", is_staff=True
+        )
+        self.author = User.objects.create_user(
+            username="author", password="testpass123", is_author=True
+        )
+        self.survey = Survey.objects.create(title="Опрос", author=self.author)
+        question = Question.objects.create(survey=self.survey, text="Вопрос", order=1)
+        AnswerOption.objects.create(question=question, text="Да", order=1)
+        slow_query_log.clear()
+        self.addCleanup(slow_query_log.clear)
+
+    def slow_queries(self, **params):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["results"]
+
+    def test_records_query_with_plan_and_usecase(self):
+        """Тест: запрос сохраняется с планом, отпечатком параметров и сценарием."""
+        self.client.force_authenticate(user=self.author)
+        self.client.get(reverse("survey-statistics", args=[self.survey.id]))
+
+        records = self.slow_queries()
+
+        statistics = [
+            record
+            for record in records
+            if record["usecase"] == "get_statistics.execute"
+        ]
+        self.assertTrue(statistics)
+        record = statistics[0]
+        self.assertIn("SELECT", record["sql"])
+        self.assertEqual(len(record["params_fingerprint"]), 12)
+        self.assertTrue(record["plan"])
+        self.assertTrue(
+            any(
+                "apps/surveys/usecases/get_statistics.py" in frame
+                for frame in record["stack"]
+            )
+        )
+
+    def test_detects_full_table_scan(self):
+        """Тест: полное сканирование таблицы отмечается и фильтруется."""
+        self.admin.is_superuser = True
+        self.admin.save(update_fields=["is_superuser"])
+        self.client.force_login(self.admin)
+        # Поиск по подстроке в админке не может использовать индекс по title
+        self.client.get(reverse("admin:surveys_survey_changelist"), {"q": "Опрос"})
+
+        records = self.slow_queries(full_scan="true")
+
+        self.assertTrue(records)
+        for record in records:
+            self.assertTrue(record["full_scans"])
+
+    @override_settings(SLOW_QUERY_LOG={**SLOW_QUERY_LOG, "EXPLAIN_PER_MINUTE": 1})
+    def test_explain_is_rate_limited(self):
+        """Тест: EXPLAIN выполняется не чаще заданного лимита."""
+        self.client.force_authenticate(user=self.author)
+        self.client.get(reverse("survey-statistics", args=[self.survey.id]))
+
+        records = self.slow_queries()
+
+        self.assertGreater(len(records), 1)
+        self.assertEqual(len([record for record in records if record["plan"]]), 1)
+
+    @override_settings(SLOW_QUERY_LOG={**SLOW_QUERY_LOG, "THRESHOLD_MS": 60000})
+    def test_fast_queries_are_not_recorded(self):
+        """Тест: запросы быстрее порога не записываются."""
+        self.client.force_authenticate(user=self.author)
+        self.client.get(reverse("survey-list"))
+
+        self.assertEqual(self.slow_queries(), [])
+
+    def test_requires_admin(self):
+        """Тест: журнал доступен только администраторам."""
+        self.client.force_authenticate(user=self.author)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_clear(self):
+        """Тест: DELETE очищает журнал."""
+        self.client.force_authenticate(user=self.author)
+        self.client.get(reverse("survey-list"))
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.delete(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(slow_query_log.snapshot(), [])
+
+    def test_log_is_shared_between_processes(self):
+        """Тест: записи других воркеров видны в журнале, размер ограничен."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        log = SlowQueryLog(os.path.join(directory, "slow.jsonl"), size=3)
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                log.add({"sql": "child"})
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        for index in range(6):
+            log.add({"sql": f"parent {index}"})
+
+        self.assertEqual(
+            [record["sql"] for record in log.snapshot()],
+            ["parent 5", "parent 4", "parent 3"],
+        )
+        with open(os.path.join(directory, "slow.jsonl")) as lines:
+            self.assertLessEqual(len(lines.readlines()), 6)
+
+        log.clear()
+        self.assertEqual(log.snapshot(), [])
+
+
+class TrafficCaptureTestCase(APITestCase):
+    """Тесты записи обезличенного трафика и его воспроизведения."""
+
+    def setUp(self):
+        self.capture_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.capture_dir)
+        self.author = User.objects.create_user(
+            username="author", password="testpass123", is_author=True
+        )
+        self.survey = Survey.objects.create(title="Опрос", author=self.author)
+        self.question = Question.objects.create(
+            survey=self.survey, text="Вопрос", order=1
+        )
+        self.option = AnswerOption.objects.create(
+            question=self.question, text="Да", order=1
+        )
+
+    def capture(self):
+        return override_settings(
+            TRAFFIC_CAPTURE={
+                "ENABLED": True,
+                "DIR": self.capture_dir,
+                "SAMPLE_RATE": 1,
+                "PATH_PREFIX": "/api/",
+            }
+        )
+
+    def captured(self):
+        records = []
+        for name in os.listdir(self.capture_dir):
+            with open(os.path.join(self.capture_dir, name)) as capture:
+                records.extend(json.loads(line) for line in capture)
+        return records
+
+    def test_capture_is_anonymized(self):
+        """Тест: в записи нет токенов, паролей, имён и текстов пользователя."""
+        with self.capture():
+            self.client.post(
+                reverse("auth-register"),
+                {
+                    "username": "respondent",
+                    "email": "respondent@example.com",
+                    "password": "secret-pass-1",
+                    "password_confirm": "secret-pass-1",
+                },
+                format="json",
+            )
+            response = self.client.post(
+                reverse("auth-login"),
+                {"username": "respondent", "password": "secret-pass-1"},
+                format="json",
+            )
+            token = response.data["token"]
+            self.client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+            self.client.post(
+                reverse("survey-submit-answer", args=[self.survey.id]),
+                {"question_id": self.question.id, "answer_option_id": self.option.id},
+                format="json",
+            )
+
+        with open(os.path.join(self.capture_dir, os.listdir(self.capture_dir)[0])) as f:
+            raw = f.read()
+        for secret in ("respondent", "secret-pass-1", token):
+            self.assertNotIn(secret, raw)
+
+        register, login, submit = self.captured()
+        self.assertEqual(register["endpoint"], "auth-register")
+        self.assertEqual(register["body"]["password"], "<credential>")
+        self.assertEqual(register["body"]["email"], "<email>")
+        self.assertEqual(login["body"]["username"], register["body"]["username"])
+        self.assertEqual(submit["user"], login["user"])
+        self.assertEqual(submit["endpoint"], "survey-submit-answer")
+        self.assertEqual(
+            submit["body"],
+            {"question_id": self.question.id, "answer_option_id": self.option.id},
+        )
+        self.assertEqual(submit["status"], 201)
+        self.assertIn("duration_ms", submit)
+
+
+class ReplayTrafficCommandTestCase(LiveServerTestCase):
+    """Тесты команды replay_traffic против запущенного сервера."""
+
+    def test_replay_reports_endpoints(self):
+        """Тест: записанный трафик воспроизводится, отчёт содержит перцентили."""
+        capture_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, capture_dir)
+        author = User.objects.create_user(
+            username="author", password="testpass123", is_author=True
+        )
+        survey = Survey.objects.create(title="Опрос", author=author)
+        question = Question.objects.create(survey=survey, text="Вопрос", order=1)
+        option = AnswerOption.objects.create(question=question, text="Да", order=1)
+
+        client = APIClient()
+        with override_settings(
+            TRAFFIC_CAPTURE={
+                "ENABLED": True,
+                "DIR": capture_dir,
+                "SAMPLE_RATE": 1,
+                "PATH_PREFIX": "/api/",
+            }
+        ):
+            client.post(
+                reverse("auth-register"),
+                {
+                    "username": "respondent",
+                    "password": "secret-pass-1",
+                    "password_confirm": "secret-pass-1",
+                },
+                format="json",
+            )
+            client.force_authenticate(user=author)
+            client.get(reverse("survey-list"))
+            client.get(reverse("survey-statistics", args=[survey.id]))
+            respondent = User.objects.get(username="respondent")
+            client.force_authenticate(user=respondent)
+            client.get(reverse("survey-next-question", args=[survey.id]))
+            client.post(
+                reverse("survey-submit-answer", args=[survey.id]),
+                {"question_id": question.id, "answer_option_id": option.id},
+                format="json",
+            )
+
+        output = os.path.join(capture_dir, "report.json")
+        call_command(
+            "replay_traffic",
+            capture_dir,
+            base_url=self.live_server_url,
+            concurrency=2,
+            speed=0,
+            output=output,
+            stdout=StringIO(),
+        )
+
+        with open(output) as report_file:
+            report = json.load(report_file)
+        self.assertEqual(report["requests"], 5)
+        self.assertEqual(
+            set(report["endpoints"]),
+            {
+                "auth-register",
+                "survey-list",
+                "survey-statistics",
+                "survey-next-question",
+                "survey-submit-answer",
+            },
+        )
+        for name, result in report["endpoints"].items():
+            self.assertEqual(result["errors"], 0, name)
+            self.assertEqual(result["status_mismatches"], 0, name)
+            self.assertGreater(result["p95_ms"], 0)
+
+    def test_replay_keeps_local_passwords_without_reset(self):
+        """Тест: пароли найденных локальных пользователей меняются только с --reset-passwords."""
+        capture_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, capture_dir)
+        author = User.objects.create_user(
+            username="author", password="testpass123", is_author=True
+        )
+        client = APIClient()
+        client.force_authenticate(user=author)
+        with override_settings(
+            TRAFFIC_CAPTURE={
+                "ENABLED": True,
+                "DIR": capture_dir,
+                "SAMPLE_RATE": 1,
+                "PATH_PREFIX": "/api/",
+            }
+        ):
+            client.get(reverse("survey-list"))
+
+        options = {"base_url": self.live_server_url, "speed": 0, "stdout": StringIO()}
+        call_command("replay_traffic", capture_dir, **options)
+        author.refresh_from_db()
+        self.assertTrue(author.check_password("testpass123"))
+
+        call_command("replay_traffic", capture_dir, reset_passwords=True, **options)
+        author.refresh_from_db()
+        self.assertTrue(author.check_password("password123"))
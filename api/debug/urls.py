@@ -0,0 +1,11 @@
+from django.urls import path
+
+from .views import SlowQueryViewSet
+
+urlpatterns = [
+    path(
+        "slow-queries/",
+        SlowQueryViewSet.as_view({"get": "list", "delete": "delete"}),
+        name="slow-queries",
+    ),
+]
@@ -0,0 +1,29 @@
+from rest_framework import status, viewsets
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from apps.core.slow_queries import slow_query_log
+
+
+class SlowQueryViewSet(viewsets.ViewSet):
+    """
+    Журнал медленных SQL-запросов всех воркеров (только для администраторов).
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def list(self, request):
+        """
+        Записи от новых к старым; ?full_scan=true - только с полным сканированием таблиц.
+        """
+        records = slow_query_log.snapshot()
+        if request.query_params.get("full_scan") == "true":
+            records = [record for record in records if record["full_scans"]]
+        return Response({"count": len(records), "results": records})
+
+    def delete(self, request):
+        """
+        Очищает журнал.
+        """
+        slow_query_log.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,172 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def parse_paths(value):
+    """
+    Разбирает список путей через запятую в дерево.
+
+    "id,questions.text,questions.answer_options" превращается в
+    {"id": {}, "questions": {"text": {}, "answer_options": {}}}.
+    """
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Сериализатор, выводящий только запрошенные поля.
+
+    Поля из expandable_fields (вложенные связи) выводятся, только если они
+    раскрыты через expand или явно перечислены в fields; default_expand
+    задаёт раскрытие, когда клиент его не указал.
+    """
+
+    expandable_fields = ()
+    default_expand = ()
+
+    def restrict(self, fields=None, expand=None, prefix=""):
+        """Оставляет поля по деревьям fields и expand (None - по умолчанию)."""
+        if expand is None:
+            expand = parse_paths(",".join(self.default_expand))
+
+        unknown_fields = set(fields or ()) - self.fields.keys()
+        if unknown_fields:
+            raise serializers.ValidationError(
+                {"fields": unknown_message(prefix, unknown_fields)}
+            )
+        unknown_expand = expand.keys() - set(self.expandable_fields)
+        if unknown_expand:
+            raise serializers.ValidationError(
+                {"expand": unknown_message(prefix, unknown_expand)}
+            )
+
+        for name in list(self.fields):
+            if fields is not None and name not in fields:
+                self.fields.pop(name)
+            elif name in self.expandable_fields and name not in expand:
+                if fields is None or name not in fields:
+                    self.fields.pop(name)
+
+        for name, field in self.fields.items():
+            nested = getattr(field, "child", field)
+            if isinstance(nested, SparseFieldsetSerializerMixin):
+                # Пустое поддерево в fields означает все поля вложенного объекта
+                nested.restrict(
+                    (fields or {}).get(name) or None,
+                    expand.get(name, {}),
+                    f"{prefix}{name}.",
+                )
+
+
+def unknown_message(prefix, names):
+    return "Неизвестные поля: " + ", ".join(prefix + name for name in sorted(names))
+
+
+def optimize_queryset(queryset, serializer, required=()):
+    """
+    Загружает только то, что выведет сериализатор.
+
+    Колонки ограничиваются через only(), связи по внешнему ключу
+    подключаются select_related, вложенные списки - Prefetch с собственным
+    only(). Если источник поля нельзя свести к колонкам модели (методы,
+    свойства), only() не применяется, чтобы не получить запрос на объект.
+    """
+    model = queryset.model
+    columns = {model._meta.pk.name, *required}
+    related = set()
+    prefetches = []
+    restrictable = True
+
+    for field in serializer.fields.values():
+        if isinstance(field, serializers.ListSerializer):
+            relation = model._meta.get_field(field.source)
+            child_queryset = optimize_queryset(
+                relation.related_model._default_manager.all(),
+                field.child,
+                # Внешний ключ нужен, чтобы разложить строки по родителям
+                required=[relation.field.name],
+            )
+            prefetches.append(Prefetch(field.source, queryset=child_queryset))
+            continue
+        if isinstance(field, serializers.BaseSerializer) or field.source == "*":
+            restrictable = False
+            continue
+
+        attrs = field.source_attrs
+        model_field = concrete_field(model, attrs[0])
+        if model_field is None:
+            restrictable = False
+        elif len(attrs) == 1:
+            columns.add(attrs[0])
+        elif (
+            len(attrs) == 2
+            and model_field.is_relation
+            and concrete_field(model_field.related_model, attrs[1]) is not None
+        ):
+            related.add(attrs[0])
+            columns.update([attrs[0], "__".join(attrs)])
+        else:
+            restrictable = False
+
+    if related:
+        queryset = queryset.select_related(*related)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    if restrictable:
+        queryset = queryset.only(*columns)
+    return queryset
+
+
+def concrete_field(model, name):
+    """Возвращает поле модели с колонкой в её таблице или None."""
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    return field if field.concrete else None
+
+
+class SparseFieldsetViewMixin:
+    """
+    Поддержка ?fields= и ?expand= для действий из sparse_actions.
+
+    По запрошенным полям строится и сериализатор, и queryset: лишние
+    колонки, JOIN и prefetch-запросы не выполняются.
+    """
+
+    sparse_actions = ("list", "retrieve")
+    fields_query_param = "fields"
+    expand_query_param = "expand"
+    # Колонки, которые нужны представлению помимо выводимых полей
+    sparse_required_fields = ()
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if self.action in self.sparse_actions:
+            self.restrict_serializer(getattr(serializer, "child", serializer))
+        return serializer
+
+    def restrict_serializer(self, serializer):
+        params = self.request.query_params
+        fields = params.get(self.fields_query_param)
+        expand = params.get(self.expand_query_param)
+        # Пустой ?fields= равнозначен его отсутствию, пустой ?expand= -
+        # отказ от раскрытия по умолчанию
+        serializer.restrict(
+            parse_paths(fields) if fields else None,
+            parse_paths(expand) if expand is not None else None,
+        )
+        return serializer
+
+    def optimize_queryset(self, queryset):
+        if self.action not in self.sparse_actions:
+            return queryset
+        serializer = self.restrict_serializer(self.get_serializer_class()())
+        return optimize_queryset(queryset, serializer, self.sparse_required_fields)
@@ -0,0 +1,120 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная пагинация по (created_at, id) в порядке убывания.
+
+    Следующая страница выбирается условием по последней строке предыдущей,
+    а не OFFSET, поэтому глубина страницы не влияет на время запроса, а
+    COUNT(*) не выполняется. С ?count=approximate ответ содержит оценку
+    общего числа строк из статистики планировщика PostgreSQL (на других
+    СУБД - точный COUNT).
+    """
+
+    page_size = 100
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    count_query_param = "count"
+    invalid_cursor_message = "Некорректный курсор."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            created_at, pk = position
+            # created_at <= X позволяет использовать индекс по created_at
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk),
+                created_at__lte=created_at,
+            )
+
+        self.approximate_count = None
+        if request.query_params.get(self.count_query_param) == "approximate":
+            self.approximate_count = self.estimate_count(queryset)
+
+        # Лишняя строка показывает, есть ли следующая страница
+        results = list(queryset.order_by("-created_at", "-pk")[: self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        results = results[: self.page_size]
+        self.last = results[-1] if results else None
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (binascii.Error, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def encode_cursor(self, instance):
+        position = json.dumps([instance.created_at.isoformat(), instance.pk])
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def estimate_count(self, queryset):
+        """Оценка числа строк без COUNT(*): строки верхнего узла плана."""
+        queryset = queryset.order_by()
+        if connections[queryset.db].vendor != "postgresql":
+            return queryset.count()
+        plan = json.loads(queryset.explain(format="json"))
+        # psycopg разбирает JSON сам, и Django отдаёт объект без обёртки-списка
+        if isinstance(plan, list):
+            plan = plan[0]
+        return int(plan["Plan"]["Plan Rows"])
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.last)
+        )
+
+    def get_first_link(self):
+        return remove_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param
+        )
+
+    def get_paginated_response(self, data):
+        fields = [("next", self.get_next_link()), ("first", self.get_first_link())]
+        if self.approximate_count is not None:
+            fields.append(("approximate_count", self.approximate_count))
+        fields.append(("results", data))
+        return Response(OrderedDict(fields))
+
+    def get_paginated_response_schema(self, schema):
+        properties = {
+            "next": {"type": "string", "nullable": True, "format": "uri"},
+            "first": {"type": "string", "format": "uri"},
+            "approximate_count": {"type": "integer"},
+            "results": schema,
+        }
+        return {"type": "object", "required": ["results"], "properties": properties}
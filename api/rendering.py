@@ -0,0 +1,330 @@
+from collections import OrderedDict
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.shortcuts import get_object_or_404
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from api.conditional import make_etag, not_modified, with_cache_headers
+from api.fieldsets import SparseFieldsetSerializerMixin, parse_paths
+from apps.core.profiling import timed_serialization
+
+# Поля, представление которых совпадает со значением из базы
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+)
+
+
+class RowRenderer:
+    """
+    Построитель словарей ответа, скомпилированный по сериализатору.
+
+    Для каждого поля заранее вычисляются путь в values_list() и функция
+    преобразования, поэтому строка превращается в словарь без создания
+    моделей и экземпляров сериализаторов. Результат совпадает с
+    serializer.data: те же ключи в том же порядке и те же значения.
+    """
+
+    def __init__(self, model, columns, nested):
+        self.model = model
+        # (ключ, путь в values_list, преобразование или None)
+        self.columns = columns
+        # (ключ, связь, имя внешнего ключа, вложенный построитель)
+        self.nested = nested
+        self.lookups = [lookup for _, lookup, _ in columns if lookup is not None]
+        self.getters = [
+            attrgetter(lookup.replace("__", ".")) if lookup else None
+            for _, lookup, _ in columns
+        ]
+
+    @classmethod
+    def compile(cls, serializer):
+        """Возвращает построитель или None, если поле нельзя свести к колонкам."""
+        model = serializer.Meta.model
+        columns = []
+        nested = []
+        for key, field in serializer.fields.items():
+            if isinstance(field, serializers.ListSerializer):
+                try:
+                    relation = model._meta.get_field(field.source)
+                except FieldDoesNotExist:
+                    return None
+                child = cls.compile(field.child)
+                if child is None or not relation.one_to_many:
+                    return None
+                nested.append((key, field.source, relation.field.name, child))
+                columns.append((key, None, None))
+                continue
+            if isinstance(field, serializers.BaseSerializer) or field.source == "*":
+                return None
+
+            lookup = column_lookup(model, field.source_attrs)
+            if lookup is None:
+                return None
+            if isinstance(field, PLAIN_FIELDS) or (
+                isinstance(field, serializers.PrimaryKeyRelatedField)
+                and field.pk_field is None
+            ):
+                convert = None
+            else:
+                convert = field.to_representation
+            columns.append((key, lookup, convert))
+        return cls(model, columns, nested)
+
+    def values(self, queryset, required=()):
+        """values_list() с колонками построителя и дополнительными полями."""
+        lookups = self.lookups + [
+            lookup for lookup in (*required, "pk") if lookup not in self.lookups
+        ]
+        return queryset.values_list(*lookups, named=True)
+
+    @timed_serialization
+    def render_rows(self, rows):
+        """Строит словари для строк values(); вложенные списки - запросом на уровень."""
+        children = {
+            key: self.load_children(relation, foreign_key, child, rows)
+            for key, relation, foreign_key, child in self.nested
+        }
+        return [self.build(row, children) for row in rows]
+
+    def render_row(self, row):
+        return self.render_rows([row])[0]
+
+    def build(self, row, children):
+        data = OrderedDict()
+        for key, lookup, convert in self.columns:
+            if lookup is None:
+                data[key] = children[key].get(row.pk, [])
+                continue
+            value = getattr(row, lookup)
+            if convert is not None and value is not None:
+                value = convert(value)
+            data[key] = value
+        return data
+
+    def load_children(self, relation, foreign_key, child, rows):
+        related = self.model._meta.get_field(relation).related_model
+        queryset = related._default_manager.filter(
+            **{f"{foreign_key}__in": [row.pk for row in rows]}
+        )
+        child_rows = list(child.values(queryset, [foreign_key]))
+        grouped = {}
+        for child_row, data in zip(child_rows, child.render_rows(child_rows)):
+            grouped.setdefault(getattr(child_row, foreign_key), []).append(data)
+        return grouped
+
+    @timed_serialization
+    def render_instance(self, instance):
+        """Строит словарь по уже загруженному объекту (с prefetch связей)."""
+        data = OrderedDict()
+        nested = {key: child for key, _, _, child in self.nested}
+        for (key, lookup, convert), getter in zip(self.columns, self.getters):
+            if lookup is None:
+                data[key] = [
+                    nested[key].render_instance(item)
+                    for item in getattr(instance, self.relation_name(key)).all()
+                ]
+                continue
+            try:
+                value = getter(instance)
+            except AttributeError:
+                # Пустая связь в середине пути, как в DRF, даёт None
+                value = None
+            if convert is not None and value is not None:
+                value = convert(value)
+            data[key] = value
+        return data
+
+    def relation_name(self, key):
+        for nested_key, relation, _, _ in self.nested:
+            if nested_key == key:
+                return relation
+
+
+def column_lookup(model, attrs):
+    """Путь values() для источника поля или None, если это не колонка."""
+    try:
+        field = model._meta.get_field(attrs[0])
+    except FieldDoesNotExist:
+        return None
+    if not field.concrete:
+        return None
+    if len(attrs) == 1:
+        # Для внешнего ключа values() возвращает значение первичного ключа
+        return attrs[0]
+    if len(attrs) == 2 and field.is_relation and field.many_to_one:
+        try:
+            target = field.related_model._meta.get_field(attrs[1])
+        except FieldDoesNotExist:
+            return None
+        if target.concrete and not target.is_relation:
+            return "__".join(attrs)
+    return None
+
+
+class FastRendering:
+    """
+    Таблица сериализаторов, подключивших быстрый рендеринг.
+
+    Сериализатор подключается декоратором register; построители
+    компилируются при первом запросе с данным набором ?fields=/?expand= и
+    хранятся в LRU-кеше.
+    """
+
+    def __init__(self):
+        self.registry = set()
+        self.renderers = OrderedDict()
+
+    def register(self, serializer_class):
+        self.registry.add(serializer_class)
+        return serializer_class
+
+    def renderer(self, serializer_class, fields=None, expand=None):
+        """Построитель для сериализатора или None, если быстрый путь недоступен."""
+        if (
+            not settings.FAST_RENDERING["ENABLED"]
+            or serializer_class not in self.registry
+        ):
+            return None
+
+        key = (serializer_class, fields, expand)
+        try:
+            self.renderers.move_to_end(key)
+            return self.renderers[key]
+        except KeyError:
+            pass
+
+        serializer = serializer_class()
+        if isinstance(serializer, SparseFieldsetSerializerMixin):
+            serializer.restrict(
+                parse_paths(fields) if fields else None,
+                parse_paths(expand) if expand is not None else None,
+            )
+        renderer = RowRenderer.compile(serializer)
+        if renderer is not None and not self.covers(serializer):
+            renderer = None
+
+        self.renderers[key] = renderer
+        while len(self.renderers) > settings.FAST_RENDERING["CACHE_SIZE"]:
+            self.renderers.popitem(last=False)
+        return renderer
+
+    def covers(self, serializer):
+        """Все вложенные сериализаторы тоже должны подключить быстрый путь."""
+        for field in serializer.fields.values():
+            child = getattr(field, "child", None)
+            if child is not None and (
+                type(child) not in self.registry or not self.covers(child)
+            ):
+                return False
+        return True
+
+    def clear(self):
+        self.renderers.clear()
+
+
+fast_rendering = FastRendering()
+
+
+class FastRenderingViewMixin:
+    """
+    Отдаёт list и retrieve через RowRenderer, если сериализатор это позволяет.
+
+    Запросы к базе те же, что у сериализатора с select_related/prefetch, но
+    строки читаются через values_list() и преобразуются в словари без
+    ModelSerializer. Проверки прав на объект получают строку values_list().
+
+    ETag ответа считается по прочитанным строкам до построения словарей,
+    поэтому на совпавший If-None-Match отдаётся 304 без рендеринга.
+    Вложенные списки в строки не входят: их версию должны отражать колонки
+    из sparse_required_fields (например, ревизия опроса).
+    """
+
+    def get_row_renderer(self):
+        if self.action not in self.sparse_actions:
+            return None
+        if not hasattr(self, "_row_renderer"):
+            params = self.request.query_params
+            self._row_renderer = fast_rendering.renderer(
+                self.get_serializer_class(),
+                params.get(self.fields_query_param),
+                params.get(self.expand_query_param),
+            )
+        return self._row_renderer
+
+    def optimize_queryset(self, queryset):
+        # Колонки и JOIN для быстрого пути задаёт values_list() построителя
+        if self.get_row_renderer() is not None:
+            return queryset
+        return super().optimize_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        renderer = self.get_row_renderer()
+        if renderer is None:
+            return self.conditional_response(super().list(request, *args, **kwargs))
+
+        queryset = renderer.values(
+            self.filter_queryset(self.get_queryset()), self.sparse_required_fields
+        )
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        etag = self.rows_etag(rows)
+        response = not_modified(request, etag, self.action)
+        if response is not None:
+            return response
+
+        if page is not None:
+            response = self.get_paginated_response(renderer.render_rows(rows))
+        else:
+            response = Response(renderer.render_rows(rows))
+        return with_cache_headers(response, etag, self.action)
+
+    def retrieve(self, request, *args, **kwargs):
+        renderer = self.get_row_renderer()
+        if renderer is None:
+            return self.conditional_response(super().retrieve(request, *args, **kwargs))
+
+        row = self.get_row(renderer, self.sparse_required_fields)
+        etag = self.rows_etag([row])
+        response = not_modified(request, etag, self.action)
+        if response is not None:
+            return response
+        return with_cache_headers(self.row_response(renderer, row), etag, self.action)
+
+    def row_response(self, renderer, row):
+        """Ответ retrieve для прочитанной строки."""
+        return Response(renderer.render_row(row))
+
+    def rows_etag(self, rows):
+        """ETag по адресу запроса, строкам и состоянию пагинатора."""
+        paginator = self.paginator
+        return make_etag(
+            self.request.get_full_path(),
+            getattr(paginator, "has_next", None),
+            getattr(paginator, "approximate_count", None),
+            [tuple(row) for row in rows],
+        )
+
+    def conditional_response(self, response):
+        """ETag по данным уже сериализованного ответа (без быстрого пути)."""
+        if response.status_code != 200:
+            return response
+        etag = make_etag(self.request.get_full_path(), response.data)
+        return not_modified(self.request, etag, self.action) or with_cache_headers(
+            response, etag, self.action
+        )
+
+    def get_row(self, renderer, required=()):
+        """Аналог get_object(), возвращающий строку values_list() построителя."""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            renderer.values(self.filter_queryset(self.get_queryset()), required),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]},
+        )
+        self.check_object_permissions(self.request, row)
+        return row
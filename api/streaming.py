@@ -0,0 +1,53 @@
+from collections.abc import Iterator
+
+from rest_framework.renderers import JSONRenderer
+
+
+class StreamingJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer, отдающий ответ частями для StreamingHttpResponse.
+
+    Итераторы (генераторы сценариев использования) выводятся как JSON-массивы
+    по одному элементу, остальные значения - через JSONRenderer, поэтому байты
+    совпадают с обычным ответом. В памяти находятся текущий элемент и буфер
+    не больше chunk_size.
+    """
+
+    chunk_size = 64 * 1024
+
+    def stream(self, data):
+        buffer = []
+        size = 0
+        for piece in self.iter_pieces(data):
+            buffer.append(piece)
+            size += len(piece)
+            if size >= self.chunk_size:
+                yield b"".join(buffer)
+                buffer = []
+                size = 0
+        if buffer:
+            yield b"".join(buffer)
+
+    def iter_pieces(self, data):
+        item_separator, key_separator = (b",", b":") if self.compact else (b", ", b": ")
+        if isinstance(data, dict):
+            yield b"{"
+            for index, (key, value) in enumerate(data.items()):
+                if index:
+                    yield item_separator
+                yield self.render(str(key))
+                yield key_separator
+                yield from self.iter_pieces(value)
+            yield b"}"
+        elif isinstance(data, Iterator):
+            yield b"["
+            for index, item in enumerate(data):
+                if index:
+                    yield item_separator
+                yield from self.iter_pieces(item)
+            yield b"]"
+        elif data is None:
+            # JSONRenderer.render(None) - пустое тело, а не null
+            yield b"null"
+        else:
+            yield self.render(data)
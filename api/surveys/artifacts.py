@@ -0,0 +1,101 @@
+"""
+Опубликованные определения опросов.
+
+Ответ retrieve для активного опроса один раз записывается на диск в виде
+JSON и его gzip-копии; имя файла задаётся ревизией и updated_at опроса,
+поэтому любое изменение опроса публикует новый файл, а старые удаляются.
+Последующие запросы отдают эти байты без загрузки вопросов и сериализации.
+"""
+
+import gzip
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+from rest_framework.renderers import JSONRenderer
+
+from .serializers import SurveyDetailSerializer
+
+re_accepts_gzip = _lazy_re_compile(r"\bgzip\b")
+
+
+def artifact_version(revision, updated_at):
+    """Версия файла: ревизия и время изменения опроса в микросекундах."""
+    return f"{revision}-{round(updated_at.timestamp() * 1_000_000)}"
+
+
+def artifact_path(survey_id, version, compressed=False):
+    directory = Path(settings.SURVEY_ARTIFACTS["DIR"]) / str(survey_id)
+    return directory / f"{version}.json{'.gz' if compressed else ''}"
+
+
+def publish_artifact(survey_id, version, data):
+    """
+    Записывает JSON ответа и его gzip-копию, удаляя прежние версии опроса.
+
+    Файлы пишутся во временные и переименовываются, поэтому параллельные
+    процессы никогда не отдают недописанный файл.
+    """
+    content = JSONRenderer().render(data)
+    plain = artifact_path(survey_id, version)
+    plain.parent.mkdir(parents=True, exist_ok=True)
+    # mtime=0 делает gzip-копию детерминированной
+    for path, payload in (
+        (plain, content),
+        (
+            artifact_path(survey_id, version, compressed=True),
+            gzip.compress(content, mtime=0),
+        ),
+    ):
+        descriptor, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as output:
+            output.write(payload)
+        os.replace(temporary, path)
+
+    for stale in plain.parent.iterdir():
+        if not stale.name.startswith(f"{version}.json"):
+            stale.unlink(missing_ok=True)
+    return content
+
+
+def publish_survey(survey):
+    """Публикует текущую версию опроса с предзагруженными вопросами."""
+    return publish_artifact(
+        survey.pk,
+        artifact_version(survey.revision, survey.updated_at),
+        SurveyDetailSerializer(survey).data,
+    )
+
+
+def artifact_response(request, survey_id, version):
+    """Ответ с опубликованным файлом или None, если версия ещё не опубликована."""
+    compressed = bool(
+        re_accepts_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    )
+    path = artifact_path(survey_id, version, compressed)
+
+    redirect_prefix = settings.SURVEY_ARTIFACTS["ACCEL_REDIRECT"]
+    if redirect_prefix:
+        if not path.exists():
+            return None
+        # Файл отдаёт nginx из internal-location, указывающей на DIR
+        response = HttpResponse(content_type="application/json")
+        response["X-Accel-Redirect"] = (
+            f"{redirect_prefix.rstrip('/')}/{survey_id}/{path.name}"
+        )
+    else:
+        try:
+            response = FileResponse(path.open("rb"), content_type="application/json")
+        except FileNotFoundError:
+            return None
+        # Ответ API, а не скачивание файла
+        del response["Content-Disposition"]
+
+    if compressed:
+        response["Content-Encoding"] = "gzip"
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
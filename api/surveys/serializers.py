@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from api.fieldsets import SparseFieldsetSerializerMixin
+from api.rendering import fast_rendering
 from apps.surveys.models import (
     AnswerOption,
     Question,
@@ -9,7 +11,10 @@ from apps.surveys.models import (
 )
 
 
-class AnswerOptionSerializer(serializers.ModelSerializer):
+@fast_rendering.register
+class AnswerOptionSerializer(
+    SparseFieldsetSerializerMixin, serializers.ModelSerializer
+):
     """Сериализатор для модели AnswerOption."""
 
     class Meta:
@@ -18,11 +23,15 @@ class AnswerOptionSerializer(serializers.ModelSerializer):
         read_only_fields = ["id"]
 
 
-class QuestionSerializer(serializers.ModelSerializer):
+@fast_rendering.register
+class QuestionSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для модели Question с вложенными вариантами ответов."""
 
     answer_options = AnswerOptionSerializer(many=True, read_only=True)
 
+    expandable_fields = ("answer_options",)
+    default_expand = ("answer_options",)
+
     class Meta:
         model = Question
         fields = ["id", "text", "order", "answer_options"]
@@ -39,11 +48,18 @@ class QuestionCreateSerializer(serializers.ModelSerializer):
         fields = ["text", "order", "answer_options"]
 
 
-class SurveyListSerializer(serializers.ModelSerializer):
-    """Сериализатор для списка опросов."""
+@fast_rendering.register
+class SurveyListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    """
+    Сериализатор для списка опросов.
+
+    Вопросы выводятся только при ?expand=questions.
+    """
 
     author_username = serializers.CharField(source="author.username", read_only=True)
-    question_count = serializers.SerializerMethodField()
+    questions = QuestionSerializer(many=True, read_only=True)
+
+    expandable_fields = ("questions",)
 
     class Meta:
         model = Survey
@@ -54,19 +70,38 @@ class SurveyListSerializer(serializers.ModelSerializer):
             "created_at",
             "is_active",
             "question_count",
+            "questions",
         ]
-        read_only_fields = ["id", "created_at"]
+        read_only_fields = ["id", "created_at", "question_count"]
 
-    def get_question_count(self, obj):
-        return obj.questions.count()
 
+@fast_rendering.register
+class SurveyAuthorListSerializer(SurveyListSerializer):
+    """Сериализатор списка опросов автора со счётчиками прохождений."""
 
-class SurveyDetailSerializer(serializers.ModelSerializer):
+    class Meta(SurveyListSerializer.Meta):
+        fields = SurveyListSerializer.Meta.fields + [
+            "session_count",
+            "completed_count",
+        ]
+        read_only_fields = SurveyListSerializer.Meta.read_only_fields + [
+            "session_count",
+            "completed_count",
+        ]
+
+
+@fast_rendering.register
+class SurveyDetailSerializer(
+    SparseFieldsetSerializerMixin, serializers.ModelSerializer
+):
     """Сериализатор для детального просмотра опроса со всеми вопросами."""
 
     questions = QuestionSerializer(many=True, read_only=True)
     author_username = serializers.CharField(source="author.username", read_only=True)
 
+    expandable_fields = ("questions",)
+    default_expand = ("questions.answer_options",)
+
     class Meta:
         model = Survey
         fields = [
@@ -77,9 +112,11 @@ class SurveyDetailSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
             "is_active",
+            "original",
+            "version",
             "questions",
         ]
-        read_only_fields = ["id", "created_at", "updated_at"]
+        read_only_fields = ["id", "created_at", "updated_at", "original", "version"]
 
 
 class SurveyCreateSerializer(serializers.ModelSerializer):
@@ -92,6 +129,102 @@ class SurveyCreateSerializer(serializers.ModelSerializer):
         fields = ["title", "questions"]
 
 
+class AnswerOptionUpdateSerializer(serializers.ModelSerializer):
+    """Сериализатор варианта ответа при вложенном обновлении опроса."""
+
+    id = serializers.IntegerField(required=False)
+
+    class Meta:
+        model = AnswerOption
+        fields = ["id", "text", "order"]
+
+
+class QuestionUpdateSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор вопроса при вложенном обновлении опроса.
+
+    Элемент с id обновляет существующий вопрос, без id - создаёт новый.
+    """
+
+    id = serializers.IntegerField(required=False)
+    answer_options = AnswerOptionUpdateSerializer(many=True, required=False)
+
+    class Meta:
+        model = Question
+        fields = ["id", "text", "order", "answer_options"]
+
+    def validate_answer_options(self, value):
+        """Проверка уникальности ID и порядка вариантов внутри вопроса."""
+        validate_unique_items(value)
+        return value
+
+
+class SurveyUpdateSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор для обновления опроса с вложенными вопросами.
+
+    Переданный список questions считается полным: отсутствующие в нём вопросы
+    удаляются.
+    """
+
+    questions = QuestionUpdateSerializer(many=True, required=False)
+
+    class Meta:
+        model = Survey
+        fields = ["title", "is_active", "questions"]
+
+    def validate_questions(self, value):
+        """Проверка уникальности ID и порядка вопросов."""
+        validate_unique_items(value)
+        return value
+
+
+def validate_unique_items(items):
+    """Проверяет, что ID и значения order элементов не повторяются."""
+    ids = [item["id"] for item in items if "id" in item]
+    if len(ids) != len(set(ids)):
+        raise serializers.ValidationError("ID элементов не должны повторяться.")
+
+    # Существующий элемент без order сохраняет свой порядок: итоговые значения
+    # проверяет UpdateSurveyUseCase
+    orders = [
+        item.get("order", 0) for item in items if "order" in item or "id" not in item
+    ]
+    if len(orders) != len(set(orders)):
+        raise serializers.ValidationError("Значения order не должны повторяться.")
+
+
+class ReorderQuestionsSerializer(serializers.Serializer):
+    """Сериализатор полного нового порядка вопросов опроса."""
+
+    question_ids = serializers.ListField(child=serializers.IntegerField())
+
+    def validate_question_ids(self, value):
+        if len(value) != len(set(value)):
+            raise serializers.ValidationError("ID вопросов не должны повторяться.")
+        return value
+
+
+class ReorderAnswerOptionsSerializer(serializers.Serializer):
+    """Сериализатор полного нового порядка вариантов ответа вопроса."""
+
+    question_id = serializers.IntegerField()
+    option_ids = serializers.ListField(child=serializers.IntegerField())
+
+    def validate_option_ids(self, value):
+        if len(value) != len(set(value)):
+            raise serializers.ValidationError("ID вариантов не должны повторяться.")
+        return value
+
+
+class CloneSurveySerializer(serializers.Serializer):
+    """Сериализатор параметров копирования опроса."""
+
+    title = serializers.CharField(max_length=255, required=False)
+    as_version = serializers.BooleanField(default=False)
+    is_active = serializers.BooleanField(default=True)
+
+
 class SurveySessionSerializer(serializers.ModelSerializer):
     """Сериализатор для модели SurveySession."""
 
@@ -142,6 +275,8 @@ class SubmitAnswerSerializer(serializers.Serializer):
 
     question_id = serializers.IntegerField()
     answer_option_id = serializers.IntegerField()
+    # Вернуть в ответе следующий вопрос и прогресс (тело next-question)
+    include_next = serializers.BooleanField(default=False)
 
 
 class NextQuestionSerializer(serializers.Serializer):
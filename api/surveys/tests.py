@@ -1,9 +1,35 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from api.rendering import fast_rendering
+from api.surveys.serializers import QuestionSerializer, SurveySessionSerializer
+from apps.core import metrics
+from apps.core.compression import compressed_bodies
+from apps.core.testing import QueryBudgetMixin
+from apps.users.authentication import CachedTokenAuthentication, SignedTokenAuthentication
 from apps.users.models import User
+from apps.users.tokens import epoch_cache, issue_tokens
 from apps.surveys.models import Survey, Question, AnswerOption, SurveySession, UserAnswer
+from apps.surveys.usecases.get_statistics import GetStatisticsUseCase
 
 
 class SurveyModelTestCase(TestCase):
@@ -51,59 +77,1674 @@ class QuestionModelTestCase(TestCase):
             author=self.author
         )
     
-    def test_create_question(self):
-        """Тест создания вопроса."""
-        question = Question.objects.create(
-            survey=self.survey,
-            text='What is your favorite color?',
-            order=0
+    def test_create_question(self):
+        """Тест создания вопроса."""
+        question = Question.objects.create(
+            survey=self.survey,
+            text='What is your favorite color?',
+            order=0
+        )
+        self.assertEqual(question.text, 'What is your favorite color?')
+        self.assertEqual(question.order, 0)
+    
+    def test_question_ordering(self):
+        """Тест сортировки вопросов по полям survey и order."""
+        q1 = Question.objects.create(survey=self.survey, text='Q1', order=1)
+        q2 = Question.objects.create(survey=self.survey, text='Q2', order=0)
+        
+        questions = list(Question.objects.filter(survey=self.survey))
+        self.assertEqual(questions[0], q2)
+        self.assertEqual(questions[1], q1)
+
+
+class AnswerOptionModelTestCase(TestCase):
+    """Тесты для модели AnswerOption."""
+    
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author',
+            email='author@test.com',
+            password='testpass123',
+            is_author=True
+        )
+        self.survey = Survey.objects.create(
+            title='Test Survey',
+            author=self.author
+        )
+        self.question = Question.objects.create(
+            survey=self.survey,
+            text='What is your favorite color?',
+            order=0
+        )
+    
+    def test_create_answer_option(self):
+        """Тест создания варианта ответа."""
+        option = AnswerOption.objects.create(
+            question=self.question,
+            text='Blue',
+            order=0
+        )
+        self.assertEqual(option.text, 'Blue')
+        self.assertEqual(option.question, self.question)
+
+
+class SurveyAPITestCase(APITestCase):
+    """Тесты для API эндпоинтов опросов."""
+    
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author',
+            email='author@test.com',
+            password='testpass123',
+            is_author=True
+        )
+        self.respondent = User.objects.create_user(
+            username='respondent',
+            email='respondent@test.com',
+            password='testpass123',
+            is_author=False
+        )
+        self.client = APIClient()
+    
+    def test_list_surveys_unauthenticated(self):
+        """Тест: неаутентифицированные пользователи не могут получить список опросов."""
+        url = reverse('survey-list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_list_surveys_as_author(self):
+        """Тест: авторы видят только свои опросы."""
+        self.client.force_authenticate(user=self.author)
+        
+        # Создаём опрос от имени автора
+        Survey.objects.create(title='Author Survey', author=self.author)
+        
+        # Создаём опрос другого автора
+        other_author = User.objects.create_user(
+            username='other_author',
+            email='other@test.com',
+            password='testpass123',
+            is_author=True
+        )
+        Survey.objects.create(title='Other Survey', author=other_author)
+        
+        url = reverse('survey-list')
+        response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Ответ может быть пагинированным (dict с 'results') или списком
+        results = response.data.get('results', response.data) if isinstance(response.data, dict) else response.data
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['title'], 'Author Survey')
+    
+    def test_list_surveys_as_respondent(self):
+        """Тест: респонденты видят все активные опросы."""
+        self.client.force_authenticate(user=self.respondent)
+        
+        # Создаём активные опросы
+        Survey.objects.create(title='Active Survey 1', author=self.author, is_active=True)
+        Survey.objects.create(title='Active Survey 2', author=self.author, is_active=True)
+        Survey.objects.create(title='Inactive Survey', author=self.author, is_active=False)
+        
+        url = reverse('survey-list')
+        response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Ответ может быть пагинированным (dict с 'results') или списком
+        results = response.data.get('results', response.data) if isinstance(response.data, dict) else response.data
+        self.assertEqual(len(results), 2)
+    
+    def test_create_survey_as_author(self):
+        """Тест: авторы могут создавать опросы."""
+        self.client.force_authenticate(user=self.author)
+        
+        url = reverse('survey-list')
+        data = {
+            'title': 'New Survey',
+            'questions': [
+                {
+                    'text': 'Question 1',
+                    'order': 0,
+                    'answer_options': [
+                        {'text': 'Option A', 'order': 0},
+                        {'text': 'Option B', 'order': 1}
+                    ]
+                }
+            ]
+        }
+        response = self.client.post(url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Survey.objects.count(), 1)
+        self.assertEqual(Question.objects.count(), 1)
+        self.assertEqual(AnswerOption.objects.count(), 2)
+    
+    def test_create_survey_without_questions(self):
+        """Тест: опросы можно создавать без вопросов."""
+        self.client.force_authenticate(user=self.author)
+        
+        url = reverse('survey-list')
+        data = {'title': 'Empty Survey'}
+        response = self.client.post(url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Survey.objects.count(), 1)
+    
+    def test_get_survey_detail(self):
+        """Тест получения детальной информации об опросе."""
+        self.client.force_authenticate(user=self.author)
+        
+        survey = Survey.objects.create(title='Test Survey', author=self.author)
+        question = Question.objects.create(
+            survey=survey,
+            text='Sample question',
+            order=0
+        )
+        AnswerOption.objects.create(question=question, text='Option 1', order=0)
+        
+        url = reverse('survey-detail', kwargs={'pk': survey.pk})
+        response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['title'], 'Test Survey')
+        self.assertEqual(len(response.data['questions']), 1)
+    
+    def test_update_survey(self):
+        """Тест обновления опроса."""
+        self.client.force_authenticate(user=self.author)
+        
+        survey = Survey.objects.create(title='Original Title', author=self.author)
+        
+        url = reverse('survey-detail', kwargs={'pk': survey.pk})
+        data = {'title': 'Updated Title'}
+        response = self.client.patch(url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        survey.refresh_from_db()
+        self.assertEqual(survey.title, 'Updated Title')
+    
+    def test_delete_survey(self):
+        """Тест удаления опроса."""
+        self.client.force_authenticate(user=self.author)
+        
+        survey = Survey.objects.create(title='Test Survey', author=self.author)
+        
+        url = reverse('survey-detail', kwargs={'pk': survey.pk})
+        response = self.client.delete(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Survey.objects.count(), 0)
+
+
+class SurveyPaginationAPITestCase(APITestCase):
+    """Тесты курсорной пагинации списка опросов."""
+    
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author',
+            password='testpass123',
+            is_author=True
+        )
+        self.respondent = User.objects.create_user(
+            username='respondent',
+            password='testpass123'
+        )
+        surveys = Survey.objects.bulk_create([
+            Survey(title=f'Survey {i}', author=self.author) for i in range(7)
+        ])
+        # Часть опросов с одинаковым created_at: порядок внутри задаёт id
+        same_time = timezone.now()
+        Survey.objects.filter(pk__in=[s.pk for s in surveys[2:5]]).update(created_at=same_time)
+        self.expected = list(
+            Survey.objects.order_by('-created_at', '-id').values_list('title', flat=True)
+        )
+        self.client.force_authenticate(user=self.respondent)
+        self.url = reverse('survey-list')
+    
+    def test_pages_cover_all_surveys_once(self):
+        """Тест: страницы по курсору возвращают каждый опрос ровно один раз."""
+        titles = []
+        url = f'{self.url}?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            titles.extend(survey['title'] for survey in response.data['results'])
+            url = response.data['next']
+        
+        self.assertEqual(titles, self.expected)
+    
+    def test_deep_page_query_count(self):
+        """Тест: страница по курсору - один запрос без COUNT(*)."""
+        response = self.client.get(f'{self.url}?page_size=2')
+        next_url = response.data['next']
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(next_url)
+        
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT(*)', queries[0]['sql'])
+    
+    def test_approximate_count_is_opt_in(self):
+        """Тест: оценка общего числа возвращается только по запросу."""
+        response = self.client.get(f'{self.url}?count=approximate')
+        
+        self.assertEqual(response.data['approximate_count'], 7)
+    
+    def test_invalid_cursor(self):
+        """Тест: повреждённый курсор отклоняется."""
+        response = self.client.get(f'{self.url}?cursor=not-a-cursor')
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SparseFieldsetAPITestCase(APITestCase):
+    """Тесты параметров ?fields= и ?expand= эндпоинтов опросов."""
+    
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author',
+            password='testpass123',
+            is_author=True
+        )
+        self.survey = Survey.objects.create(title='Sparse', author=self.author, question_count=2)
+        for order in range(2):
+            question = Question.objects.create(survey=self.survey, text=f'Question {order}', order=order)
+            AnswerOption.objects.create(question=question, text='Yes', order=0)
+        self.client.force_authenticate(user=self.author)
+        self.list_url = reverse('survey-list')
+        self.detail_url = reverse('survey-detail', kwargs={'pk': self.survey.pk})
+    
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, queries
+    
+    def test_list_fields_skip_author_join(self):
+        """Тест: список только с заголовками не соединяется с таблицей пользователей."""
+        data, queries = self.get(self.list_url, {'fields': 'id,title'})
+        
+        self.assertEqual(data['results'], [{'id': self.survey.pk, 'title': 'Sparse'}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"users"', queries[0]['sql'])
+        self.assertNotIn('question_count', queries[0]['sql'])
+    
+    def test_list_expand_questions(self):
+        """Тест: ?expand= добавляет вложенные вопросы и варианты в список."""
+        data, queries = self.get(self.list_url, {'expand': 'questions.answer_options'})
+        
+        questions = data['results'][0]['questions']
+        self.assertEqual([q['text'] for q in questions], ['Question 0', 'Question 1'])
+        self.assertEqual(questions[0]['answer_options'][0]['text'], 'Yes')
+        self.assertEqual(len(queries), 3)
+    
+    def test_detail_default_is_unchanged(self):
+        """Тест: без параметров детальный ответ содержит вопросы с вариантами."""
+        data, queries = self.get(self.detail_url, {})
+        
+        self.assertEqual(data['author_username'], 'author')
+        self.assertEqual(len(data['questions'][0]['answer_options']), 1)
+        self.assertEqual(len(queries), 3)
+    
+    def test_detail_without_nested_rows(self):
+        """Тест: без вопросов в fields вопросы и варианты не загружаются."""
+        data, queries = self.get(self.detail_url, {'fields': 'id,title'})
+        
+        self.assertEqual(data, {'id': self.survey.pk, 'title': 'Sparse'})
+        self.assertEqual(len(queries), 1)
+        
+        data, queries = self.get(self.detail_url, {'expand': 'questions'})
+        self.assertNotIn('answer_options', data['questions'][0])
+        self.assertEqual(len(queries), 2)
+    
+    def test_nested_fields(self):
+        """Тест: вложенные поля выбираются путями через точку."""
+        data, _ = self.get(self.detail_url, {'fields': 'title,questions.text'})
+        
+        self.assertEqual(data, {
+            'title': 'Sparse',
+            'questions': [{'text': 'Question 0'}, {'text': 'Question 1'}]
+        })
+    
+    def test_unknown_fields(self):
+        """Тест: неизвестные поля и раскрытия отклоняются с кодом 400."""
+        response = self.client.get(self.detail_url, {'fields': 'title,questions.secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('questions.secret', str(response.data['fields']))
+        
+        response = self.client.get(self.list_url, {'expand': 'author'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FastRenderingTestCase(APITestCase):
+    """Тесты рендеринга без ModelSerializer: ответы совпадают побайтно."""
+    
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author',
+            password='testpass123',
+            is_author=True
+        )
+        self.respondent = User.objects.create_user(
+            username='respondent',
+            password='testpass123'
+        )
+        self.survey = Survey.objects.create(title='Опрос "быстрый"', author=self.author, question_count=3)
+        Survey.objects.create(title='Пустой', author=self.author, is_active=False)
+        for order in range(3):
+            question = Question.objects.create(survey=self.survey, text=f'Вопрос {order}', order=order)
+            for option_order in range(order + 1):
+                AnswerOption.objects.create(question=question, text=f'Вариант {option_order}', order=option_order)
+        fast_rendering.clear()
+        self.addCleanup(fast_rendering.clear)
+    
+    def assertSameResponse(self, user, url, params=None):
+        self.client.force_authenticate(user=user)
+        responses = []
+        for enabled in (False, True):
+            with override_settings(FAST_RENDERING={**settings.FAST_RENDERING, 'ENABLED': enabled}):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            responses.append((response.content, len(queries)))
+        self.assertEqual(responses[0], responses[1])
+    
+    def test_list_is_byte_identical(self):
+        """Тест: список совпадает для респондента, автора и разных наборов полей."""
+        url = reverse('survey-list')
+        self.assertSameResponse(self.respondent, url)
+        self.assertSameResponse(self.author, url)
+        self.assertSameResponse(self.author, url, {'fields': 'title,created_at'})
+        self.assertSameResponse(self.author, url, {'expand': 'questions.answer_options'})
+        self.assertSameResponse(self.author, url, {'page_size': 1})
+    
+    def test_retrieve_is_byte_identical(self):
+        """Тест: детальный ответ совпадает с раскрытием и без него."""
+        url = reverse('survey-detail', kwargs={'pk': self.survey.pk})
+        self.assertSameResponse(self.respondent, url)
+        self.assertSameResponse(self.respondent, url, {'expand': 'questions'})
+        self.assertSameResponse(self.respondent, url, {'fields': 'id,questions.answer_options.text'})
+    
+    def test_next_question_is_byte_identical(self):
+        """Тест: следующий вопрос совпадает с выводом QuestionSerializer."""
+        url = reverse('survey-next-question', kwargs={'pk': self.survey.pk})
+        # Первый запрос создаёт сессию, сравниваются повторные
+        SurveySession.objects.create(survey=self.survey, user=self.respondent)
+        self.assertSameResponse(self.respondent, url)
+    
+    def test_unregistered_serializer_falls_back(self):
+        """Тест: сериализатор без регистрации обрабатывается DRF."""
+        self.assertIsNone(fast_rendering.renderer(SurveySessionSerializer))
+        self.assertIsNotNone(fast_rendering.renderer(QuestionSerializer))
+
+
+class SurveyArtifactsAPITestCase(APITestCase):
+    """Тесты опубликованных файлов retrieve."""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings_override = override_settings(SURVEY_ARTIFACTS={
+            'ENABLED': True, 'DIR': self.directory, 'ACCEL_REDIRECT': None
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        self.author = User.objects.create_user(
+            username='author',
+            password='testpass123',
+            is_author=True
+        )
+        self.respondent = User.objects.create_user(
+            username='respondent',
+            password='testpass123'
+        )
+        self.survey = Survey.objects.create(title='Published', author=self.author)
+        question = Question.objects.create(survey=self.survey, text='Question', order=0)
+        AnswerOption.objects.create(question=question, text='Yes', order=0)
+        self.url = reverse('survey-detail', kwargs={'pk': self.survey.pk})
+    
+    def published_files(self):
+        return sorted(os.listdir(os.path.join(self.directory, str(self.survey.pk))))
+    
+    def detail_body(self):
+        # Первый запрос после правки в админке рендерит и публикует файл
+        response = self.client.get(self.url)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return json.loads(content)
+    
+    def test_second_request_is_served_from_file(self):
+        """Тест: после публикации вопросы не загружаются, тело совпадает."""
+        self.client.force_authenticate(user=self.respondent)
+        first = self.client.get(self.url)
+        
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.url)
+        
+        self.assertTrue(second.streaming)
+        self.assertEqual(b''.join(second.streaming_content), first.content)
+        self.assertEqual(second['Content-Type'], 'application/json')
+        self.assertNotIn('Content-Disposition', second)
+        self.assertEqual(len(queries), 1)
+    
+    def test_gzip_variant(self):
+        """Тест: клиенту с Accept-Encoding: gzip отдаётся сжатая копия."""
+        self.client.force_authenticate(user=self.respondent)
+        plain = self.client.get(self.url).content
+        
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+        
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+    
+    def test_update_publishes_new_version(self):
+        """Тест: изменение опроса публикует новую версию и удаляет старую."""
+        self.client.force_authenticate(user=self.respondent)
+        self.client.get(self.url)
+        old_files = self.published_files()
+        
+        self.client.force_authenticate(user=self.author)
+        response = self.client.patch(self.url, {'title': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        self.assertEqual(len(self.published_files()), 2)
+        self.assertNotEqual(self.published_files(), old_files)
+        self.client.force_authenticate(user=self.respondent)
+        body = json.loads(b''.join(self.client.get(self.url).streaming_content))
+        self.assertEqual(body['title'], 'Renamed')
+    
+    def test_admin_edit_publishes_new_version(self):
+        """Тест: правка варианта и удаление вопроса в админке публикуют новую версию."""
+        admin_user = User.objects.create_superuser(username='admin', password='adminpass123')
+        question = self.survey.questions.get()
+        option = question.answer_options.get()
+        Question.objects.create(survey=self.survey, text='Second', order=1)
+        self.client.force_authenticate(user=self.respondent)
+        self.client.get(self.url)
+        old_files = self.published_files()
+        
+        self.client.force_login(admin_user)
+        response = self.client.post(
+            reverse('admin:surveys_answeroption_change', args=[option.pk]),
+            {'question': question.pk, 'text': 'No', 'order': 0}
+        )
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        
+        body = self.detail_body()
+        self.assertEqual(body['questions'][0]['answer_options'][0]['text'], 'No')
+        self.assertNotEqual(self.published_files(), old_files)
+        old_files = self.published_files()
+        
+        response = self.client.post(
+            reverse('admin:surveys_question_delete', args=[question.pk]), {'post': 'yes'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        
+        body = self.detail_body()
+        self.assertEqual([item['text'] for item in body['questions']], ['Second'])
+        self.assertNotEqual(self.published_files(), old_files)
+    
+    def test_inactive_and_sparse_requests_are_not_published(self):
+        """Тест: неактивный опрос и запросы с ?fields= рендерятся как обычно."""
+        self.client.force_authenticate(user=self.respondent)
+        response = self.client.get(self.url, {'fields': 'id,title'})
+        self.assertEqual(response.data, {'id': self.survey.pk, 'title': 'Published'})
+        self.assertFalse(os.path.exists(os.path.join(self.directory, str(self.survey.pk))))
+        
+        Survey.objects.filter(pk=self.survey.pk).update(is_active=False)
+        self.client.force_authenticate(user=self.author)
+        self.client.get(self.url)
+        self.assertFalse(self.client.get(self.url).streaming)
+    
+    def test_accel_redirect(self):
+        """Тест: с ACCEL_REDIRECT файл отдаётся через nginx."""
+        call_command('publish_surveys', stdout=StringIO())
+        self.client.force_authenticate(user=self.respondent)
+        
+        with override_settings(SURVEY_ARTIFACTS={
+            'ENABLED': True, 'DIR': self.directory, 'ACCEL_REDIRECT': '/internal/surveys/'
+        }):
+            response = self.client.get(self.url)
+        
+        self.assertEqual(response.content, b'')
+        self.assertRegex(
+            response['X-Accel-Redirect'],
+            rf'^/internal/surveys/{self.survey.pk}/[\d-]+\.json$'
+        )
+
+
+class ConditionalGetAPITestCase(APITestCase):
+    """Тесты ETag и ответов 304."""
+    
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author',
+            password='testpass123',
+            is_author=True
+        )
+        self.respondent = User.objects.create_user(
+            username='respondent',
+            password='testpass123'
+        )
+        self.survey = Survey.objects.create(title='Cached', author=self.author)
+        self.question = Question.objects.create(survey=self.survey, text='Question', order=0)
+        self.option = AnswerOption.objects.create(question=self.question, text='Yes', order=0)
+        Question.objects.create(survey=self.survey, text='Second', order=1)
+        self.detail_url = reverse('survey-detail', kwargs={'pk': self.survey.pk})
+        self.client.force_authenticate(user=self.respondent)
+    
+    def assertNotModified(self, url, etag, max_queries, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **extra)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertLessEqual(len(queries), max_queries)
+        return response
+    
+    def test_detail_not_modified(self):
+        """Тест: совпавший ETag опроса - 304 одним запросом, с заголовками кеша."""
+        response = self.client.get(self.detail_url)
+        etag = response['ETag']
+        
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('must-revalidate', response['Cache-Control'])
+        for header in ('Authorization', 'Cookie', 'Accept-Encoding'):
+            self.assertIn(header, response['Vary'])
+        
+        not_modified = self.assertNotModified(self.detail_url, etag, 1)
+        self.assertIn('Authorization', not_modified['Vary'])
+        # Слабое сравнение: ослабленный прокси тег тоже совпадает
+        self.assertNotModified(self.detail_url, f'W/{etag}', 1)
+    
+    def test_detail_etag_changes_with_questions_and_fields(self):
+        """Тест: изменение вопросов и другой набор полей меняют ETag."""
+        etag = self.client.get(self.detail_url)['ETag']
+        self.assertNotEqual(
+            self.client.get(self.detail_url, {'fields': 'id'})['ETag'], etag
+        )
+        
+        self.client.force_authenticate(user=self.author)
+        self.client.post(
+            reverse('survey-reorder-questions', kwargs={'pk': self.survey.pk}),
+            {'question_ids': list(
+                self.survey.questions.order_by('-order').values_list('id', flat=True)
+            )},
+            format='json'
+        )
+        self.client.force_authenticate(user=self.respondent)
+        
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['questions'][0]['text'], 'Second')
+    
+    def test_detail_etag_changes_after_admin_edit(self):
+        """Тест: после правки варианта ответа в админке старый ETag не даёт 304."""
+        etag = self.client.get(self.detail_url)['ETag']
+        admin_user = User.objects.create_superuser(username='admin', password='adminpass123')
+        self.client.force_login(admin_user)
+        response = self.client.post(
+            reverse('admin:surveys_answeroption_change', args=[self.option.pk]),
+            {'question': self.question.pk, 'text': 'No', 'order': 0}
+        )
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['questions'][0]['answer_options'][0]['text'], 'No')
+    
+    @override_settings(FAST_RENDERING={'ENABLED': False, 'CACHE_SIZE': 0})
+    def test_detail_not_modified_without_fast_rendering(self):
+        """Тест: без быстрого рендеринга ETag считается по данным ответа."""
+        etag = self.client.get(self.detail_url)['ETag']
+        
+        self.assertNotModified(self.detail_url, etag, 4)
+    
+    def test_gzip_artifact_etag(self):
+        """Тест: ETag сжатого файла отличается, но подходит для If-None-Match."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(SURVEY_ARTIFACTS={
+            'ENABLED': True, 'DIR': directory, 'ACCEL_REDIRECT': None
+        }):
+            plain = self.client.get(self.detail_url)['ETag']
+            compressed = self.client.get(self.detail_url, HTTP_ACCEPT_ENCODING='gzip')
+            
+            self.assertTrue(compressed.streaming)
+            self.assertNotEqual(compressed['ETag'], plain)
+            self.assertNotModified(
+                self.detail_url, compressed['ETag'], 1, HTTP_ACCEPT_ENCODING='gzip'
+            )
+    
+    def test_list_not_modified(self):
+        """Тест: страница списка - 304 без рендеринга, пока строки не изменились."""
+        url = reverse('survey-list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        
+        self.assertNotModified(url, etag, 1)
+        
+        Survey.objects.create(title='New', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_next_question_not_modified_until_answer(self):
+        """Тест: next-question - 304 одним запросом, ответ меняет ETag."""
+        url = reverse('survey-next-question', kwargs={'pk': self.survey.pk})
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('private', response['Cache-Control'])
+        
+        self.assertNotModified(url, etag, 1)
+        
+        self.client.post(
+            reverse('survey-submit-answer', kwargs={'pk': self.survey.pk}),
+            {'question_id': self.question.pk, 'answer_option_id': self.option.pk},
+            format='json'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['question']['text'], 'Second')
+        self.assertNotModified(url, response['ETag'], 1)
+    
+    def test_next_question_errors_have_no_etag(self):
+        """Тест: ошибка next-question отдаётся без ETag."""
+        Survey.objects.filter(pk=self.survey.pk).update(is_active=False)
+        url = reverse('survey-next-question', kwargs={'pk': self.survey.pk})
+        
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"stale"')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('ETag', response)
+
+
+class SurveyCountersAPITestCase(APITestCase):
+    """Тесты денормализованных счётчиков опроса."""
+    
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author',
+            password='testpass123',
+            is_author=True
+        )
+        self.respondent = User.objects.create_user(
+            username='respondent',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.author)
+        response = self.client.post(reverse('survey-list'), {
+            'title': 'Counters',
+            'questions': [
+                {'text': f'Question {i}', 'order': i, 'answer_options': [{'text': 'Yes', 'order': 0}]}
+                for i in range(2)
+            ]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.survey = Survey.objects.get(title='Counters')
+        self.questions = list(self.survey.questions.prefetch_related('answer_options'))
+    
+    def list_row(self, user):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse('survey-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results'][0]
+    
+    def answer(self, question):
+        self.client.force_authenticate(user=self.respondent)
+        response = self.client.post(
+            reverse('survey-submit-answer', kwargs={'pk': self.survey.pk}),
+            {'question_id': question.pk, 'answer_option_id': question.answer_options.all()[0].pk},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+    
+    def test_create_sets_question_count(self):
+        """Тест: создание опроса заполняет question_count, респондент не видит прохождений."""
+        self.assertEqual(self.survey.question_count, 2)
+        
+        row = self.list_row(self.respondent)
+        self.assertEqual(row['question_count'], 2)
+        self.assertNotIn('session_count', row)
+    
+    def test_sessions_and_completions_are_counted(self):
+        """Тест: автор видит в списке число сессий и завершённых прохождений."""
+        self.answer(self.questions[0])
+        row = self.list_row(self.author)
+        self.assertEqual((row['session_count'], row['completed_count']), (1, 0))
+        
+        self.answer(self.questions[1])
+        # Повторное прохождение начинает новую сессию
+        self.answer(self.questions[0])
+        row = self.list_row(self.author)
+        self.assertEqual((row['session_count'], row['completed_count']), (2, 1))
+    
+    def test_next_question_counts_new_session(self):
+        """Тест: сессия, созданная запросом следующего вопроса, учитывается один раз."""
+        self.client.force_authenticate(user=self.respondent)
+        url = reverse('survey-next-question', kwargs={'pk': self.survey.pk})
+        self.client.get(url)
+        self.answer(self.questions[0])
+        
+        self.survey.refresh_from_db()
+        self.assertEqual(self.survey.session_count, 1)
+    
+    def test_update_and_clone_keep_question_count(self):
+        """Тест: изменение состава вопросов и копирование переносят question_count."""
+        url = reverse('survey-detail', kwargs={'pk': self.survey.pk})
+        response = self.client.patch(url, {
+            'questions': [{'id': self.questions[0].pk, 'text': 'Only', 'order': 0}]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.survey.refresh_from_db()
+        self.assertEqual(self.survey.question_count, 1)
+        
+        response = self.client.post(
+            reverse('survey-clone', kwargs={'pk': self.survey.pk}), {}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Survey.objects.get(pk=response.data['id']).question_count, 1)
+    
+    def test_refresh_counters_repairs_drift(self):
+        """Тест: refresh_counters пересчитывает счётчики по таблицам."""
+        self.answer(self.questions[0])
+        self.answer(self.questions[1])
+        Question.objects.create(survey=self.survey, text='Admin question', order=5)
+        Survey.objects.filter(pk=self.survey.pk).update(session_count=0, completed_count=7)
+        
+        Survey.objects.refresh_counters()
+        
+        self.survey.refresh_from_db()
+        self.assertEqual(
+            (self.survey.question_count, self.survey.session_count, self.survey.completed_count),
+            (3, 1, 1)
+        )
+
+
+class UpdateSurveyAPITestCase(APITestCase):
+    """Тесты вложенного обновления опроса."""
+    
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author',
+            email='author@test.com',
+            password='testpass123',
+            is_author=True
+        )
+        self.survey = Survey.objects.create(title='Test Survey', author=self.author)
+        self.question1 = Question.objects.create(survey=self.survey, text='Question 1', order=0)
+        self.question2 = Question.objects.create(survey=self.survey, text='Question 2', order=1)
+        self.question3 = Question.objects.create(survey=self.survey, text='Question 3', order=2)
+        self.option1 = AnswerOption.objects.create(question=self.question1, text='A', order=0)
+        self.option2 = AnswerOption.objects.create(question=self.question1, text='B', order=1)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.author)
+        self.url = reverse('survey-detail', kwargs={'pk': self.survey.pk})
+    
+    def test_nested_update_applies_diff(self):
+        """Тест: изменения вопросов и вариантов применяются по разнице."""
+        data = {
+            'questions': [
+                {
+                    'id': self.question1.pk,
+                    'text': 'Question 1',
+                    'order': 1,
+                    'answer_options': [
+                        {'id': self.option1.pk, 'text': 'A', 'order': 1},
+                        {'id': self.option2.pk, 'text': 'B', 'order': 0},
+                        {'text': 'C', 'order': 2},
+                    ]
+                },
+                {'id': self.question2.pk, 'text': 'Question 2 edited', 'order': 0},
+                {'text': 'New question', 'order': 2, 'answer_options': [{'text': 'X', 'order': 0}]},
+            ]
+        }
+        response = self.client.patch(self.url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [q['text'] for q in response.data['questions']],
+            ['Question 2 edited', 'Question 1', 'New question']
+        )
+        self.assertFalse(Question.objects.filter(pk=self.question3.pk).exists())
+        self.assertEqual(
+            list(self.question1.answer_options.values_list('text', flat=True)),
+            ['B', 'A', 'C']
+        )
+        self.survey.refresh_from_db()
+        self.assertEqual(self.survey.revision, 2)
+    
+    def test_swap_orders_keeps_unique_constraint(self):
+        """Тест: обмен порядком вопросов не нарушает ограничение уникальности."""
+        data = {
+            'questions': [
+                {'id': self.question1.pk, 'text': 'Question 1', 'order': 2},
+                {'id': self.question2.pk, 'text': 'Question 2', 'order': 1},
+                {'id': self.question3.pk, 'text': 'Question 3', 'order': 0},
+            ]
+        }
+        response = self.client.patch(self.url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.question1.refresh_from_db()
+        self.question3.refresh_from_db()
+        self.assertEqual(self.question1.order, 2)
+        self.assertEqual(self.question3.order, 0)
+        # Варианты вопроса без answer_options остаются нетронутыми
+        self.assertEqual(self.question1.answer_options.count(), 2)
+    
+    def test_partial_nested_update_keeps_text(self):
+        """Тест: PATCH вложенных элементов без text сохраняет их текст."""
+        data = {
+            'questions': [
+                {'id': self.question1.pk, 'order': 0, 'answer_options': [
+                    {'id': self.option1.pk, 'order': 1},
+                    {'id': self.option2.pk, 'order': 0},
+                ]},
+                {'id': self.question2.pk, 'order': 1},
+                {'id': self.question3.pk, 'order': 2},
+            ]
+        }
+        response = self.client.patch(self.url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [q['text'] for q in response.data['questions']],
+            ['Question 1', 'Question 2', 'Question 3']
+        )
+        self.assertEqual(
+            list(self.question1.answer_options.values_list('text', flat=True)),
+            ['B', 'A']
+        )
+    
+    def test_partial_nested_update_keeps_order(self):
+        """Тест: PATCH вложенных элементов без order сохраняет их порядок."""
+        data = {
+            'questions': [
+                {'id': self.question1.pk, 'text': 'Question 1 edited', 'answer_options': [
+                    {'id': self.option1.pk, 'text': 'A edited'},
+                    {'id': self.option2.pk},
+                ]},
+                {'id': self.question2.pk},
+                {'id': self.question3.pk},
+            ]
+        }
+        response = self.client.patch(self.url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(Question.objects.filter(survey=self.survey).values_list('text', 'order')),
+            [('Question 1 edited', 0), ('Question 2', 1), ('Question 3', 2)]
+        )
+        self.assertEqual(
+            list(self.question1.answer_options.values_list('text', 'order')),
+            [('A edited', 0), ('B', 1)]
+        )
+        
+        # Итоговый порядок с сохранёнными значениями проверяется на повторы
+        response = self.client.patch(self.url, {
+            'questions': [
+                {'id': self.question1.pk},
+                {'id': self.question2.pk, 'order': 0},
+                {'id': self.question3.pk},
+            ]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('order', response.data['error'])
+    
+    def test_partial_nested_update_new_items_require_text(self):
+        """Тест: новый вопрос или вариант без text при PATCH - ошибка 400."""
+        for data in (
+            {'questions': [{'order': 1}]},
+            {'questions': [
+                {'id': self.question1.pk, 'order': 0, 'answer_options': [{'order': 0}]}
+            ]},
+        ):
+            response = self.client.patch(self.url, data, format='json')
+            
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('text', response.data['error'])
+        self.assertEqual(Question.objects.filter(survey=self.survey).count(), 3)
+        self.assertEqual(self.question1.answer_options.count(), 2)
+    
+    def test_update_without_changes_keeps_revision(self):
+        """Тест: обновление без изменений не увеличивает ревизию."""
+        response = self.client.patch(self.url, {'title': 'Test Survey'}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.survey.refresh_from_db()
+        self.assertEqual(self.survey.revision, 1)
+    
+    def test_update_with_foreign_question(self):
+        """Тест: вопрос другого опроса нельзя передать в обновление."""
+        other_survey = Survey.objects.create(title='Other', author=self.author)
+        other_question = Question.objects.create(survey=other_survey, text='Other', order=0)
+        
+        data = {'questions': [{'id': other_question.pk, 'text': 'Hijack', 'order': 0}]}
+        response = self.client.patch(self.url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Question.objects.filter(survey=self.survey).count(), 3)
+    
+    def test_update_duplicate_orders(self):
+        """Тест: повторяющиеся значения order отклоняются."""
+        data = {
+            'questions': [
+                {'id': self.question1.pk, 'text': 'Question 1', 'order': 0},
+                {'id': self.question2.pk, 'text': 'Question 2', 'order': 0},
+            ]
+        }
+        response = self.client.patch(self.url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_update_as_respondent(self):
+        """Тест: респондент не может изменять чужой опрос."""
+        respondent = User.objects.create_user(
+            username='respondent',
+            email='respondent@test.com',
+            password='testpass123',
+            is_author=False
+        )
+        self.client.force_authenticate(user=respondent)
+        
+        response = self.client.patch(self.url, {'title': 'Hacked'}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ReorderAPITestCase(APITestCase):
+    """Тесты эндпоинтов перестановки вопросов и вариантов."""
+    
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author',
+            email='author@test.com',
+            password='testpass123',
+            is_author=True
+        )
+        self.survey = Survey.objects.create(title='Test Survey', author=self.author)
+        self.questions = Question.objects.bulk_create([
+            Question(survey=self.survey, text=f'Question {i}', order=i)
+            for i in range(30)
+        ])
+        self.options = AnswerOption.objects.bulk_create([
+            AnswerOption(question=self.questions[0], text=text, order=i)
+            for i, text in enumerate(['A', 'B', 'C'])
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.author)
+    
+    def test_move_first_question_to_end(self):
+        """Тест: перенос первого вопроса в конец не зависит по запросам от размера опроса."""
+        question_ids = [q.pk for q in self.questions[1:]] + [self.questions[0].pk]
+        url = reverse('survey-reorder-questions', kwargs={'pk': self.survey.pk})
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'question_ids': question_ids}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['revision'], 2)
+        self.assertLess(len(queries), 10)
+        self.assertEqual(
+            list(Question.objects.filter(survey=self.survey).values_list('id', flat=True)),
+            question_ids
+        )
+    
+    def test_reorder_options(self):
+        """Тест перестановки вариантов ответа."""
+        option_ids = [self.options[2].pk, self.options[0].pk, self.options[1].pk]
+        url = reverse('survey-reorder-options', kwargs={'pk': self.survey.pk})
+        data = {'question_id': self.questions[0].pk, 'option_ids': option_ids}
+        
+        response = self.client.post(url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(self.questions[0].answer_options.values_list('id', flat=True)),
+            option_ids
+        )
+    
+    def test_reorder_incomplete_list(self):
+        """Тест: неполный список вопросов отклоняется."""
+        url = reverse('survey-reorder-questions', kwargs={'pk': self.survey.pk})
+        
+        response = self.client.post(url, {'question_ids': [self.questions[0].pk]}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Question.objects.get(pk=self.questions[0].pk).order, 0)
+    
+    def test_reorder_as_other_author(self):
+        """Тест: другой автор не может переставлять вопросы."""
+        other_author = User.objects.create_user(
+            username='other_author',
+            email='other@test.com',
+            password='testpass123',
+            is_author=True
+        )
+        self.client.force_authenticate(user=other_author)
+        url = reverse('survey-reorder-questions', kwargs={'pk': self.survey.pk})
+        question_ids = [q.pk for q in reversed(self.questions)]
+        
+        response = self.client.post(url, {'question_ids': question_ids}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class CloneSurveyAPITestCase(APITestCase):
+    """Тесты копирования опроса и сравнения версий."""
+    
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author',
+            email='author@test.com',
+            password='testpass123',
+            is_author=True
+        )
+        self.respondent = User.objects.create_user(
+            username='respondent',
+            email='respondent@test.com',
+            password='testpass123',
+            is_author=False
+        )
+        self.survey = Survey.objects.create(title='Wave 1', author=self.author)
+        self.questions = Question.objects.bulk_create([
+            Question(survey=self.survey, text=f'Question {i}', order=i)
+            for i in range(50)
+        ])
+        AnswerOption.objects.bulk_create([
+            AnswerOption(question=question, text=f'Option {i}', order=i)
+            for question in self.questions
+            for i in range(3)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.author)
+    
+    def test_clone_copies_definition(self):
+        """Тест: копия содержит те же вопросы и варианты за постоянное число запросов."""
+        url = reverse('survey-clone', kwargs={'pk': self.survey.pk})
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'title': 'Copy'}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertLess(len(queries), 10)
+        clone = Survey.objects.get(pk=response.data['id'])
+        self.assertEqual(clone.title, 'Copy')
+        self.assertIsNone(clone.original)
+        self.assertEqual(
+            list(clone.questions.values_list('text', 'order')),
+            list(self.survey.questions.values_list('text', 'order'))
+        )
+        self.assertEqual(AnswerOption.objects.filter(question__survey=clone).count(), 150)
+        self.assertEqual(
+            list(clone.questions.get(order=7).answer_options.values_list('text', flat=True)),
+            ['Option 0', 'Option 1', 'Option 2']
+        )
+    
+    def test_clone_as_version(self):
+        """Тест: версии нумеруются внутри семейства исходного опроса."""
+        url = reverse('survey-clone', kwargs={'pk': self.survey.pk})
+        first = self.client.post(url, {'as_version': True}, format='json')
+        
+        url = reverse('survey-clone', kwargs={'pk': first.data['id']})
+        second = self.client.post(url, {'as_version': True}, format='json')
+        
+        self.assertEqual(first.data['version'], 2)
+        self.assertEqual(second.data['version'], 3)
+        self.assertEqual(second.data['original'], self.survey.pk)
+    
+    def test_clone_as_respondent(self):
+        """Тест: респонденты не могут копировать опросы."""
+        self.client.force_authenticate(user=self.respondent)
+        url = reverse('survey-clone', kwargs={'pk': self.survey.pk})
+        
+        response = self.client.post(url, {}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_versions_statistics(self):
+        """Тест сравнения статистики версий."""
+        url = reverse('survey-clone', kwargs={'pk': self.survey.pk})
+        clone = Survey.objects.get(pk=self.client.post(url, {'as_version': True}, format='json').data['id'])
+        
+        for survey in (self.survey, clone):
+            question = survey.questions.get(order=0)
+            session = SurveySession.objects.create(
+                survey=survey,
+                user=self.respondent,
+                is_completed=True,
+                completed_at=timezone.now()
+            )
+            UserAnswer.objects.create(
+                session=session,
+                question=question,
+                selected_option=question.answer_options.get(order=1),
+                survey=survey,
+                user=self.respondent
+            )
+        
+        url = reverse('survey-versions-statistics', kwargs={'pk': clone.pk})
+        response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([v['version'] for v in response.data['versions']], [1, 2])
+        self.assertEqual(response.data['versions'][1]['total_responses'], 1)
+        self.assertIsNotNone(response.data['versions'][1]['average_completion_time'])
+        first_question = response.data['questions'][0]
+        self.assertEqual(len(first_question['versions']), 2)
+        self.assertEqual(first_question['versions'][1]['answers'][0]['answer_text'], 'Option 1')
+        self.assertEqual(first_question['versions'][1]['answers'][0]['percentage'], 100)
+
+
+class GenerateLoadDataCommandTestCase(TestCase):
+    """Тесты генератора синтетических данных."""
+    
+    def generate(self, seed):
+        call_command(
+            'generate_load_data',
+            users=30,
+            surveys=4,
+            sessions=60,
+            min_questions=2,
+            max_questions=4,
+            seed=seed,
+            batch_size=25,
+            stdout=StringIO()
+        )
+        return list(UserAnswer.objects.order_by('id').values_list(
+            'session__user__username', 'question__text', 'selected_option__text'
+        ))
+    
+    def test_generates_consistent_dataset(self):
+        """Тест: сгенерированные ответы ссылаются на вопросы своих опросов."""
+        self.generate(seed=1)
+        
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(SurveySession.objects.count(), 60)
+        self.assertFalse(
+            UserAnswer.objects.exclude(question__survey=F('survey')).exists()
+        )
+        self.assertFalse(
+            UserAnswer.objects.exclude(selected_option__question=F('question')).exists()
+        )
+        for session in SurveySession.objects.filter(is_completed=True):
+            self.assertEqual(session.answers.count(), session.survey.questions.count())
+        for survey in Survey.objects.all():
+            self.assertEqual(survey.question_count, survey.questions.count())
+            self.assertEqual(survey.session_count, survey.sessions.count())
+    
+    def test_rejects_surveys_without_questions(self):
+        """Тест: опрос без вопросов сгенерировать нельзя."""
+        with self.assertRaises(CommandError):
+            call_command(
+                'generate_load_data', users=10, surveys=1, sessions=5,
+                min_questions=0, max_questions=2, stdout=StringIO()
+            )
+    
+    @skipUnless(connection.vendor == 'postgresql', 'COPY доступен только на PostgreSQL')
+    def test_copy_keeps_empty_strings_and_nulls(self):
+        """Тест: COPY записывает пустые строки как строки, а None - как NULL."""
+        self.generate(seed=3)
+        
+        self.assertFalse(User.objects.exclude(first_name='').exists())
+        self.assertTrue(
+            SurveySession.objects.filter(is_completed=False, completed_at__isnull=True).exists()
+        )
+        self.assertFalse(
+            SurveySession.objects.filter(is_completed=True, completed_at__isnull=True).exists()
+        )
+    
+    def test_same_seed_same_data(self):
+        """Тест: генерация детерминирована при одинаковом seed."""
+        first = self.generate(seed=7)
+        User.objects.all().delete()
+        Survey.objects.all().delete()
+        
+        second = self.generate(seed=7)
+        
+        # Имена пользователей содержат ID, поэтому сравниваем без них
+        self.assertEqual([row[1:] for row in first], [row[1:] for row in second])
+
+
+class BenchmarkCommandTestCase(TestCase):
+    """Тесты команды benchmark."""
+    
+    def setUp(self):
+        call_command(
+            'generate_load_data',
+            users=12,
+            surveys=2,
+            sessions=10,
+            min_questions=2,
+            max_questions=3,
+            inactive_rate=0,
+            stdout=StringIO()
+        )
+        self.output = tempfile.NamedTemporaryFile(suffix='.json', delete=False).name
+        self.addCleanup(os.remove, self.output)
+    
+    def test_benchmark_writes_report(self):
+        """Тест: отчёт содержит перцентили и число запросов для каждого сценария."""
+        call_command('benchmark', iterations=3, warmup=0, output=self.output, stdout=StringIO())
+        
+        with open(self.output) as report_file:
+            report = json.load(report_file)
+        
+        self.assertEqual(
+            set(report['results']),
+            {
+                'list', 'retrieve', 'next-question', 'submit-answer', 'submit-and-advance',
+                'statistics', 'my-session', 'login'
+            }
+        )
+        for result in report['results'].values():
+            self.assertIn('p95_ms', result)
+            self.assertGreater(result['queries_per_request'], 0)
+        # Изменения сценариев откатываются
+        self.assertEqual(SurveySession.objects.count(), 10)
+    
+    def test_benchmark_middleware_suite(self):
+        """Тест: набор middleware сравнивает полный стек с режимом API."""
+        call_command(
+            'benchmark', suite='middleware', iterations=2, warmup=0,
+            output=self.output, stdout=StringIO()
+        )
+        
+        with open(self.output) as report_file:
+            results = json.load(report_file)['results']
+        
+        self.assertEqual(
+            set(results),
+            {'retrieve:full', 'retrieve:api', 'login:full', 'login:api'}
+        )
+        # Полный стек сохраняет сессию при каждом входе
+        self.assertGreater(
+            results['login:full']['queries_per_request'],
+            results['login:api']['queries_per_request']
+        )
+    
+
+    def test_benchmark_renderers_suite(self):
+        """Тест: набор renderers сравнивает сериализаторы с быстрым рендерингом."""
+        call_command(
+            'benchmark', suite='renderers', iterations=2, warmup=0,
+            output=self.output, stdout=StringIO()
+        )
+        
+        with open(self.output) as report_file:
+            results = json.load(report_file)['results']
+        
+        self.assertEqual(set(results), {
+            f'{name}:{mode}'
+            for name in ('list', 'retrieve', 'next-question')
+            for mode in ('serializer', 'fast')
+        })
+        for result in results.values():
+            self.assertIn('cpu_ms_per_request', result)
+        self.assertEqual(
+            results['retrieve:serializer']['queries_per_request'],
+            results['retrieve:fast']['queries_per_request']
+        )
+
+    def test_benchmark_detects_query_regression(self):
+        """Тест: рост числа запросов относительно baseline считается регрессией."""
+        call_command(
+            'benchmark', iterations=2, warmup=0, scenario=['my-session'],
+            output=self.output, stdout=StringIO()
+        )
+        with open(self.output) as report_file:
+            report = json.load(report_file)
+        report['results']['my-session']['max_queries'] = 0
+        with open(self.output, 'w') as report_file:
+            json.dump(report, report_file)
+        
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark', iterations=2, warmup=0, scenario=['my-session'],
+                baseline=self.output, threshold=1000, stdout=StringIO()
+            )
+
+
+class ProfilingMiddlewareTestCase(APITestCase):
+    """Тесты middleware профилирования запросов."""
+    
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author',
+            password='testpass123',
+            is_author=True
+        )
+        self.survey = Survey.objects.create(title='Опрос', author=self.author)
+        question = Question.objects.create(survey=self.survey, text='Вопрос', order=1)
+        AnswerOption.objects.create(question=question, text='Да', order=1)
+        self.client.force_authenticate(user=self.author)
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+    
+    def profiling(self, **config):
+        return override_settings(REQUEST_PROFILING={
+            'ENABLED': True,
+            'SAMPLE_RATE': 0,
+            'SLOW_THRESHOLD_MS': None,
+            'SAMPLER_INTERVAL_MS': 1,
+            'DIR': self.profile_dir,
+            **config
+        })
+    
+    def test_server_timing_and_log_line(self):
+        """Тест: ответ содержит Server-Timing, а в лог пишется строка JSON."""
+        with self.profiling(), self.assertLogs('apps.core.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('survey-detail', args=[self.survey.id]))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response['Server-Timing']
+        for metric in ('total;dur=', 'view;dur=', 'db;dur=', 'serialize;dur=', 'render;dur='):
+            self.assertIn(metric, timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['endpoint'], 'survey-detail')
+        self.assertEqual(entry['status'], 200)
+        self.assertGreater(entry['queries'], 0)
+        self.assertGreater(entry['serialize_ms'], 0)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+    
+    def test_sampled_request_writes_cprofile(self):
+        """Тест: при SAMPLE_RATE=1 профиль cProfile сохраняется на диск."""
+        with self.profiling(SAMPLE_RATE=1), self.assertLogs('apps.core.profiling', 'INFO'):
+            self.client.get(reverse('survey-list'))
+        
+        files = os.listdir(self.profile_dir)
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].endswith('.prof'))
+        self.assertIn('survey-list', files[0])
+        pstats.Stats(os.path.join(self.profile_dir, files[0]))
+    
+    def test_slow_request_writes_stacks(self):
+        """Тест: запрос дольше порога сохраняет стеки в формате flamegraph."""
+        with self.profiling(SLOW_THRESHOLD_MS=0), self.assertLogs('apps.core.profiling', 'INFO'):
+            with mock.patch('apps.surveys.usecases.get_statistics.GetStatisticsUseCase.execute',
+                            side_effect=lambda: time.sleep(0.05) or {}):
+                self.client.get(reverse('survey-statistics', args=[self.survey.id]))
+        
+        files = os.listdir(self.profile_dir)
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].endswith('.folded'))
+        with open(os.path.join(self.profile_dir, files[0])) as stacks:
+            self.assertIn('statistics (', stacks.read())
+
+
+@override_settings(SURVEY_ARTIFACTS={'ENABLED': False, 'DIR': None, 'ACCEL_REDIRECT': None})
+class CompressionMiddlewareTestCase(APITestCase):
+    """Тесты сжатия ответов API."""
+    
+    def setUp(self):
+        compressed_bodies.clear()
+        self.addCleanup(compressed_bodies.clear)
+        self.author = User.objects.create_user(
+            username='author',
+            password='testpass123',
+            is_author=True
+        )
+        self.survey = Survey.objects.create(title='Сжатие', author=self.author)
+        for order in range(20):
+            question = Question.objects.create(
+                survey=self.survey, text=f'Вопрос номер {order}', order=order
+            )
+            AnswerOption.objects.create(question=question, text='Да', order=0)
+            AnswerOption.objects.create(question=question, text='Нет', order=1)
+        self.url = reverse('survey-detail', args=[self.survey.id])
+        self.client.force_authenticate(user=self.author)
+    
+    def test_gzip_response(self):
+        """Тест: ответ сжимается gzip, ETag получает суффикс кодировки."""
+        plain = self.client.get(self.url)
+        
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(response['ETag'], plain['ETag'][:-1] + '-gzip"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        
+        not_modified = self.client.get(
+            self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_credential_responses_are_not_compressed(self):
+        """Тест: ответы с токенами не сжимаются, даже если они длиннее MIN_LENGTH."""
+        self.client.force_authenticate(user=None)
+        with override_settings(COMPRESSION={**settings.COMPRESSION, 'MIN_LENGTH': 0}):
+            for url in (reverse('auth-login'), reverse('auth-async-login')):
+                response = self.client.post(
+                    url,
+                    {'username': 'author', 'password': 'testpass123'},
+                    format='json',
+                    HTTP_ACCEPT_ENCODING='gzip'
+                )
+                
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotIn('Content-Encoding', response)
+                self.assertIn('token', response.json())
+            
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+    
+    def test_small_and_refused_responses_are_not_compressed(self):
+        """Тест: короткие ответы и gzip;q=0 отдаются без сжатия."""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br;q=0, gzip;q=0')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        
+        response = self.client.get(
+            self.url, {'fields': 'id'}, HTTP_ACCEPT_ENCODING='gzip'
         )
-        self.assertEqual(question.text, 'What is your favorite color?')
-        self.assertEqual(question.order, 0)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response.data, {'id': self.survey.id})
     
-    def test_question_ordering(self):
-        """Тест сортировки вопросов по полям survey и order."""
-        q1 = Question.objects.create(survey=self.survey, text='Q1', order=1)
-        q2 = Question.objects.create(survey=self.survey, text='Q2', order=0)
+    def test_body_compressed_once_per_etag_with_endpoint_level(self):
+        """Тест: тело с тем же ETag сжимается один раз, уровнем маршрута."""
+        encoder = mock.Mock(side_effect=lambda content, level: gzip.compress(content, level))
+        levels = {'default': {'gzip': 1, 'br': 1}, 'survey-detail': {'gzip': 9, 'br': 9}}
+        config = {**settings.COMPRESSION, 'LEVELS': levels}
+        with override_settings(COMPRESSION=config), \
+                mock.patch.dict('apps.core.compression.ENCODERS', {'gzip': encoder}, clear=True):
+            first = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+            self.client.patch(self.url, {'title': 'Новое'}, format='json')
+            third = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
         
-        questions = list(Question.objects.filter(survey=self.survey))
-        self.assertEqual(questions[0], q2)
-        self.assertEqual(questions[1], q1)
+        self.assertEqual(second.content, first.content)
+        self.assertNotEqual(third['ETag'], first['ETag'])
+        self.assertEqual(json.loads(gzip.decompress(third.content))['title'], 'Новое')
+        detail_levels = [call.args[1] for call in encoder.call_args_list]
+        # Ответ PATCH тоже сжимается, но уровнем по умолчанию и без ETag
+        self.assertEqual(detail_levels.count(9), 2)
+    
+    def test_precompressed_artifact_passes_through(self):
+        """Тест: опубликованный gzip-файл не сжимается повторно."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(SURVEY_ARTIFACTS={
+            'ENABLED': True, 'DIR': directory, 'ACCEL_REDIRECT': None
+        }):
+            plain = self.client.get(self.url).content
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
 
 
-class AnswerOptionModelTestCase(TestCase):
-    """Тесты для модели AnswerOption."""
+class MetricsTestCase(APITestCase):
+    """Тесты метрик Prometheus и эндпоинта /metrics."""
     
     def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir)
+        override = override_settings(METRICS={
+            'ENABLED': True,
+            'DIR': self.metrics_dir,
+            'ALLOWED_IPS': ['127.0.0.1'],
+            'TOKEN': 'scrape-token',
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+        
         self.author = User.objects.create_user(
             username='author',
-            email='author@test.com',
             password='testpass123',
             is_author=True
         )
-        self.survey = Survey.objects.create(
-            title='Test Survey',
-            author=self.author
+        self.client.force_authenticate(user=self.author)
+    
+    def test_request_and_usecase_metrics(self):
+        """Тест: /metrics содержит метрики запросов, SQL и сценариев использования."""
+        self.client.get(reverse('survey-list'))
+        self.client.post(reverse('survey-list'), {
+            'title': 'Опрос',
+            'questions': [{'text': 'Вопрос', 'order': 1, 'answer_options': [{'text': 'Да', 'order': 1}]}]
+        }, format='json')
+        
+        response = self.client.get('/metrics')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_requests_total{action="survey-list",method="GET",status="200"} 1.0', body)
+        self.assertIn('http_requests_total{action="survey-list",method="POST",status="201"} 1.0', body)
+        self.assertIn('http_request_duration_seconds_bucket{action="survey-list",method="GET",le="+Inf"} 1', body)
+        self.assertIn('http_request_db_queries_count{action="survey-list"} 2.0', body)
+        self.assertIn('usecase_duration_seconds_count{usecase="create_survey",outcome="ok"} 1.0', body)
+    
+    def test_streamed_usecase_is_timed_after_consumption(self):
+        """Тест: потоковый результат сценария замеряется, когда он прочитан."""
+        @metrics.timed('lazy_usecase', lazy='items')
+        def execute():
+            return {'items': (time.sleep(0.03) or item for item in (1, 2))}
+        
+        result = execute()
+        prefix = 'usecase_duration_seconds_bucket{usecase="lazy_usecase",outcome="ok",le='
+        self.assertNotIn(prefix + '"+Inf"} 1', metrics.render())
+        
+        self.assertEqual(list(result['items']), [1, 2])
+        body = metrics.render()
+        self.assertIn(prefix + '"+Inf"} 1', body)
+        self.assertIn(prefix + '"0.05"} 0', body)
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """Тест: корзины гистограммы выводятся с накоплением."""
+        child = metrics.USECASE_DURATION.labels('test_usecase', 'ok')
+        for value in (0.001, 0.02, 0.02, 30):
+            child.observe(value)
+        
+        body = metrics.render()
+        
+        prefix = 'usecase_duration_seconds_bucket{usecase="test_usecase",outcome="ok",le='
+        self.assertIn(prefix + '"0.005"} 1', body)
+        self.assertIn(prefix + '"0.025"} 3', body)
+        self.assertIn(prefix + '"10.0"} 3', body)
+        self.assertIn(prefix + '"+Inf"} 4', body)
+        self.assertIn('usecase_duration_seconds_sum{usecase="test_usecase",outcome="ok"} 30.041', body)
+    
+    def test_metrics_access_is_restricted(self):
+        """Тест: /metrics доступен только разрешённым адресам или по токену."""
+        response = self.client.get('/metrics', REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        response = self.client.get(
+            '/metrics', REMOTE_ADDR='203.0.113.5', HTTP_AUTHORIZATION='Bearer wrong'
         )
-        self.question = Question.objects.create(
-            survey=self.survey,
-            text='What is your favorite color?',
-            order=0
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        response = self.client.get(
+            '/metrics', REMOTE_ADDR='203.0.113.5', HTTP_AUTHORIZATION='Bearer scrape-token'
         )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        # Запрос через прокси на той же машине не проходит по адресу
+        response = self.client.get('/metrics', HTTP_X_FORWARDED_FOR='203.0.113.5')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        with override_settings(METRICS={
+            **settings.METRICS, 'ALLOWED_IPS': [], 'TOKEN': ''
+        }):
+            response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
     
-    def test_create_answer_option(self):
-        """Тест создания варианта ответа."""
-        option = AnswerOption.objects.create(
-            question=self.question,
-            text='Blue',
-            order=0
-        )
-        self.assertEqual(option.text, 'Blue')
-        self.assertEqual(option.question, self.question)
+    def test_concurrent_increments_are_not_lost(self):
+        """Тест: одновременные inc из потоков процесса не теряют обновлений."""
+        counter = metrics.CACHE_REQUESTS.labels('threads', 'hit')
+        
+        def increment():
+            for _ in range(2000):
+                counter.inc()
+        
+        threads = [threading.Thread(target=increment) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertIn('cache_requests_total{cache="threads",result="hit"} 8000.0', metrics.render())
+    
+    def test_values_are_aggregated_across_processes(self):
+        """Тест: значения из файлов разных процессов суммируются."""
+        counter = metrics.CACHE_REQUESTS.labels('test', 'hit')
+        counter.inc()
+        
+        pid = os.fork()
+        if pid == 0:
+            try:
+                counter.inc(2)
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        
+        self.assertEqual(len(os.listdir(self.metrics_dir)), 2)
+        self.assertIn('cache_requests_total{cache="test",result="hit"} 3.0', metrics.render())
 
 
-class SurveyAPITestCase(APITestCase):
-    """Тесты для API эндпоинтов опросов."""
+class StressSessionsCommandTestCase(TransactionTestCase):
+    """Тесты команды stress_sessions."""
+    
+    def test_concurrent_submits_keep_single_session(self):
+        """Тест: одновременные ответы не создают дублей сессий и не теряют ответы."""
+        output = StringIO()
+        call_command('stress_sessions', workers=4, rounds=3, questions=2, stdout=output)
+        
+        report = output.getvalue()
+        self.assertRegex(report, r'duplicate_open_sessions\s+0')
+        self.assertRegex(report, r'lost_answers\s+0')
+        self.assertRegex(report, r'counter_drift\s+0')
+        self.assertRegex(report, r'calls\s+12')
+        # Созданные командой данные удаляются
+        self.assertFalse(User.objects.filter(username__startswith='stress-').exists())
+
+
+class SurveyQueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+    """Бюджеты SQL-запросов эндпоинтов опросов: число запросов не зависит от объёма данных."""
+    
+    QUERY_BUDGETS = {
+        'list': 1,
+        'retrieve': 3,
+        'next-question': 5,
+        'submit-answer': 13,
+        'submit-and-advance': 15,
+        'statistics': 5,
+        'versions-statistics': 6,
+        'my-session': 2,
+    }
     
     def setUp(self):
         self.author = User.objects.create_user(
@@ -118,136 +1759,145 @@ class SurveyAPITestCase(APITestCase):
             password='testpass123',
             is_author=False
         )
+        self.survey = Survey.objects.create(title='Test Survey', author=self.author)
+        self.add_questions(self.survey, 2)
+        self.question = self.survey.questions.first()
+        self.option = self.question.answer_options.first()
+        self.session = SurveySession.objects.create(survey=self.survey, user=self.respondent)
+        UserAnswer.objects.create(
+            session=self.session,
+            question=self.question,
+            selected_option=self.option,
+            survey=self.survey,
+            user=self.respondent
+        )
         self.client = APIClient()
     
-    def test_list_surveys_unauthenticated(self):
-        """Тест: неаутентифицированные пользователи не могут получить список опросов."""
-        url = reverse('survey-list')
-        response = self.client.get(url)
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    def add_questions(self, survey, count):
+        start = survey.questions.count()
+        questions = Question.objects.bulk_create([
+            Question(survey=survey, text=f'Question {i}', order=i)
+            for i in range(start, start + count)
+        ])
+        AnswerOption.objects.bulk_create([
+            AnswerOption(question=question, text=f'Option {i}', order=i)
+            for question in questions
+            for i in range(4)
+        ])
+        return questions
     
-    def test_list_surveys_as_author(self):
-        """Тест: авторы видят только свои опросы."""
-        self.client.force_authenticate(user=self.author)
-        
-        # Создаём опрос от имени автора
-        Survey.objects.create(title='Author Survey', author=self.author)
-        
-        # Создаём опрос другого автора
-        other_author = User.objects.create_user(
-            username='other_author',
-            email='other@test.com',
-            password='testpass123',
-            is_author=True
+    def grow(self):
+        """Увеличивает число опросов, вопросов, вариантов, сессий и ответов."""
+        questions = self.add_questions(self.survey, 20)
+        # Вопросы добавлены в обход сценариев: меняем ревизию, как сделали бы они
+        Survey.objects.filter(pk=self.survey.pk).update(
+            revision=F('revision') + 1, updated_at=timezone.now()
         )
-        Survey.objects.create(title='Other Survey', author=other_author)
-        
-        url = reverse('survey-list')
-        response = self.client.get(url)
-        
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
-        # Ответ может быть пагинированным (dict с 'results') или списком
-        results = response.data.get('results', response.data) if isinstance(response.data, dict) else response.data
-        self.assertEqual(len(results), 1)
-        self.assertEqual(results[0]['title'], 'Author Survey')
+        for i in range(10):
+            self.add_questions(Survey.objects.create(title=f'Survey {i}', author=self.author), 5)
+            user = User.objects.create(username=f'user_{i}')
+            session = SurveySession.objects.create(survey=self.survey, user=user, is_completed=True)
+            UserAnswer.objects.bulk_create([
+                UserAnswer(
+                    session=session,
+                    question=question,
+                    selected_option=question.answer_options.all()[i % 4],
+                    survey=self.survey,
+                    user=user
+                )
+                for question in questions
+            ])
     
-    def test_list_surveys_as_respondent(self):
-        """Тест: респонденты видят все активные опросы."""
-        self.client.force_authenticate(user=self.respondent)
-        
-        # Создаём активные опросы
-        Survey.objects.create(title='Active Survey 1', author=self.author, is_active=True)
-        Survey.objects.create(title='Active Survey 2', author=self.author, is_active=True)
-        Survey.objects.create(title='Inactive Survey', author=self.author, is_active=False)
-        
+    def authenticate(self, user):
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        # Бюджеты считаются для тёплого кеша токенов
+        CachedTokenAuthentication().authenticate_credentials(token.key)
+    
+    def test_list_budget(self):
+        self.authenticate(self.respondent)
         url = reverse('survey-list')
-        response = self.client.get(url)
-        
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
-        # Ответ может быть пагинированным (dict с 'results') или списком
-        results = response.data.get('results', response.data) if isinstance(response.data, dict) else response.data
-        self.assertEqual(len(results), 2)
+        self.assertQueryBudget('list', lambda: self.client.get(url), self.grow)
     
-    def test_create_survey_as_author(self):
-        """Тест: авторы могут создавать опросы."""
-        self.client.force_authenticate(user=self.author)
-        
+    def test_author_list_budget(self):
+        self.authenticate(self.author)
         url = reverse('survey-list')
+        self.assertQueryBudget('list', lambda: self.client.get(url), self.grow)
+    
+    def test_retrieve_budget(self):
+        self.authenticate(self.respondent)
+        url = reverse('survey-detail', kwargs={'pk': self.survey.pk})
+        self.assertQueryBudget('retrieve', lambda: self.client.get(url), self.grow)
+    
+    def test_next_question_budget(self):
+        self.authenticate(self.respondent)
+        url = reverse('survey-next-question', kwargs={'pk': self.survey.pk})
+        self.assertQueryBudget('next-question', lambda: self.client.get(url), self.grow)
+    
+    def test_submit_answer_budget(self):
+        self.authenticate(self.respondent)
+        url = reverse('survey-submit-answer', kwargs={'pk': self.survey.pk})
+        data = {'question_id': self.question.pk, 'answer_option_id': self.option.pk}
+        self.assertQueryBudget(
+            'submit-answer',
+            lambda: self.client.post(url, data, format='json'),
+            self.grow,
+            expected_status=status.HTTP_201_CREATED
+        )
+    
+    def test_submit_and_advance_budget(self):
+        self.authenticate(self.respondent)
+        url = reverse('survey-submit-answer', kwargs={'pk': self.survey.pk})
         data = {
-            'title': 'New Survey',
-            'questions': [
-                {
-                    'text': 'Question 1',
-                    'order': 0,
-                    'answer_options': [
-                        {'text': 'Option A', 'order': 0},
-                        {'text': 'Option B', 'order': 1}
-                    ]
-                }
-            ]
+            'question_id': self.question.pk,
+            'answer_option_id': self.option.pk,
+            'include_next': True
         }
-        response = self.client.post(url, data, format='json')
-        
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertEqual(Survey.objects.count(), 1)
-        self.assertEqual(Question.objects.count(), 1)
-        self.assertEqual(AnswerOption.objects.count(), 2)
+        self.assertQueryBudget(
+            'submit-and-advance',
+            lambda: self.client.post(url, data, format='json'),
+            self.grow,
+            expected_status=status.HTTP_201_CREATED
+        )
     
-    def test_create_survey_without_questions(self):
-        """Тест: опросы можно создавать без вопросов."""
-        self.client.force_authenticate(user=self.author)
-        
-        url = reverse('survey-list')
-        data = {'title': 'Empty Survey'}
-        response = self.client.post(url, data, format='json')
-        
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertEqual(Survey.objects.count(), 1)
+    def test_statistics_budget(self):
+        self.authenticate(self.author)
+        url = reverse('survey-statistics', kwargs={'pk': self.survey.pk})
+        self.assertQueryBudget('statistics', lambda: self.client.get(url), self.grow)
     
-    def test_get_survey_detail(self):
-        """Тест получения детальной информации об опросе."""
-        self.client.force_authenticate(user=self.author)
-        
-        survey = Survey.objects.create(title='Test Survey', author=self.author)
-        question = Question.objects.create(
-            survey=survey,
-            text='Sample question',
-            order=0
-        )
-        AnswerOption.objects.create(question=question, text='Option 1', order=0)
-        
-        url = reverse('survey-detail', kwargs={'pk': survey.pk})
-        response = self.client.get(url)
-        
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data['title'], 'Test Survey')
-        self.assertEqual(len(response.data['questions']), 1)
+    def test_versions_statistics_budget(self):
+        self.authenticate(self.author)
+        url = reverse('survey-versions-statistics', kwargs={'pk': self.survey.pk})
+        self.assertQueryBudget('versions-statistics', lambda: self.client.get(url), self.grow)
     
-    def test_update_survey(self):
-        """Тест обновления опроса."""
-        self.client.force_authenticate(user=self.author)
-        
-        survey = Survey.objects.create(title='Original Title', author=self.author)
-        
-        url = reverse('survey-detail', kwargs={'pk': survey.pk})
-        data = {'title': 'Updated Title'}
-        response = self.client.patch(url, data, format='json')
-        
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
-        survey.refresh_from_db()
-        self.assertEqual(survey.title, 'Updated Title')
+    def test_my_session_budget(self):
+        self.authenticate(self.respondent)
+        url = reverse('survey-my-session', kwargs={'pk': self.survey.pk})
+        self.assertQueryBudget('my-session', lambda: self.client.get(url), self.grow)
     
-    def test_delete_survey(self):
-        """Тест удаления опроса."""
-        self.client.force_authenticate(user=self.author)
-        
-        survey = Survey.objects.create(title='Test Survey', author=self.author)
-        
-        url = reverse('survey-detail', kwargs={'pk': survey.pk})
-        response = self.client.delete(url)
-        
-        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertEqual(Survey.objects.count(), 0)
+    def test_next_question_signed_token_budget(self):
+        epoch_cache.clear()
+        self.addCleanup(epoch_cache.clear)
+        access = issue_tokens(self.respondent)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        SignedTokenAuthentication().authenticate_credentials(access)
+        url = reverse('survey-next-question', kwargs={'pk': self.survey.pk})
+        self.assertQueryBudget('next-question', lambda: self.client.get(url), self.grow)
+    
+    def test_submit_answer_signed_token_budget(self):
+        epoch_cache.clear()
+        self.addCleanup(epoch_cache.clear)
+        access = issue_tokens(self.respondent)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        SignedTokenAuthentication().authenticate_credentials(access)
+        url = reverse('survey-submit-answer', kwargs={'pk': self.survey.pk})
+        data = {'question_id': self.question.pk, 'answer_option_id': self.option.pk}
+        self.assertQueryBudget(
+            'submit-answer',
+            lambda: self.client.post(url, data, format='json'),
+            self.grow,
+            expected_status=status.HTTP_201_CREATED
+        )
 
 
 class NextQuestionAPITestCase(APITestCase):
@@ -426,6 +2076,51 @@ class SubmitAnswerAPITestCase(APITestCase):
         self.assertEqual(answer.selected_option, self.option1)
         self.assertEqual(answer.user, self.respondent)
     
+    def test_submit_answer_include_next(self):
+        """Тест: с include_next ответ содержит тело next-question."""
+        second = Question.objects.create(survey=self.survey, text='Question 2', order=1)
+        second_option = AnswerOption.objects.create(question=second, text='Yes', order=0)
+        self.client.force_authenticate(user=self.respondent)
+        url = reverse('survey-submit-answer', kwargs={'pk': self.survey.pk})
+        
+        response = self.client.post(url, {
+            'question_id': self.question.pk,
+            'answer_option_id': self.option1.pk,
+            'include_next': True
+        }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['selected_option'], self.option1.pk)
+        next_question = self.client.get(
+            reverse('survey-next-question', kwargs={'pk': self.survey.pk})
+        )
+        self.assertEqual(response.data['next'], next_question.data)
+        self.assertEqual(response.data['next']['question']['id'], second.pk)
+        self.assertEqual(response.data['next']['progress']['answered'], 1)
+        
+        response = self.client.post(url, {
+            'question_id': second.pk,
+            'answer_option_id': second_option.pk,
+            'include_next': True
+        }, format='json')
+        self.assertEqual(response.data['next'], {
+            'message': 'Опрос завершён',
+            'is_completed': True,
+            'progress': {'answered': 2, 'total': 2, 'percentage': 100.0},
+        })
+    
+    def test_submit_answer_without_include_next(self):
+        """Тест: без include_next ответ не меняется."""
+        self.client.force_authenticate(user=self.respondent)
+        url = reverse('survey-submit-answer', kwargs={'pk': self.survey.pk})
+        
+        response = self.client.post(url, {
+            'question_id': self.question.pk,
+            'answer_option_id': self.option1.pk
+        }, format='json')
+        
+        self.assertNotIn('next', response.data)
+    
     def test_submit_answer_creates_session(self):
         """Тест: отправка ответа создаёт сессию, если её нет."""
         self.client.force_authenticate(user=self.respondent)
@@ -575,6 +2270,70 @@ class StatisticsAPITestCase(APITestCase):
         self.assertIn('completed_responses', response.data)
         self.assertIn('questions_statistics', response.data)
     
+    def create_answers(self):
+        """Второй вопрос и ответы нескольких респондентов."""
+        second = Question.objects.create(survey=self.survey, text='Вопрос 2', order=1)
+        second_option = AnswerOption.objects.create(question=second, text='Да', order=0)
+        for index in range(3):
+            user = User.objects.create_user(username=f'user{index}', password='testpass123')
+            session = SurveySession.objects.create(survey=self.survey, user=user)
+            UserAnswer.objects.create(
+                session=session, question=self.question,
+                selected_option=self.option1 if index else self.option2,
+                survey=self.survey, user=user
+            )
+            if index:
+                UserAnswer.objects.create(
+                    session=session, question=second, selected_option=second_option,
+                    survey=self.survey, user=user
+                )
+        Survey.objects.refresh_counters()
+    
+    def test_streamed_statistics_match_regular_response(self):
+        """Тест: потоковый ответ побайтно совпадает с обычным."""
+        self.create_answers()
+        self.client.force_authenticate(user=self.author)
+        url = reverse('survey-statistics', kwargs={'pk': self.survey.pk})
+        
+        regular = self.client.get(url, {'stream': 'false'})
+        streamed = self.client.get(url, {'stream': 'true'})
+        
+        self.assertFalse(regular.streaming)
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(streamed['Content-Type'], 'application/json')
+        self.assertEqual(b''.join(streamed.streaming_content), regular.content)
+        popular = regular.data['questions_statistics'][0]['popular_answers']
+        self.assertEqual([answer['count'] for answer in popular], [2, 1])
+    
+    def test_large_survey_is_streamed_and_compressed(self):
+        """Тест: опрос от MIN_QUESTIONS вопросов отдаётся сжатым потоком."""
+        self.create_answers()
+        self.client.force_authenticate(user=self.author)
+        url = reverse('survey-statistics', kwargs={'pk': self.survey.pk})
+        regular = self.client.get(url, {'stream': 'false'}).content
+        
+        with override_settings(STATISTICS_STREAMING={'MIN_QUESTIONS': 2}):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response)
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), regular)
+    
+    def test_usecase_yields_questions(self):
+        """Тест: с stream=True статистика вопросов - генератор из двух запросов."""
+        self.create_answers()
+        expected = GetStatisticsUseCase(survey_id=self.survey.pk).execute()
+        
+        stats = GetStatisticsUseCase(survey_id=self.survey.pk).execute(stream=True)
+        
+        self.assertNotIsInstance(stats['questions_statistics'], list)
+        with CaptureQueriesContext(connection) as queries:
+            questions = list(stats['questions_statistics'])
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(questions, expected['questions_statistics'])
+        self.assertEqual([question['total_answers'] for question in questions], [3, 2])
+    
     def test_get_statistics_as_non_author(self):
         """Тест: не-авторы не могут просматривать статистику."""
         self.client.force_authenticate(user=self.other_author)
@@ -702,6 +2461,38 @@ class SurveySessionModelTestCase(TestCase):
             user=self.respondent
         )
         self.assertIsNone(session.completion_time)
+    def test_get_or_create_open_reuses_open_session(self):
+        """Тест: get_or_create_open создаёт сессию один раз и затем возвращает её."""
+        session, created = SurveySession.objects.get_or_create_open(self.respondent, self.survey)
+        again, created_again = SurveySession.objects.get_or_create_open(self.respondent, self.survey)
+        
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(session.pk, again.pk)
+        self.assertFalse(session._state.adding)
+        self.assertEqual(SurveySession.objects.count(), 1)
+    
+    def test_only_one_open_session_per_user(self):
+        """Тест: вторую незавершённую сессию создать нельзя, завершённых - сколько угодно."""
+        SurveySession.objects.create(survey=self.survey, user=self.respondent, is_completed=True)
+        SurveySession.objects.create(survey=self.survey, user=self.respondent, is_completed=True)
+        SurveySession.objects.create(survey=self.survey, user=self.respondent)
+        
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                SurveySession.objects.create(survey=self.survey, user=self.respondent)
+    
+    def test_get_or_create_open_after_completion(self):
+        """Тест: после завершения сессии создаётся новая."""
+        session, _ = SurveySession.objects.get_or_create_open(self.respondent, self.survey)
+        session.is_completed = True
+        session.save()
+        
+        new_session, created = SurveySession.objects.get_or_create_open(self.respondent, self.survey)
+        
+        self.assertTrue(created)
+        self.assertNotEqual(new_session.pk, session.pk)
+    
 
 
 class UserAnswerModelTestCase(TestCase):
@@ -1,40 +1,73 @@
+from django.conf import settings
+from django.db.models import Count
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from api.conditional import make_etag, not_modified, with_cache_headers
+from api.fieldsets import SparseFieldsetViewMixin
+from api.pagination import KeysetPagination
+from api.rendering import FastRenderingViewMixin, fast_rendering
+from api.streaming import StreamingJSONRenderer
 from apps.surveys.models import Survey, SurveySession
+from apps.surveys.usecases.clone_survey import CloneSurveyUseCase
 from apps.surveys.usecases.create_survey import CreateSurveyUseCase
 from apps.surveys.usecases.get_next_question import GetNextQuestionUseCase
-from apps.surveys.usecases.get_statistics import GetStatisticsUseCase
+from apps.surveys.usecases.get_statistics import (
+    GetStatisticsUseCase,
+    GetVersionStatisticsUseCase,
+)
+from apps.surveys.usecases.reorder import ReorderUseCase
 from apps.surveys.usecases.submit_answer import SubmitAnswerUseCase
+from apps.surveys.usecases.update_survey import UpdateSurveyUseCase
 
+from .artifacts import artifact_response, artifact_version, publish_artifact
 from .serializers import (
+    CloneSurveySerializer,
     QuestionSerializer,
+    ReorderAnswerOptionsSerializer,
+    ReorderQuestionsSerializer,
     SubmitAnswerSerializer,
+    SurveyAuthorListSerializer,
     SurveyCreateSerializer,
     SurveyDetailSerializer,
     SurveyListSerializer,
     SurveySessionSerializer,
+    SurveyUpdateSerializer,
     UserAnswerSerializer,
 )
 
 
-class SurveyViewSet(viewsets.ModelViewSet):
+class SurveyViewSet(
+    FastRenderingViewMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet
+):
     """
     ViewSet для CRUD операций с опросами.
     Использует UseCases для бизнес-логики, следуя паттерну Service Layer.
+
+    Список и просмотр опроса принимают ?fields= и ?expand=: например,
+    ?fields=id,title или ?expand=questions.answer_options.
     """
 
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     queryset = Survey.objects.all()
+    # По created_at KeysetPagination строит курсор следующей страницы;
+    # ревизия и updated_at входят в ETag и отражают изменения вопросов
+    sparse_required_fields = ("created_at", "revision", "updated_at")
 
     def get_serializer_class(self):
         if self.action == "list":
+            if self.request.user.is_author:
+                return SurveyAuthorListSerializer
             return SurveyListSerializer
         elif self.action == "create":
             return SurveyCreateSerializer
+        elif self.action in ("update", "partial_update"):
+            return SurveyUpdateSerializer
         return SurveyDetailSerializer
 
     def get_queryset(self):
@@ -42,10 +75,57 @@ class SurveyViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_author:
             # Авторы видят свои собственные опросы
-            return Survey.objects.filter(author=user).select_related("author")
+            queryset = Survey.objects.filter(author=user)
         else:
             # Респонденты видят все активные опросы
-            return Survey.objects.filter(is_active=True).select_related("author")
+            queryset = Survey.objects.filter(is_active=True)
+
+        # JOIN автора, prefetch вопросов и набор колонок зависят от
+        # запрошенных полей; порядок (-created_at, -id) задаёт KeysetPagination
+        return self.optimize_queryset(queryset)
+
+    def row_response(self, renderer, row):
+        """
+        Отдаёт опрос; активный опрос - из опубликованного файла.
+
+        Строка опроса читается всегда (права, ревизия, ETag), а вопросы и
+        варианты загружаются и сериализуются, только пока текущая версия
+        опроса не опубликована. Запросы с ?fields=/?expand= файлы не используют.
+        """
+        params = self.request.query_params
+        if (
+            not settings.SURVEY_ARTIFACTS["ENABLED"]
+            or self.fields_query_param in params
+            or self.expand_query_param in params
+            or not row.is_active
+        ):
+            return super().row_response(renderer, row)
+
+        version = artifact_version(row.revision, row.updated_at)
+        response = artifact_response(self.request, row.pk, version)
+        if response is None:
+            data = renderer.render_row(row)
+            publish_artifact(row.pk, version, data)
+            response = Response(data)
+        return response
+
+    def get_detail_data(self, survey):
+        """
+        Сериализует опрос с вопросами, загружая их одним набором запросов.
+
+        Новая версия активного опроса сразу публикуется для retrieve.
+        """
+        survey = (
+            Survey.objects.select_related("author")
+            .prefetch_related("questions__answer_options")
+            .get(pk=survey.pk)
+        )
+        data = SurveyDetailSerializer(survey).data
+        if survey.is_active and settings.SURVEY_ARTIFACTS["ENABLED"]:
+            publish_artifact(
+                survey.pk, artifact_version(survey.revision, survey.updated_at), data
+            )
+        return data
 
     def perform_create(self, serializer):
         """Использует CreateSurveyUseCase для создания опросов."""
@@ -60,79 +140,208 @@ class SurveyViewSet(viewsets.ModelViewSet):
         # Устанавливаем созданный survey в serializer для правильного ответа
         serializer.instance = survey
 
+    def update(self, request, *args, **kwargs):
+        """
+        Обновляет опрос через UpdateSurveyUseCase.
+
+        Вложенные вопросы и варианты сравниваются с сохранёнными, поэтому
+        изменение большого опроса не требует его пересоздания.
+        """
+        partial = kwargs.pop("partial", False)
+        survey = self.get_object()
+        serializer = self.get_serializer(survey, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+
+        validated_data = serializer.validated_data.copy()
+        questions_data = validated_data.pop("questions", None)
+
+        try:
+            usecase = UpdateSurveyUseCase(author=request.user, survey_id=survey.pk)
+            survey = usecase.execute(
+                fields=validated_data, questions_data=questions_data
+            )
+        except PermissionError as e:
+            return Response({"error": str(e)}, status=status.HTTP_403_FORBIDDEN)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(self.get_detail_data(survey), status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["post"], url_path="reorder-questions")
+    def reorder_questions(self, request, pk=None):
+        """
+        Установить новый порядок вопросов опроса одним запросом к базе.
+        """
+        serializer = ReorderQuestionsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            usecase = ReorderUseCase(author=request.user, survey_id=pk)
+            survey = usecase.reorder_questions(
+                question_ids=serializer.validated_data["question_ids"]
+            )
+        except PermissionError as e:
+            return Response({"error": str(e)}, status=status.HTTP_403_FORBIDDEN)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {"message": "Порядок вопросов обновлён.", "revision": survey.revision},
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=["post"], url_path="reorder-options")
+    def reorder_options(self, request, pk=None):
+        """
+        Установить новый порядок вариантов ответа вопроса одним запросом к базе.
+        """
+        serializer = ReorderAnswerOptionsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            usecase = ReorderUseCase(author=request.user, survey_id=pk)
+            survey = usecase.reorder_answer_options(
+                question_id=serializer.validated_data["question_id"],
+                option_ids=serializer.validated_data["option_ids"],
+            )
+        except PermissionError as e:
+            return Response({"error": str(e)}, status=status.HTTP_403_FORBIDDEN)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {"message": "Порядок вариантов обновлён.", "revision": survey.revision},
+            status=status.HTTP_200_OK,
+        )
+
     @action(detail=True, methods=["get"], url_path="next-question")
     def next_question(self, request, pk=None):
         """
         Получить следующий неотвеченный вопрос для текущего пользователя.
+
+        ETag зависит от версии опроса и прогресса открытой сессии; если
+        клиент прислал If-None-Match, они проверяются одним запросом до
+        выбора вопроса.
         """
         try:
+            if "HTTP_IF_NONE_MATCH" in request.META:
+                marker = (
+                    SurveySession.objects.filter(
+                        user=request.user,
+                        survey_id=pk,
+                        survey__is_active=True,
+                        is_completed=False,
+                    )
+                    .values_list(
+                        "survey_id", "survey__revision", "survey__updated_at", "pk"
+                    )
+                    .annotate(answered=Count("answers__question", distinct=True))
+                    .first()
+                )
+                if marker is not None:
+                    response = not_modified(
+                        request, make_etag("next-question", *marker), self.action
+                    )
+                    if response is not None:
+                        return response
+
             usecase = GetNextQuestionUseCase(user=request.user, survey_id=pk)
             result = usecase.execute()
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            if result["is_completed"]:
-                return Response(
-                    {
-                        "message": "Опрос завершён",
-                        "is_completed": True,
-                        "progress": result["progress"],
-                    },
-                    status=status.HTTP_200_OK,
-                )
-
-            if result["question"] is None:
-                return Response(
-                    {
-                        "message": "Нет доступных вопросов",
-                        "is_completed": True,
-                        "progress": result["progress"],
-                    },
-                    status=status.HTTP_200_OK,
-                )
+        survey = result["survey"]
+        etag = make_etag(
+            "next-question",
+            survey.pk,
+            survey.revision,
+            survey.updated_at,
+            result["session"].pk,
+            result["progress"]["answered"],
+        )
+        return with_cache_headers(
+            self.next_question_response(result), etag, self.action
+        )
 
-            # Сериализуем вопрос с вариантами ответов
-            question_serializer = QuestionSerializer(result["question"])
+    def next_question_response(self, result):
+        """Тело ответа next-question по результату GetNextQuestionUseCase."""
+        if result["is_completed"]:
+            return Response(
+                {
+                    "message": "Опрос завершён",
+                    "is_completed": True,
+                    "progress": result["progress"],
+                },
+                status=status.HTTP_200_OK,
+            )
 
+        if result["question"] is None:
             return Response(
                 {
-                    "question": question_serializer.data,
+                    "message": "Нет доступных вопросов",
+                    "is_completed": True,
                     "progress": result["progress"],
-                    "is_completed": result["is_completed"],
                 },
                 status=status.HTTP_200_OK,
             )
 
-        except ValueError as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # Сериализуем вопрос с вариантами ответов
+        renderer = fast_rendering.renderer(QuestionSerializer)
+        if renderer is not None:
+            question_data = renderer.render_instance(result["question"])
+        else:
+            question_data = QuestionSerializer(result["question"]).data
+
+        return Response(
+            {
+                "question": question_data,
+                "progress": result["progress"],
+                "is_completed": result["is_completed"],
+            },
+            status=status.HTTP_200_OK,
+        )
 
     @action(detail=True, methods=["post"], url_path="submit-answer")
     def submit_answer(self, request, pk=None):
         """
         Отправить ответ на вопрос в опросе.
+
+        С "include_next": true ответ дополнительно содержит в поле "next"
+        тело next-question после этого ответа.
         """
         serializer = SubmitAnswerSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        include_next = serializer.validated_data["include_next"]
 
         try:
             usecase = SubmitAnswerUseCase(user=request.user, survey_id=pk)
-            answer = usecase.execute(
+            result = usecase.execute(
                 question_id=serializer.validated_data["question_id"],
                 answer_option_id=serializer.validated_data["answer_option_id"],
+                include_next=include_next,
             )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            answer_serializer = UserAnswerSerializer(answer)
+        if not include_next:
+            answer_serializer = UserAnswerSerializer(result)
             return Response(answer_serializer.data, status=status.HTTP_201_CREATED)
 
-        except ValueError as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        data = UserAnswerSerializer(result["answer"]).data
+        data["next"] = self.next_question_response(result).data
+        return Response(data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=["get"], url_path="statistics")
     def statistics(self, request, pk=None):
         """
         Получить статистику по опросу.
+
+        Статистика опросов от STATISTICS_STREAMING["MIN_QUESTIONS"] вопросов
+        отдаётся потоком по одному вопросу; ?stream=true/false задаёт режим явно.
         """
         # Разрешить просмотр статистики только авторам опроса
         survey = get_object_or_404(Survey, pk=pk)
-        if not request.user.is_author or survey.author != request.user:
+        if not request.user.is_author or survey.author_id != request.user.id:
             return Response(
                 {"error": "Только автор опроса может просматривать статистику"},
                 status=status.HTTP_403_FORBIDDEN,
@@ -140,27 +349,79 @@ class SurveyViewSet(viewsets.ModelViewSet):
 
         try:
             usecase = GetStatisticsUseCase(survey_id=pk)
+            if self.stream_statistics(survey):
+                return StreamingHttpResponse(
+                    StreamingJSONRenderer().stream(usecase.execute(stream=True)),
+                    content_type="application/json",
+                )
             stats = usecase.execute()
             return Response(stats, status=status.HTTP_200_OK)
 
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    def stream_statistics(self, survey):
+        stream = self.request.query_params.get("stream")
+        if stream in ("true", "false"):
+            return stream == "true"
+        return survey.question_count >= settings.STATISTICS_STREAMING["MIN_QUESTIONS"]
+
+    @action(detail=True, methods=["get"], url_path="versions-statistics")
+    def versions_statistics(self, request, pk=None):
+        """
+        Сравнить статистику всех версий опроса.
+        """
+        survey = get_object_or_404(Survey, pk=pk)
+        if not request.user.is_author or survey.author_id != request.user.id:
+            return Response(
+                {"error": "Только автор опроса может просматривать статистику"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        try:
+            usecase = GetVersionStatisticsUseCase(survey_id=pk)
+            stats = usecase.execute()
+            return Response(stats, status=status.HTTP_200_OK)
+
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=["post"], url_path="clone")
+    def clone(self, request, pk=None):
+        """
+        Скопировать опрос, при необходимости как новую версию исходного.
+        """
+        serializer = CloneSurveySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            usecase = CloneSurveyUseCase(author=request.user, survey_id=pk)
+            survey = usecase.execute(**serializer.validated_data)
+        except PermissionError as e:
+            return Response({"error": str(e)}, status=status.HTTP_403_FORBIDDEN)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(self.get_detail_data(survey), status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=["get"], url_path="my-session")
     def my_session(self, request, pk=None):
         """
         Получить сессию текущего пользователя для этого опроса.
         """
         survey = get_object_or_404(Survey, pk=pk)
-        sessions = SurveySession.objects.filter(
-            user=request.user, survey=survey
-        ).order_by("-started_at")
+        session = (
+            SurveySession.objects.filter(user=request.user, survey=survey)
+            .select_related("survey", "user")
+            .order_by("-started_at")
+            .first()
+        )
 
-        if not sessions.exists():
+        if session is None:
             return Response(
                 {"message": "Сессия для этого опроса не найдена"},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        serializer = SurveySessionSerializer(sessions.first())
+        serializer = SurveySessionSerializer(session)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -3,4 +3,5 @@ from django.urls import include, path
 urlpatterns = [
     path("users/", include("api.users.urls")),
     path("surveys/", include("api.surveys.urls")),
+    path("debug/", include("api.debug.urls")),
 ]
@@ -1,7 +1,10 @@
-from django.contrib.auth import authenticate
+from django.contrib.auth import hashers
+from django.core import signing
 from rest_framework import serializers
 
+from apps.users.hashing import check_user_password, hashing_pool
 from apps.users.models import User
+from apps.users.tokens import read_refresh_token
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -71,16 +74,22 @@ class UserLoginSerializer(serializers.Serializer):
         password = data.get("password")
 
         if username and password:
-            user = authenticate(username=username, password=password)
-
-            if not user:
+            # Пароль проверяется в пуле хеширования, а не через authenticate():
+            # переполненный пул отвечает 503 только на эндпоинтах API
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                # Как ModelBackend: хеш считается и для несуществующего
+                # пользователя, чтобы время ответа не выдавало существующие имена
+                hashing_pool.run("make_password", hashers.make_password, password)
+                valid = False
+            else:
+                valid = check_user_password(user, password)
+
+            if not valid or not user.is_active:
                 raise serializers.ValidationError(
                     "Неверное имя пользователя или пароль."
                 )
 
-            if not user.is_active:
-                raise serializers.ValidationError("Учётная запись отключена.")
-
             data["user"] = user
         else:
             raise serializers.ValidationError(
@@ -126,7 +135,7 @@ class ChangePasswordSerializer(serializers.Serializer):
     def validate_old_password(self, value):
         """Проверка текущего пароля."""
         user = self.context["request"].user
-        if not user.check_password(value):
+        if not check_user_password(user, value):
             raise serializers.ValidationError("Неверный текущий пароль.")
         return value
 
@@ -137,3 +146,25 @@ class ChangePasswordSerializer(serializers.Serializer):
                 {"new_password_confirm": "Пароли не совпадают."}
             )
         return data
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Сериализатор обмена токена обновления на новую пару токенов."""
+
+    refresh_token = serializers.CharField(required=True, write_only=True)
+
+    def validate(self, data):
+        """Проверка подписи, срока действия и эпохи токена обновления."""
+        try:
+            user_id, epoch = read_refresh_token(data["refresh_token"])
+        except (signing.BadSignature, ValueError, TypeError):
+            raise serializers.ValidationError(
+                "Недействительный или просроченный токен обновления."
+            )
+
+        user = User.objects.filter(pk=user_id, is_active=True).first()
+        if user is None or user.token_epoch != epoch:
+            raise serializers.ValidationError("Токен обновления отозван.")
+
+        data["user"] = user
+        return data
@@ -1,9 +1,32 @@
+import csv
+import os
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
 
+from apps.core.testing import QueryBudgetMixin
+from apps.users.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+    TokenCache,
+    token_cache,
+)
+from apps.users.hashing import HashingPool, HashingPoolBusy, hashing_pool
+from apps.users.tokens import epoch_cache, issue_tokens
+
 User = get_user_model()
 
 
@@ -404,3 +427,609 @@ class TokenAuthenticationTestCase(APITestCase):
         response = self.client.get(self.me_url)
 
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    """Тесты кеширования проверки токенов."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="testpass123"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.me_url = reverse("auth-me")
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+
+    def test_repeated_requests_skip_token_query(self):
+        """Тест: повторный запрос с тем же токеном не обращается к базе."""
+        with self.assertNumQueries(1):
+            self.client.get(self.me_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.me_url)
+
+        self.assertEqual(response.data["username"], "testuser")
+
+    def test_cached_user_is_a_copy(self):
+        """Тест: изменения пользователя в запросе не попадают в кеш."""
+        user, _ = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        user.first_name = "Changed"
+
+        cached, token = CachedTokenAuthentication().authenticate_credentials(
+            self.token.key
+        )
+
+        self.assertEqual(cached.first_name, "")
+        self.assertIs(token.user, cached)
+
+    def test_logout_invalidates_cache(self):
+        """Тест: после выхода закешированный токен отклоняется."""
+        self.client.get(self.me_url)
+        self.client.post(reverse("auth-logout"))
+
+        response = self.client.get(self.me_url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_change_password_invalidates_cache(self):
+        """Тест: после смены пароля старый токен отклоняется."""
+        self.client.get(self.me_url)
+        response = self.client.post(
+            reverse("auth-change-password"),
+            {
+                "old_password": "testpass123",
+                "new_password": "newpass12345",
+                "new_password_confirm": "newpass12345",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.me_url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_update_profile_invalidates_cache(self):
+        """Тест: после обновления профиля запросы видят новые данные."""
+        self.client.get(self.me_url)
+        self.client.patch(
+            reverse("auth-update-profile"), {"first_name": "Иван"}, format="json"
+        )
+
+        response = self.client.get(self.me_url)
+
+        self.assertEqual(response.data["first_name"], "Иван")
+
+    def test_entries_expire(self):
+        """Тест: записи старше TTL проверяются заново."""
+        cache = TokenCache(max_size=10, ttl=0)
+        cache.set(self.token.key, self.user, self.token)
+
+        self.assertIsNone(cache.get(self.token.key))
+
+    def test_cache_is_bounded(self):
+        """Тест: при переполнении вытесняются давно использованные токены."""
+        cache = TokenCache(max_size=2, ttl=60)
+        users = [
+            User.objects.create_user(username=f"user_{i}", password="testpass123")
+            for i in range(3)
+        ]
+        tokens = [Token.objects.create(user=user) for user in users]
+
+        cache.set(tokens[0].key, users[0], tokens[0])
+        cache.set(tokens[1].key, users[1], tokens[1])
+        cache.get(tokens[0].key)
+        cache.set(tokens[2].key, users[2], tokens[2])
+
+        self.assertIsNotNone(cache.get(tokens[0].key))
+        self.assertIsNone(cache.get(tokens[1].key))
+        self.assertIsNotNone(cache.get(tokens[2].key))
+
+
+class SignedTokenAuthenticationTestCase(APITestCase):
+    """Тесты подписанных токенов доступа."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="testpass123",
+            is_author=True,
+        )
+        self.me_url = reverse("auth-me")
+        self.refresh_url = reverse("auth-refresh")
+        epoch_cache.clear()
+        self.addCleanup(epoch_cache.clear)
+
+    def login(self):
+        response = self.client.post(
+            reverse("auth-login"),
+            {"username": "testuser", "password": "testpass123"},
+            format="json",
+        )
+        self.client.cookies.clear()
+        return response.data
+
+    def test_login_issues_signed_tokens(self):
+        """Тест: вход возвращает токены доступа и обновления."""
+        data = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {data['access_token']}")
+
+        response = self.client.get(self.me_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["username"], "testuser")
+        self.assertIn("refresh_token", data)
+        self.assertIn("token", data)
+
+    def test_verification_with_cached_epoch_skips_database(self):
+        """Тест: при закешированной эпохе токен проверяется без запросов."""
+        access = issue_tokens(self.user)["access_token"]
+        authentication = SignedTokenAuthentication()
+        with self.assertNumQueries(1):
+            authentication.authenticate_credentials(access)
+
+        with self.assertNumQueries(0):
+            user, _ = authentication.authenticate_credentials(access)
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertTrue(user.is_author)
+
+    def test_tampered_token_rejected(self):
+        """Тест: изменённый токен отклоняется."""
+        access = issue_tokens(self.user)["access_token"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access[:-1]}x")
+
+        response = self.client.get(self.me_url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_expired_token_rejected(self):
+        """Тест: просроченный токен отклоняется."""
+        access = issue_tokens(self.user)["access_token"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+        with override_settings(
+            SIGNED_TOKENS={**settings.SIGNED_TOKENS, "ACCESS_TTL": -1}
+        ):
+            response = self.client.get(self.me_url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user_rejected(self):
+        """Тест: токен отключённого пользователя отклоняется."""
+        access = issue_tokens(self.user)["access_token"]
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+        response = self.client.get(self.me_url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_role_change_revokes_signed_tokens(self):
+        """Тест: снятие прав автора или отключение отзывает выданные токены."""
+        for field in ("is_author", "is_active"):
+            with self.subTest(field=field):
+                user = User.objects.get(pk=self.user.pk)
+                access = issue_tokens(user)["access_token"]
+                setattr(user, field, False)
+                user.save()
+                self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+                response = self.client.get(self.me_url)
+
+                self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+                User.objects.filter(pk=self.user.pk).update(
+                    is_author=True, is_active=True
+                )
+
+    def test_profile_update_does_not_restore_token_claims(self):
+        """Тест: сохранение профиля по старому токену не возвращает права автора."""
+        access = issue_tokens(self.user)["access_token"]
+        # Массовое обновление эпоху не меняет: токен остаётся действительным
+        User.objects.filter(pk=self.user.pk).update(is_author=False)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+        response = self.client.patch(
+            reverse("auth-update-profile"), {"first_name": "New"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, "New")
+        self.assertFalse(self.user.is_author)
+
+    def test_logout_revokes_signed_tokens(self):
+        """Тест: после выхода токены доступа и обновления отклоняются."""
+        data = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {data['access_token']}")
+        self.client.post(reverse("auth-logout"))
+
+        response = self.client.get(self.me_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials()
+        response = self.client.post(
+            self.refresh_url, {"refresh_token": data["refresh_token"]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_change_password_reissues_signed_tokens(self):
+        """Тест: смена пароля отзывает старые токены и выдаёт новые."""
+        old = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {old['access_token']}")
+        response = self.client.post(
+            reverse("auth-change-password"),
+            {
+                "old_password": "testpass123",
+                "new_password": "newpass12345",
+                "new_password_confirm": "newpass12345",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        new_access = response.data["access_token"]
+
+        self.assertEqual(
+            self.client.get(self.me_url).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {new_access}")
+        self.assertEqual(self.client.get(self.me_url).status_code, status.HTTP_200_OK)
+
+    def test_refresh_issues_new_access_token(self):
+        """Тест: токен обновления обменивается на новый токен доступа."""
+        data = self.login()
+
+        response = self.client.post(
+            self.refresh_url, {"refresh_token": data["refresh_token"]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+        )
+        self.assertEqual(self.client.get(self.me_url).status_code, status.HTTP_200_OK)
+
+    def test_refresh_rejects_access_token(self):
+        """Тест: токен доступа нельзя использовать как токен обновления."""
+        data = self.login()
+
+        response = self.client.post(
+            self.refresh_url, {"refresh_token": data["access_token"]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ApiModeTestCase(APITestCase):
+    """Тесты режима API: без сессий и лишних middleware."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="testpass123"
+        )
+        self.login_url = reverse("auth-login")
+        self.data = {"username": "testuser", "password": "testpass123"}
+
+    def test_token_login_does_not_create_session(self):
+        """Тест: вход в режиме API не создаёт сессию и cookie."""
+        response = self.client.post(self.login_url, self.data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Session.objects.count(), 0)
+        self.assertNotIn("sessionid", response.cookies)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    @override_settings(API_MODE={"ENABLED": False, "PATH_PREFIX": "/api/"})
+    def test_full_stack_login_creates_session(self):
+        """Тест: без режима API вход по-прежнему создаёт сессию."""
+        response = self.client.post(self.login_url, self.data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Session.objects.count(), 1)
+
+    def test_api_skips_web_middleware(self):
+        """Тест: ответы API без X-Frame-Options, админка - с полным стеком."""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        response = self.client.get(reverse("auth-me"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("X-Frame-Options", response.headers)
+
+        response = self.client.get(reverse("admin:login"))
+        self.assertEqual(response.headers["X-Frame-Options"], "DENY")
+        self.assertIn("csrftoken", response.cookies)
+
+    def test_logout_without_session(self):
+        """Тест: выход в режиме API работает без сессии."""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        response = self.client.post(reverse("auth-logout"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+
+
+class HashingPoolTestCase(APITestCase):
+    """Тесты пула хеширования паролей и асинхронных эндпоинтов."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="testpass123"
+        )
+        self.login_data = {"username": "testuser", "password": "testpass123"}
+
+    def test_pool_rejects_over_queue_limit(self):
+        """Тест: операции сверх предела очереди сразу отклоняются."""
+        pool = HashingPool(workers=1, max_pending=1, retry_after=3)
+        release = threading.Event()
+        future = pool.submit("test", release.wait)
+
+        with self.assertRaises(HashingPoolBusy) as context:
+            pool.submit("test", release.wait)
+        self.assertEqual(context.exception.wait, 3)
+
+        release.set()
+        future.result()
+        self.assertEqual(pool.run("test", len, "abc"), 3)
+
+    def test_pool_limit_is_shared_between_processes(self):
+        """Тест: слоты, занятые другим процессом, учитываются в пределе очереди."""
+        path = os.path.join(tempfile.mkdtemp(), "hashing.slots")
+        self.addCleanup(os.remove, path)
+        acquired_read, acquired_write = os.pipe()
+        done_read, done_write = os.pipe()
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                pool = HashingPool(workers=1, max_pending=1, retry_after=1, path=path)
+                pool.acquire()
+                os.write(acquired_write, b"1")
+                os.read(done_read, 1)
+            finally:
+                os._exit(0)
+        os.read(acquired_read, 1)
+
+        pool = HashingPool(workers=1, max_pending=1, retry_after=1, path=path)
+        with self.assertRaises(HashingPoolBusy):
+            pool.submit("test", len, "abc")
+
+        os.write(done_write, b"1")
+        os.waitpid(pid, 0)
+        for descriptor in (acquired_read, acquired_write, done_read, done_write):
+            os.close(descriptor)
+        self.assertEqual(pool.run("test", len, "abc"), 3)
+
+    def test_busy_pool_does_not_affect_model_and_admin(self):
+        """Тест: занятый пул не мешает входу в админку и методам модели."""
+        admin = User.objects.create_superuser(username="admin", password="adminpass123")
+
+        with mock.patch.object(hashing_pool, "max_pending", 0):
+            self.assertTrue(admin.check_password("adminpass123"))
+            response = self.client.post(
+                reverse("admin:login"),
+                {"username": "admin", "password": "adminpass123"},
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+
+    def test_pool_busy_returns_retry_after(self):
+        """Тест: при переполненном пуле вход отвечает 503 с Retry-After."""
+        for url in (reverse("auth-login"), reverse("auth-async-login")):
+            with self.subTest(url=url), mock.patch.object(
+                hashing_pool, "max_pending", 0
+            ):
+                response = self.client.post(url, self.login_data, format="json")
+
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response.headers["Retry-After"], "1")
+
+    def test_async_login(self):
+        """Тест: асинхронный вход возвращает те же данные, что и обычный."""
+        response = self.client.post(
+            reverse("auth-async-login"), self.login_data, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["user"]["username"], "testuser")
+        self.assertEqual(data["token"], Token.objects.get(user=self.user).key)
+        self.assertIn("access_token", data)
+
+    def test_async_login_wrong_password(self):
+        """Тест: асинхронный вход с неверным паролем."""
+        for username in ("testuser", "missing"):
+            response = self.client.post(
+                reverse("auth-async-login"),
+                {"username": username, "password": "wrongpass"},
+                format="json",
+            )
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("non_field_errors", response.json())
+
+    def test_async_register(self):
+        """Тест: асинхронная регистрация создаёт пользователя и токен."""
+        data = {
+            "username": "newuser",
+            "email": "newuser@example.com",
+            "password": "securepass123",
+            "password_confirm": "securepass123",
+        }
+
+        response = self.client.post(reverse("auth-async-register"), data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = User.objects.get(username="newuser")
+        self.assertTrue(user.check_password("securepass123"))
+        self.assertTrue(Token.objects.filter(user=user).exists())
+
+        response = self.client.post(reverse("auth-async-register"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("username", response.json())
+
+    def test_async_change_password(self):
+        """Тест: асинхронная смена пароля пересоздаёт токен."""
+        token = Token.objects.create(user=self.user)
+        url = reverse("auth-async-change-password")
+        data = {
+            "old_password": "wrongpass",
+            "new_password": "newpass12345",
+            "new_password_confirm": "newpass12345",
+        }
+
+        self.assertEqual(
+            self.client.post(url, data, format="json").status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("old_password", response.json())
+
+        data["old_password"] = "testpass123"
+        response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("newpass12345"))
+        self.assertNotEqual(response.json()["token"], token.key)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ImportUsersCommandTestCase(APITestCase):
+    """Тесты команды import_users."""
+
+    def setUp(self):
+        User.objects.create_user(
+            username="existing", email="taken@example.com", password="testpass123"
+        )
+        self.path = self.write_csv(
+            [
+                ["username", "email", "password", "first_name", "is_author"],
+                ["alice", "alice@example.com", "alicepass1", "Алиса", "1"],
+                ["bob", "", "bobpass123", "", ""],
+                ["carol", "carol@example.com", "", "", ""],
+                ["existing", "new@example.com", "x", "", ""],
+                ["dave", "taken@example.com", "x", "", ""],
+                ["alice", "other@example.com", "x", "", ""],
+                ["bad user!", "", "x", "", ""],
+                ["erin", "not-an-email", "x", "", ""],
+            ]
+        )
+
+    def write_csv(self, rows):
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w", newline="") as csv_file:
+            csv.writer(csv_file).writerows(rows)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_import_creates_users_and_tokens(self):
+        """Тест: импорт создаёт пользователей с паролями и токенами."""
+        tokens_path = self.write_csv([])
+        out = StringIO()
+
+        call_command(
+            "import_users",
+            self.path,
+            batch_size=2,
+            workers=2,
+            tokens_output=tokens_path,
+            stdout=out,
+        )
+
+        alice = User.objects.get(username="alice")
+        self.assertTrue(alice.check_password("alicepass1"))
+        self.assertTrue(alice.is_author)
+        self.assertEqual(alice.first_name, "Алиса")
+        self.assertFalse(User.objects.get(username="carol").has_usable_password())
+        self.assertFalse(User.objects.filter(username="dave").exists())
+        self.assertEqual(
+            Token.objects.filter(user__username__in=["alice", "bob", "carol"]).count(),
+            3,
+        )
+        with open(tokens_path) as tokens_file:
+            rows = list(csv.DictReader(tokens_file))
+        self.assertEqual(
+            {row["username"]: row["token"] for row in rows},
+            dict(
+                Token.objects.filter(
+                    user__username__in=["alice", "bob", "carol"]
+                ).values_list("user__username", "key")
+            ),
+        )
+        self.assertIn("создано: 3, уже существуют: 2", out.getvalue())
+        self.assertIn("дубли в файле: 1, некорректных: 2", out.getvalue())
+
+    def test_dedupe_is_one_query_per_batch(self):
+        """Тест: проверка существующих пользователей - один запрос на пачку."""
+        with CaptureQueriesContext(connection) as queries:
+            call_command(
+                "import_users", self.path, batch_size=4, workers=1, stdout=StringIO()
+            )
+
+        lookups = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith('SELECT "users"."username", "users"."email"')
+        ]
+        self.assertEqual(len(lookups), 2)
+
+    def test_requires_username_column(self):
+        """Тест: CSV без колонки username отклоняется."""
+        path = self.write_csv([["email"], ["a@example.com"]])
+
+        with self.assertRaises(CommandError):
+            call_command("import_users", path, workers=1, stdout=StringIO())
+
+
+class AuthQueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+    """Бюджеты SQL-запросов эндпоинтов аутентификации."""
+
+    QUERY_BUDGETS = {
+        "login": 3,
+        "me": 0,
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="testpass123"
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def grow(self):
+        """Добавляет пользователей с токенами."""
+        users = User.objects.bulk_create(
+            [
+                User(username=f"user_{i}", email=f"user_{i}@example.com")
+                for i in range(50)
+            ]
+        )
+        Token.objects.bulk_create(
+            [Token(user=user, key=Token.generate_key()) for user in users]
+        )
+
+    def test_login_budget(self):
+        url = reverse("auth-login")
+        data = {"username": "testuser", "password": "testpass123"}
+
+        def login():
+            # Каждый вход выполняется без cookie сессии предыдущего
+            self.client.cookies.clear()
+            return self.client.post(url, data, format="json")
+
+        self.assertQueryBudget("login", login, self.grow)
+
+    def test_me_budget(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        # Бюджет считается для тёплого кеша токенов
+        CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        url = reverse("auth-me")
+        self.assertQueryBudget("me", lambda: self.client.get(url), self.grow)
@@ -1,11 +1,18 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import AuthViewSet
+from .views import AuthViewSet, async_change_password, async_login, async_register
 
 router = DefaultRouter()
 router.register(r"auth", AuthViewSet, basename="auth")
 
 urlpatterns = [
+    path("auth/async/login/", async_login, name="auth-async-login"),
+    path("auth/async/register/", async_register, name="auth-async-register"),
+    path(
+        "auth/async/change-password/",
+        async_change_password,
+        name="auth-async-change-password",
+    ),
     path("", include(router.urls)),
 ]
@@ -1,14 +1,33 @@
-from django.contrib.auth import login, logout
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import alogin, hashers, login, logout, user_logged_in
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework import status, viewsets
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
+from apps.users.authentication import token_cache
+from apps.users.hashing import (
+    HashingPoolBusy,
+    hashing_pool,
+    make_user_password,
+    verify_password,
+)
 from apps.users.models import User
+from apps.users.tokens import issue_tokens, load_user, revoke_tokens
 
 from .serializers import (
     ChangePasswordSerializer,
+    RefreshTokenSerializer,
     UserLoginSerializer,
     UserRegistrationSerializer,
     UserSerializer,
@@ -23,6 +42,22 @@ class AuthViewSet(viewsets.GenericViewSet):
     permission_classes = [AllowAny]
     serializer_class = UserSerializer
 
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Профилю нужны все поля пользователя, а не только утверждения токена
+        load_user(request.user)
+
+    def _login(self, request, user):
+        """
+        Вход с сессией, если она есть; в режиме API (без SessionMiddleware)
+        клиент работает по токену, и сессия в базе не создаётся.
+        """
+        if hasattr(request, "session"):
+            login(request, user)
+        else:
+            request.user = user
+            user_logged_in.send(sender=user.__class__, request=request, user=user)
+
     def get_serializer_class(self):
         if self.action == "register":
             return UserRegistrationSerializer
@@ -30,6 +65,8 @@ class AuthViewSet(viewsets.GenericViewSet):
             return UserLoginSerializer
         elif self.action == "change_password":
             return ChangePasswordSerializer
+        elif self.action == "refresh":
+            return RefreshTokenSerializer
         return UserSerializer
 
     @action(detail=False, methods=["post"], permission_classes=[AllowAny])
@@ -43,20 +80,26 @@ class AuthViewSet(viewsets.GenericViewSet):
         # Удаляем password_confirm перед созданием пользователя
         validated_data = serializer.validated_data.copy()
         validated_data.pop("password_confirm")
+        password = validated_data.pop("password")
 
-        # Создаём пользователя
-        user = User.objects.create_user(**validated_data)
+        # Создаём пользователя; пароль хешируется в пуле
+        user = User(**validated_data)
+        user.username = User.normalize_username(user.username)
+        user.email = User.objects.normalize_email(user.email)
+        user.password = make_user_password(password)
+        user.save()
 
         # Создаём токен
         token, created = Token.objects.get_or_create(user=user)
 
         # Логиним пользователя
-        login(request, user)
+        self._login(request, user)
 
         return Response(
             {
                 "user": UserSerializer(user).data,
                 "token": token.key,
+                **issue_tokens(user),
                 "message": "Регистрация прошла успешно.",
             },
             status=status.HTTP_201_CREATED,
@@ -76,17 +119,36 @@ class AuthViewSet(viewsets.GenericViewSet):
         token, created = Token.objects.get_or_create(user=user)
 
         # Логиним пользователя
-        login(request, user)
+        self._login(request, user)
 
         return Response(
             {
                 "user": UserSerializer(user).data,
                 "token": token.key,
+                **issue_tokens(user),
                 "message": "Вход выполнен успешно.",
             },
             status=status.HTTP_200_OK,
         )
 
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[AllowAny],
+        authentication_classes=[],
+    )
+    def refresh(self, request):
+        """
+        Обмен токена обновления на новую пару подписанных токенов.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        return Response(
+            issue_tokens(serializer.validated_data["user"]),
+            status=status.HTTP_200_OK,
+        )
+
     @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated])
     def logout(self, request):
         """
@@ -97,9 +159,12 @@ class AuthViewSet(viewsets.GenericViewSet):
             request.user.auth_token.delete()
         except:
             pass
+        token_cache.invalidate_user(request.user.id)
+        revoke_tokens(request.user)
 
         # Выполняем logout
-        logout(request)
+        if hasattr(request, "session"):
+            logout(request)
 
         return Response(
             {"message": "Выход выполнен успешно."}, status=status.HTTP_200_OK
@@ -125,6 +190,7 @@ class AuthViewSet(viewsets.GenericViewSet):
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        token_cache.invalidate_user(request.user.id)
 
         return Response(
             {
@@ -143,8 +209,10 @@ class AuthViewSet(viewsets.GenericViewSet):
         serializer.is_valid(raise_exception=True)
 
         # Устанавливаем новый пароль
-        request.user.set_password(serializer.validated_data["new_password"])
-        request.user.save()
+        request.user.password = make_user_password(
+            serializer.validated_data["new_password"]
+        )
+        request.user.save(update_fields=["password"])
 
         # Пересоздаём токен для безопасности
         try:
@@ -152,11 +220,217 @@ class AuthViewSet(viewsets.GenericViewSet):
         except:
             pass
         token = Token.objects.create(user=request.user)
+        token_cache.invalidate_user(request.user.id)
+        revoke_tokens(request.user)
 
         return Response(
             {
                 "message": "Пароль изменён успешно.",
                 "token": token.key,
+                **issue_tokens(request.user),
             },
             status=status.HTTP_200_OK,
         )
+
+
+# Асинхронные версии входа, регистрации и смены пароля. Хеширование
+# выполняется в пуле apps.users.hashing, и под ASGI поток обработки запросов
+# не ждёт PBKDF2; при переполнении очереди пула отвечают 503 с Retry-After.
+
+
+class AsyncChangePasswordSerializer(ChangePasswordSerializer):
+    def validate_old_password(self, value):
+        # Текущий пароль проверяется в пуле хеширования, см. async_change_password
+        return value
+
+
+def _json_response(data, status_code, headers=None):
+    return JsonResponse(
+        data,
+        status=status_code,
+        headers=headers,
+        json_dumps_params={"ensure_ascii": False, "separators": (",", ":")},
+    )
+
+
+def _async_auth_endpoint(view):
+    """Разбирает JSON-тело POST-запроса и отвечает 503 при занятом пуле."""
+
+    @functools.wraps(view)
+    async def wrapper(request):
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return _json_response(
+                {"detail": "Некорректный JSON."}, status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            return await view(request, data)
+        except HashingPoolBusy as error:
+            return _json_response(
+                {"detail": str(error.detail)},
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                {"Retry-After": str(error.wait)},
+            )
+
+    return csrf_exempt(require_POST(wrapper))
+
+
+async def _login(request, user):
+    """Как AuthViewSet._login: сессия создаётся только вне режима API."""
+    if hasattr(request, "session"):
+        await alogin(request, user)
+    else:
+        request.user = user
+        await user_logged_in.asend(sender=user.__class__, request=request, user=user)
+
+
+def _authenticate(request):
+    """Аутентифицирует запрос классами DRF и возвращает полного пользователя."""
+    request = Request(
+        request,
+        authenticators=[
+            authentication()
+            for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ],
+    )
+    user = request.user
+    if not user.is_authenticated:
+        raise NotAuthenticated()
+    load_user(user)
+    return user
+
+
+@_async_auth_endpoint
+async def async_login(request, data):
+    """
+    Асинхронный вход в систему.
+    """
+    username = data.get("username")
+    password = data.get("password")
+    if not username or not password:
+        return _json_response(
+            {"non_field_errors": ["Необходимо указать имя пользователя и пароль."]},
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    user = await User.objects.filter(username=username).afirst()
+    if user is None:
+        # Как ModelBackend: хеш считается и для несуществующего пользователя,
+        # чтобы время ответа не выдавало существующие имена
+        await hashing_pool.arun("make_password", hashers.make_password, password)
+        valid = False
+    else:
+        valid, upgraded = await hashing_pool.arun(
+            "check_password", verify_password, password, user.password
+        )
+        if upgraded is not None:
+            user.password = upgraded
+            await user.asave(update_fields=["password"])
+    if not valid or not user.is_active:
+        return _json_response(
+            {"non_field_errors": ["Неверное имя пользователя или пароль."]},
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    token, created = await Token.objects.aget_or_create(user=user)
+    await _login(request, user)
+
+    return _json_response(
+        {
+            "user": UserSerializer(user).data,
+            "token": token.key,
+            **issue_tokens(user),
+            "message": "Вход выполнен успешно.",
+        },
+        status.HTTP_200_OK,
+    )
+
+
+@_async_auth_endpoint
+async def async_register(request, data):
+    """
+    Асинхронная регистрация нового пользователя.
+    """
+    serializer = UserRegistrationSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return _json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+    validated_data = serializer.validated_data.copy()
+    validated_data.pop("password_confirm")
+    password = validated_data.pop("password")
+
+    user = User(**validated_data)
+    user.username = User.normalize_username(user.username)
+    user.email = User.objects.normalize_email(user.email)
+    user.password = await hashing_pool.arun(
+        "make_password", hashers.make_password, password
+    )
+    await user.asave()
+
+    token = await Token.objects.acreate(user=user)
+    await _login(request, user)
+
+    return _json_response(
+        {
+            "user": UserSerializer(user).data,
+            "token": token.key,
+            **issue_tokens(user),
+            "message": "Регистрация прошла успешно.",
+        },
+        status.HTTP_201_CREATED,
+    )
+
+
+@_async_auth_endpoint
+async def async_change_password(request, data):
+    """
+    Асинхронная смена пароля.
+    """
+    try:
+        user = await sync_to_async(_authenticate)(request)
+    except (AuthenticationFailed, NotAuthenticated) as error:
+        return _json_response(
+            {"detail": str(error.detail)}, status.HTTP_401_UNAUTHORIZED
+        )
+
+    serializer = AsyncChangePasswordSerializer(data=data)
+    if not serializer.is_valid():
+        return _json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+    valid, _ = await hashing_pool.arun(
+        "check_password",
+        verify_password,
+        serializer.validated_data["old_password"],
+        user.password,
+    )
+    if not valid:
+        return _json_response(
+            {"old_password": ["Неверный текущий пароль."]},
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    user.password = await hashing_pool.arun(
+        "make_password",
+        hashers.make_password,
+        serializer.validated_data["new_password"],
+    )
+    await user.asave(update_fields=["password"])
+
+    # Пересоздаём токен для безопасности
+    await Token.objects.filter(user=user).adelete()
+    token = await Token.objects.acreate(user=user)
+    token_cache.invalidate_user(user.id)
+    await sync_to_async(revoke_tokens)(user)
+
+    return _json_response(
+        {
+            "message": "Пароль изменён успешно.",
+            "token": token.key,
+            **issue_tokens(user),
+        },
+        status.HTTP_200_OK,
+    )
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "apps.core"
+
+    def ready(self):
+        from django.conf import settings
+
+        if settings.REQUEST_PROFILING["ENABLED"]:
+            from apps.core.profiling import install_serializer_timing
+
+            install_serializer_timing()
@@ -0,0 +1,153 @@
+"""
+Сжатие ответов (apps.core.middleware.CompressionMiddleware).
+
+Кодировка выбирается по Accept-Encoding: brotli, если установлен пакет
+brotli, иначе gzip. Сжатые тела ответов с ETag кешируются в памяти
+процесса, поэтому неизменный ответ (опубликованный опрос) сжимается один
+раз, а не на каждый запрос.
+"""
+
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+
+from apps.core.metrics import record_cache
+
+try:
+    import brotli
+except ImportError:  # brotli - необязательная зависимость
+    brotli = None
+
+
+def compress_gzip(content, level):
+    # mtime=0: одинаковые тела дают одинаковые байты
+    return gzip.compress(content, compresslevel=level, mtime=0)
+
+
+def compress_brotli(content, level):
+    return brotli.compress(content, quality=level)
+
+
+# Кодировки в порядке предпочтения сервера
+ENCODERS = OrderedDict()
+if brotli is not None:
+    ENCODERS["br"] = compress_brotli
+ENCODERS["gzip"] = compress_gzip
+
+
+def encoded_etag(etag, encoding):
+    """ETag сжатого представления: тело другое, поэтому и тег другой."""
+    weak = etag.startswith("W/")
+    opaque = etag.removeprefix("W/")
+    return f'{"W/" if weak else ""}{opaque[:-1]}-{encoding}"'
+
+
+def accepted_encodings(header):
+    """Словарь «кодировка -> q» из Accept-Encoding."""
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            accepted[coding] = quality
+    return accepted
+
+
+def negotiate(header, available=None):
+    """Первая из доступных кодировок, принимаемая клиентом, или None."""
+    accepted = accepted_encodings(header)
+    for encoding in available or ENCODERS:
+        # Явный q=0 запрещает кодировку, даже если разрешена «*»
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+class CompressedBodyCache:
+    """
+    LRU-кеш сжатых тел по (ETag, кодировка, уровень, длина тела).
+
+    Размер ограничен суммарным объёмом сжатых тел в байтах.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is not None:
+                self.entries.move_to_end(key)
+        record_cache("compressed_body", body is not None)
+        return body
+
+    def set(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self.entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+def gzip_compressor(level):
+    # wbits=31: поток в формате gzip с заголовком и контрольной суммой
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def brotli_compressor(level):
+    compressor = brotli.Compressor(quality=level)
+    return compressor.process, compressor.finish
+
+
+STREAM_COMPRESSORS = {"gzip": gzip_compressor, "br": brotli_compressor}
+
+
+def compress_stream(chunks, encoding, level):
+    """Сжимает поток частей ответа, отдавая сжатые данные после каждой части."""
+    process, finish = STREAM_COMPRESSORS[encoding](level)
+    for chunk in chunks:
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def compress(content, encoding, level, etag=None, cache=None):
+    """Сжимает тело; при наличии ETag результат берётся из cache."""
+    if etag is None or cache is None:
+        return ENCODERS[encoding](content, level)
+    key = (etag, encoding, level, len(content))
+    body = cache.get(key)
+    if body is None:
+        body = ENCODERS[encoding](content, level)
+        cache.set(key, body)
+    return body
+
+
+compressed_bodies = CompressedBodyCache(settings.COMPRESSION["CACHE_MAX_BYTES"])
@@ -0,0 +1,431 @@
+import json
+import platform
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from api.surveys.views import SurveyViewSet
+from api.users.views import AuthViewSet
+from apps.surveys.models import Survey
+
+User = get_user_model()
+
+ENDPOINT_SCENARIOS = [
+    "list",
+    "retrieve",
+    "next-question",
+    "submit-answer",
+    "submit-and-advance",
+    "statistics",
+    "my-session",
+    "login",
+]
+
+# Сценарии набора middleware: чтение токен-клиентом и вход
+MIDDLEWARE_SCENARIOS = ["retrieve", "login"]
+
+# Сценарии набора renderers: ответы, собираемые без ModelSerializer
+RENDERER_SCENARIOS = ["list", "retrieve", "next-question"]
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по методу ближайшего ранга для отсортированного списка."""
+    if not sorted_values:
+        return 0.0
+    index = max(
+        0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+def read_response(response):
+    """Рендерит ответ и читает тело целиком, как это сделал бы сервер."""
+    if response.streaming:
+        return b"".join(response.streaming_content)
+    if hasattr(response, "render"):
+        response.render()
+    return response.content
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет задержку, пропускную способность и запросы к БД основных "
+        "эндпоинтов, вызывая ViewSet'ы внутри процесса"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--suite",
+            choices=["endpoints", "middleware", "renderers"],
+            default="endpoints",
+            help=(
+                "endpoints - ViewSet'ы напрямую; middleware - полный стек "
+                "middleware против режима API_MODE; renderers - сериализаторы "
+                "DRF против FAST_RENDERING"
+            ),
+        )
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            choices=ENDPOINT_SCENARIOS,
+            help="Запустить только указанные сценарии (можно повторять)",
+        )
+        parser.add_argument(
+            "--survey",
+            type=int,
+            help="ID опроса; по умолчанию - активный опрос с наибольшим числом сессий",
+        )
+        parser.add_argument("--respondents", type=int, default=50)
+        parser.add_argument(
+            "--password",
+            default="password123",
+            help="Пароль респондентов для сценария login",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Путь для сохранения результатов в JSON")
+        parser.add_argument(
+            "--baseline", help="JSON с результатами предыдущего запуска для сравнения"
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=10.0,
+            help="Допустимый рост p95 относительно baseline, в процентах",
+        )
+        parser.add_argument(
+            "--keep-writes",
+            action="store_true",
+            help="Не откатывать изменения, сделанные сценариями",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options["seed"])
+        self.factory = APIRequestFactory()
+        scenarios = options["scenarios"] or ENDPOINT_SCENARIOS
+
+        results = {}
+        with transaction.atomic():
+            self._load_fixtures()
+            if options["suite"] == "middleware":
+                results = self._run_middleware_suite()
+            elif options["suite"] == "renderers":
+                results = self._run_renderers_suite()
+            else:
+                for name in scenarios:
+                    view, build_request = getattr(
+                        self, "scenario_" + name.replace("-", "_")
+                    )()
+                    results[name] = self._measure(name, view, build_request)
+                    self._print_result(name, results[name])
+
+            if not options["keep_writes"]:
+                transaction.set_rollback(True)
+
+        report = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "suite": options["suite"],
+                "iterations": options["iterations"],
+                "survey_id": self.survey.id,
+                "seed": options["seed"],
+            },
+            "results": results,
+        }
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(report, output, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Результаты сохранены в {options['output']}")
+
+        if options["baseline"]:
+            self._check_regressions(results)
+
+    def _load_fixtures(self):
+        """Выбирает опрос, его автора и респондентов для сценариев."""
+        surveys = Survey.objects.filter(is_active=True)
+        if self.options["survey"]:
+            self.survey = surveys.filter(id=self.options["survey"]).first()
+        else:
+            self.survey = (
+                surveys.annotate(sessions_total=Count("sessions"))
+                .order_by("-sessions_total", "id")
+                .first()
+            )
+        if self.survey is None:
+            raise CommandError(
+                "Нет активного опроса. Сгенерируйте данные командой generate_load_data."
+            )
+
+        self.questions = [
+            (question.id, [option.id for option in question.answer_options.all()])
+            for question in self.survey.questions.prefetch_related("answer_options")
+        ]
+        self.questions = [item for item in self.questions if item[1]]
+        if not self.questions:
+            raise CommandError("У выбранного опроса нет вопросов с вариантами ответа.")
+
+        self.author = self.survey.author
+        self.respondents = list(
+            User.objects.filter(is_author=False, is_active=True).order_by("id")[
+                : self.options["respondents"]
+            ]
+        )
+        if not self.respondents:
+            raise CommandError("Нет пользователей-респондентов.")
+        # Для my-session нужны респонденты, у которых уже есть сессия
+        self.session_users = list(
+            User.objects.filter(survey_sessions__survey=self.survey)
+            .distinct()
+            .order_by("id")[: self.options["respondents"]]
+        )
+
+        self.tokens = {
+            user.id: Token.objects.get_or_create(user=user)[0].key
+            for user in {self.author, *self.respondents, *self.session_users}
+        }
+
+    def _request(self, method, path, user=None, data=None):
+        extra = {}
+        if user is not None:
+            extra["HTTP_AUTHORIZATION"] = f"Token {self.tokens[user.id]}"
+        return getattr(self.factory, method)(path, data, format="json", **extra)
+
+    def _respondent(self, iteration):
+        return self.respondents[iteration % len(self.respondents)]
+
+    def scenario_list(self):
+        view = SurveyViewSet.as_view({"get": "list"})
+        return view, lambda i: (
+            self._request("get", "/api/surveys/", self._respondent(i)),
+            {},
+        )
+
+    def scenario_retrieve(self):
+        view = SurveyViewSet.as_view({"get": "retrieve"})
+        path = f"/api/surveys/{self.survey.id}/"
+        return view, lambda i: (
+            self._request("get", path, self._respondent(i)),
+            {"pk": self.survey.id},
+        )
+
+    def scenario_next_question(self):
+        view = SurveyViewSet.as_view({"get": "next_question"})
+        path = f"/api/surveys/{self.survey.id}/next-question/"
+        return view, lambda i: (
+            self._request("get", path, self._respondent(i)),
+            {"pk": self.survey.id},
+        )
+
+    def scenario_submit_answer(self, include_next=False):
+        view = SurveyViewSet.as_view({"post": "submit_answer"})
+        path = f"/api/surveys/{self.survey.id}/submit-answer/"
+
+        def build(i):
+            question_id, option_ids = self.rng.choice(self.questions)
+            data = {
+                "question_id": question_id,
+                "answer_option_id": self.rng.choice(option_ids),
+                "include_next": include_next,
+            }
+            return self._request("post", path, self._respondent(i), data), {
+                "pk": self.survey.id
+            }
+
+        return view, build
+
+    def scenario_submit_and_advance(self):
+        # Ответ вместе со следующим вопросом вместо пары submit-answer и
+        # next-question
+        return self.scenario_submit_answer(include_next=True)
+
+    def scenario_statistics(self):
+        view = SurveyViewSet.as_view({"get": "statistics"})
+        path = f"/api/surveys/{self.survey.id}/statistics/"
+        return view, lambda i: (
+            self._request("get", path, self.author),
+            {"pk": self.survey.id},
+        )
+
+    def scenario_my_session(self):
+        if not self.session_users:
+            raise CommandError(
+                "У выбранного опроса нет сессий для сценария my-session."
+            )
+
+        view = SurveyViewSet.as_view({"get": "my_session"})
+        path = f"/api/surveys/{self.survey.id}/my-session/"
+        return view, lambda i: (
+            self._request("get", path, self.session_users[i % len(self.session_users)]),
+            {"pk": self.survey.id},
+        )
+
+    def scenario_login(self):
+        view = AuthViewSet.as_view({"post": "login"})
+
+        def build(i):
+            data = {
+                "username": self._respondent(i).username,
+                "password": self.options["password"],
+            }
+            request = self._request("post", "/api/users/auth/login/", data=data)
+            # Вне режима API вход сохраняет сессию, как с SessionMiddleware
+            if not settings.API_MODE["ENABLED"]:
+                request.session = SessionStore()
+            return request, {}
+
+        return view, build
+
+    def _run_middleware_suite(self):
+        """
+        Сравнивает полный стек middleware с режимом API_MODE.
+
+        Запросы проходят через обработчик Django целиком, поэтому разница
+        между режимами - стоимость сессий, CSRF, сообщений и X-Frame-Options.
+        """
+        handler = BaseHandler()
+        handler.load_middleware()
+
+        def view(request, **kwargs):
+            return handler.get_response(request)
+
+        results = {}
+        for name in MIDDLEWARE_SCENARIOS:
+            _, build_request = getattr(self, "scenario_" + name)()
+            for mode, enabled in (("full", False), ("api", True)):
+                key = f"{name}:{mode}"
+                with override_settings(
+                    API_MODE={**settings.API_MODE, "ENABLED": enabled}
+                ):
+                    results[key] = self._measure(key, view, build_request)
+                self._print_result(key, results[key])
+
+            full, api = results[f"{name}:full"], results[f"{name}:api"]
+            self.stdout.write(
+                f"{name:<15} режим API быстрее на "
+                f"p50={full['p50_ms'] - api['p50_ms']:.2f}ms, "
+                f"запросов к БД меньше на "
+                f"{full['queries_per_request'] - api['queries_per_request']:.1f}"
+            )
+        return results
+
+    def _run_renderers_suite(self):
+        """
+        Сравнивает ModelSerializer с построителями api.rendering.
+
+        Запросы к базе в обоих режимах одинаковы, поэтому разница во
+        времени CPU на запрос - стоимость самих сериализаторов.
+        """
+        results = {}
+        for name in RENDERER_SCENARIOS:
+            view, build_request = getattr(self, "scenario_" + name.replace("-", "_"))()
+            for mode, enabled in (("serializer", False), ("fast", True)):
+                key = f"{name}:{mode}"
+                # Опубликованные файлы retrieve исключают сериализацию вовсе
+                with override_settings(
+                    FAST_RENDERING={**settings.FAST_RENDERING, "ENABLED": enabled},
+                    SURVEY_ARTIFACTS={**settings.SURVEY_ARTIFACTS, "ENABLED": False},
+                ):
+                    results[key] = self._measure(key, view, build_request)
+                self._print_result(key, results[key])
+
+            slow, fast = results[f"{name}:serializer"], results[f"{name}:fast"]
+            self.stdout.write(
+                f"{name:<15} без сериализаторов CPU на запрос меньше на "
+                f"{slow['cpu_ms_per_request'] - fast['cpu_ms_per_request']:.2f}ms, "
+                f"p50 быстрее на {slow['p50_ms'] - fast['p50_ms']:.2f}ms"
+            )
+        return results
+
+    def _measure(self, name, view, build_request):
+        """Выполняет сценарий и собирает задержку и статистику запросов к БД."""
+        for iteration in range(self.options["warmup"]):
+            request, kwargs = build_request(iteration)
+            read_response(view(request, **kwargs))
+
+        latencies = []
+        cpu_times = []
+        query_counts = []
+        db_times = []
+        for iteration in range(self.options["iterations"]):
+            request, kwargs = build_request(iteration)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                cpu_started = time.process_time()
+                response = view(request, **kwargs)
+                body = read_response(response)
+                cpu_times.append(time.process_time() - cpu_started)
+                latencies.append(time.perf_counter() - started)
+
+            if response.status_code >= 400:
+                raise CommandError(
+                    f"Сценарий {name} вернул {response.status_code}: " f"{body[:200]!r}"
+                )
+            query_counts.append(len(queries))
+            db_times.append(sum(float(query["time"]) for query in queries))
+
+        latencies.sort()
+        total_time = sum(latencies)
+        return {
+            "iterations": len(latencies),
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "mean_ms": statistics.fmean(latencies) * 1000,
+            "throughput_rps": len(latencies) / total_time if total_time else 0.0,
+            "cpu_ms_per_request": statistics.fmean(cpu_times) * 1000,
+            "queries_per_request": statistics.fmean(query_counts),
+            "max_queries": max(query_counts),
+            "db_time_ms_per_request": statistics.fmean(db_times) * 1000,
+        }
+
+    def _print_result(self, name, result):
+        self.stdout.write(
+            f"{name:<15} p50={result['p50_ms']:8.2f}ms "
+            f"p95={result['p95_ms']:8.2f}ms p99={result['p99_ms']:8.2f}ms "
+            f"{result['throughput_rps']:8.1f} rps "
+            f"queries={result['queries_per_request']:6.1f} "
+            f"db={result['db_time_ms_per_request']:7.2f}ms"
+        )
+
+    def _check_regressions(self, results):
+        """Сравнивает результаты с baseline и падает при превышении порога."""
+        with open(self.options["baseline"]) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+
+        limit = 1 + self.options["threshold"] / 100
+        regressions = []
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            if result["p95_ms"] > previous["p95_ms"] * limit:
+                regressions.append(
+                    f"{name}: p95 {previous['p95_ms']:.2f}ms -> {result['p95_ms']:.2f}ms"
+                )
+            if result["max_queries"] > previous["max_queries"]:
+                regressions.append(
+                    f"{name}: запросов {previous['max_queries']} -> "
+                    f"{result['max_queries']}"
+                )
+
+        if regressions:
+            raise CommandError("Обнаружены регрессии:\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS("Регрессий относительно baseline нет."))
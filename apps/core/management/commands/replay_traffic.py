@@ -0,0 +1,335 @@
+import asyncio
+import json
+import secrets
+import statistics
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from apps.core.management.commands.benchmark import percentile
+from apps.core.traffic import CREDENTIAL_MARKER, EMAIL_MARKER, user_alias
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Воспроизводит трафик, записанный TrafficCaptureMiddleware, против "
+        "локального сервера и выводит задержки по эндпоинтам. Идентификаторы "
+        "в путях не меняются, поэтому сервер должен работать с копией данных, "
+        "на которых трафик был записан. Синтетические пользователи получают "
+        "пароль --password; пароли найденных локальных пользователей "
+        "меняются только с --reset-passwords"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths", nargs="+", help="JSONL-файлы или каталоги с записанным трафиком"
+        )
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument(
+            "--speed",
+            type=float,
+            default=1.0,
+            help="Ускорение относительно записи; 0 - отправлять без пауз",
+        )
+        parser.add_argument("--limit", type=int, help="Воспроизвести первые N запросов")
+        parser.add_argument(
+            "--password",
+            default="password123",
+            help="Пароль псевдонимов пользователей при воспроизведении",
+        )
+        parser.add_argument(
+            "--reset-passwords",
+            action="store_true",
+            help="Заменить на --password и пароли найденных локальных "
+            "пользователей, чтобы воспроизводились их входы; только для "
+            "локальной копии базы",
+        )
+        parser.add_argument("--timeout", type=float, default=30.0)
+        parser.add_argument("--output", help="Путь для сохранения отчёта в JSON")
+
+    def handle(self, *args, **options):
+        self.options = options
+        records = self._load(options["paths"])
+        if options["limit"]:
+            records = records[: options["limit"]]
+        if not records:
+            raise CommandError("Нет записанных запросов.")
+
+        self._provision(records)
+
+        started = time.perf_counter()
+        results = asyncio.run(self._replay(records))
+        elapsed = time.perf_counter() - started
+
+        report = self._report(records, results, elapsed)
+        for name, result in sorted(report["endpoints"].items()):
+            self.stdout.write(
+                f"{name:<30} n={result['requests']:<6} "
+                f"p50={result['p50_ms']:8.2f}ms p95={result['p95_ms']:8.2f}ms "
+                f"p99={result['p99_ms']:8.2f}ms errors={result['errors']}"
+            )
+        self.stdout.write(
+            f"Всего {report['requests']} запросов за {elapsed:.2f}s, "
+            f"{report['throughput_rps']:.1f} rps, "
+            f"отставание от расписания p95={report['schedule_lag_p95_ms']:.1f}ms"
+        )
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(report, output, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Отчёт сохранён в {options['output']}")
+
+    def _load(self, paths):
+        files = []
+        for path in map(Path, paths):
+            if path.is_dir():
+                files.extend(sorted(path.glob("*.jsonl")))
+            elif path.exists():
+                files.append(path)
+            else:
+                raise CommandError(f"Файл {path} не найден.")
+
+        records = []
+        for path in files:
+            with open(path) as capture:
+                records.extend(json.loads(line) for line in capture if line.strip())
+        records.sort(key=lambda record: record["ts"])
+        return records
+
+    def _provision(self, records):
+        """
+        Сопоставляет псевдонимы из записи локальным пользователям.
+
+        Псевдоним ищется среди локальных пользователей (тот же HMAC при общем
+        SECRET_KEY), иначе создаётся синтетический пользователь с паролем
+        --password. Пароли локальных пользователей меняются только с
+        --reset-passwords; без него их запросы идут по выданным токенам, а
+        входы завершаются ошибкой. Псевдонимы, которые регистрируются в самом
+        трафике, получают уникальное для запуска имя, а их токен берётся из
+        ответа сервера.
+        """
+        run = secrets.token_hex(3)
+        registered = {
+            record["body"]["username"]
+            for record in records
+            if record["endpoint"] == "auth-register"
+            and isinstance(record["body"], dict)
+            and "username" in record["body"]
+        }
+        self.usernames = {alias: f"{alias}-{run}" for alias in registered}
+
+        authors = defaultdict(bool)
+        for record in records:
+            alias = record["user"]
+            if alias is None and record["endpoint"] == "auth-login":
+                alias = (record["body"] or {}).get("username")
+            if alias and alias not in registered:
+                authors[alias] |= record["is_author"]
+
+        local = {}
+        for username in User.objects.values_list("username", flat=True).iterator():
+            alias = user_alias(username)
+            if alias in authors:
+                local[alias] = username
+
+        password = make_password(self.options["password"])
+        synthetic = [alias for alias in authors if alias not in local]
+        User.objects.bulk_create(
+            [
+                User(username=alias, password=password, is_author=authors[alias])
+                for alias in synthetic
+            ],
+            ignore_conflicts=True,
+        )
+        # Синтетические пользователи прошлых запусков могли получить другой пароль
+        User.objects.filter(username__in=synthetic).update(password=password)
+        if self.options["reset_passwords"]:
+            User.objects.filter(username__in=local.values()).update(password=password)
+        self.usernames.update({alias: local.get(alias, alias) for alias in authors})
+
+        users = list(
+            User.objects.filter(username__in=[self.usernames[a] for a in authors])
+        )
+        tokens = dict(
+            Token.objects.filter(user__in=users).values_list("user__username", "key")
+        )
+        missing = [
+            Token(key=Token.generate_key(), user=user)
+            for user in users
+            if user.username not in tokens
+        ]
+        Token.objects.bulk_create(missing)
+        tokens.update({token.user.username: token.key for token in missing})
+        self.tokens = tokens
+
+        self.stdout.write(
+            f"Псевдонимов: {len(local)} найдено локально, "
+            f"{len(authors) - len(local)} создано, "
+            f"{len(registered)} регистрируются при воспроизведении"
+        )
+        if local and not self.options["reset_passwords"]:
+            self.stdout.write(
+                "Пароли локальных пользователей не изменены: их входы из записи "
+                "не пройдут (см. --reset-passwords)"
+            )
+
+    def _materialize(self, value, key=None):
+        """Подставляет локальные учётные данные вместо обезличенных значений."""
+        if isinstance(value, dict):
+            body = {
+                item_key: self._materialize(item, item_key)
+                for item_key, item in value.items()
+            }
+            if body.get("email") == EMAIL_MARKER:
+                body["email"] = (
+                    f"{body.get('username', secrets.token_hex(6))}@example.com"
+                )
+            return body
+        if isinstance(value, list):
+            return [self._materialize(item) for item in value]
+        if value == CREDENTIAL_MARKER:
+            return self.options["password"]
+        if key == "username":
+            return self.usernames.get(value, value)
+        return value
+
+    def _send(self, method, url, body, headers):
+        data = None if body is None else json.dumps(body).encode()
+        request = urllib.request.Request(url, data=data, headers=headers, method=method)
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(
+                request, timeout=self.options["timeout"]
+            ) as response:
+                status, payload = response.status, response.read()
+        except urllib.error.HTTPError as error:
+            status, payload = error.code, error.read()
+        except OSError:
+            status, payload = None, b""
+        return status, payload, time.perf_counter() - started
+
+    async def _execute(self, record):
+        alias = record["user"]
+        headers = {"Content-Type": "application/json"}
+        token = self.tokens.get(self.usernames.get(alias))
+        if token:
+            headers["Authorization"] = f"Token {token}"
+
+        url = self.options["base_url"].rstrip("/") + record["path"]
+        if record["query"]:
+            url += "?" + record["query"]
+
+        status, payload, duration = await asyncio.to_thread(
+            self._send,
+            record["method"],
+            url,
+            self._materialize(record["body"]),
+            headers,
+        )
+        self._remember_token(record, status, payload)
+        return status, duration
+
+    def _remember_token(self, record, status, payload):
+        """Обновляет токен пользователя после входа, регистрации и смены пароля."""
+        if status is None or status >= 400 or b'"token"' not in payload:
+            return
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            return
+
+        alias = record["user"]
+        if alias is None and isinstance(record["body"], dict):
+            alias = record["body"].get("username")
+        if alias is not None and isinstance(data.get("token"), str):
+            self.tokens[self.usernames.get(alias, alias)] = data["token"]
+
+    async def _replay(self, records):
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(
+            ThreadPoolExecutor(max_workers=self.options["concurrency"])
+        )
+        semaphore = asyncio.Semaphore(self.options["concurrency"])
+        speed = self.options["speed"]
+        first = records[0]["ts"]
+        start = loop.time()
+
+        # Запросы одного пользователя выполняются по порядку записи: иначе
+        # запрос может уйти раньше входа, выдавшего ему токен
+        previous = {}
+
+        async def run(record):
+            user = record["user"] or (
+                record["body"].get("username")
+                if isinstance(record["body"], dict)
+                else None
+            )
+            done = asyncio.Event()
+            before = previous.get(user) if user else None
+            if user:
+                previous[user] = done
+
+            try:
+                scheduled = (record["ts"] - first) / speed if speed else 0.0
+                delay = scheduled - (loop.time() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if before is not None:
+                    await before.wait()
+                async with semaphore:
+                    lag = max(0.0, loop.time() - start - scheduled)
+                    status, duration = await self._execute(record)
+            finally:
+                done.set()
+            return status, duration, lag
+
+        return await asyncio.gather(*(run(record) for record in records))
+
+    def _report(self, records, results, elapsed):
+        grouped = defaultdict(list)
+        for record, result in zip(records, results):
+            grouped[record["endpoint"]].append((record, result))
+
+        endpoints = {}
+        for name, items in grouped.items():
+            latencies = sorted(duration for _, (_, duration, _) in items)
+            captured = sorted(record["duration_ms"] for record, _ in items)
+            statuses = Counter(str(status) for _, (status, _, _) in items)
+            errors = sum(
+                1
+                for record, (status, _, _) in items
+                if status is None or (status >= 500 and record["status"] < 500)
+            )
+            endpoints[name] = {
+                "requests": len(items),
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p95_ms": percentile(latencies, 0.95) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+                "mean_ms": statistics.fmean(latencies) * 1000,
+                "captured_p95_ms": percentile(captured, 0.95),
+                "status_mismatches": sum(
+                    1 for record, (status, _, _) in items if status != record["status"]
+                ),
+                "statuses": dict(statuses),
+                "errors": errors,
+            }
+
+        lags = sorted(lag for _, _, lag in results)
+        return {
+            "requests": len(results),
+            "elapsed_s": elapsed,
+            "throughput_rps": len(results) / elapsed if elapsed else 0.0,
+            "schedule_lag_p95_ms": percentile(lags, 0.95) * 1000,
+            "endpoints": endpoints,
+        }
@@ -0,0 +1,382 @@
+"""
+Метрики в формате Prometheus, общие для всех процессов-воркеров.
+
+Каждый процесс пишет значения в собственный файл METRICS["DIR"]/<pid>.db,
+отображённый в память: запись - это чтение и запись одного double без
+блокировок. Эндпоинт /metrics суммирует файлы всех процессов. Файлы
+завершившихся воркеров не удаляются, чтобы счётчики не уменьшались;
+каталог очищается при старте приложения (entrypoint.sh).
+"""
+
+import functools
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Iterator
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<Q")
+_KEY_LENGTH = struct.Struct("<I")
+_VALUE = struct.Struct("<d")
+# Разреженный файл: место на диске занимают только записанные страницы
+_FILE_SIZE = 4 * 1024 * 1024
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class MmapValues:
+    """
+    Значения метрик одного процесса в файле, отображённом в память.
+
+    Формат: 8 байт - занятый размер файла, далее записи «длина ключа,
+    ключ (выровнен до 8 байт), значение double». Размер в заголовке
+    обновляется после записи ключа, поэтому читатели не видят неполных записей.
+    Файл создаётся разреженным фиксированного размера: значения изменяются
+    через memoryview без перераспределения памяти.
+    """
+
+    def __init__(self, path, size=_FILE_SIZE):
+        self.file = open(path, "a+b")
+        if os.fstat(self.file.fileno()).st_size < size:
+            self.file.truncate(size)
+        self.mmap = mmap.mmap(self.file.fileno(), 0)
+        self.doubles = memoryview(self.mmap).cast("d")
+        # Чтение-изменение-запись значения не атомарно: потоки процесса (потоковые
+        # воркеры, пул хеширования паролей) обновляют значения под блокировкой
+        self.lock = threading.Lock()
+        self.used = _HEADER.unpack_from(self.mmap, 0)[0] or _HEADER.size
+        self.indexes = {
+            key: position // _VALUE.size for key, position, _ in read_entries(self.mmap)
+        }
+
+    def inc(self, key, amount):
+        with self.lock:
+            if key not in self.indexes:
+                self._add(key)
+            index = self.indexes[key]
+            if index is not None:
+                self.doubles[index] += amount
+
+    def _add(self, key):
+        encoded = key.encode()
+        padding = -(_KEY_LENGTH.size + len(encoded)) % 8
+        size = _KEY_LENGTH.size + len(encoded) + padding + _VALUE.size
+        if self.used + size > len(self.mmap):
+            logger.warning("Файл метрик заполнен, серия %s не записывается", key)
+            self.indexes[key] = None
+            return
+
+        _KEY_LENGTH.pack_into(self.mmap, self.used, len(encoded))
+        start = self.used + _KEY_LENGTH.size
+        self.mmap[start : start + len(encoded)] = encoded
+        position = self.used + size - _VALUE.size
+        _VALUE.pack_into(self.mmap, position, 0.0)
+
+        self.used += size
+        _HEADER.pack_into(self.mmap, 0, self.used)
+        self.indexes[key] = position // _VALUE.size
+
+    def close(self):
+        self.doubles.release()
+        self.mmap.close()
+        self.file.close()
+
+
+def read_entries(data):
+    """Перебирает записи (ключ, позиция значения, значение) файла метрик."""
+    used = _HEADER.unpack_from(data, 0)[0]
+    offset = _HEADER.size
+    while offset < used:
+        length = _KEY_LENGTH.unpack_from(data, offset)[0]
+        start = offset + _KEY_LENGTH.size
+        key = bytes(data[start : start + length]).decode()
+        position = start + length + (-(_KEY_LENGTH.size + length) % 8)
+        yield key, position, _VALUE.unpack_from(data, position)[0]
+        offset = position + _VALUE.size
+
+
+class _Storage:
+    """Файл значений текущего процесса; переоткрывается после fork."""
+
+    def __init__(self):
+        self.values = None
+        self.pid = None
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        if self.values is not None:
+            self.values.close()
+        self.values = None
+        self.pid = None
+        self.enabled = settings.METRICS["ENABLED"]
+        self.directory = settings.METRICS["DIR"]
+
+    def get(self):
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    Path(self.directory).mkdir(parents=True, exist_ok=True)
+                    pid = os.getpid()
+                    self.values = MmapValues(os.path.join(self.directory, f"{pid}.db"))
+                    self.pid = pid
+        return self.values
+
+
+_storage = _Storage()
+
+
+@receiver(setting_changed)
+def _reset_storage(setting, **kwargs):
+    if setting == "METRICS":
+        _storage.reset()
+
+
+REGISTRY = {}
+
+
+def _key(name, suffix, labels):
+    return json.dumps([name, suffix, labels], separators=(",", ":"))
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        REGISTRY[name] = self
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self._child(
+                list(zip(self.labelnames, map(str, values)))
+            )
+        return child
+
+
+class _CounterChild:
+    def __init__(self, key):
+        self.key = key
+
+    def inc(self, amount=1):
+        if _storage.enabled:
+            _storage.get().inc(self.key, amount)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _child(self, labels):
+        return _CounterChild(_key(self.name, "_total", labels))
+
+
+class _HistogramChild:
+    def __init__(self, name, labels, buckets):
+        self.buckets = buckets
+        # Счётчики корзин хранятся без накопления; суммируются при выводе
+        self.bucket_keys = [
+            _key(name, "_bucket", labels + [["le", repr(bound)]])
+            for bound in (*buckets, float("inf"))
+        ]
+        self.sum_key = _key(name, "_sum", labels)
+        self.count_key = _key(name, "_count", labels)
+
+    def observe(self, value):
+        if not _storage.enabled:
+            return
+        values = _storage.get()
+        values.inc(self.bucket_keys[bisect_left(self.buckets, value)], 1)
+        values.inc(self.sum_key, value)
+        values.inc(self.count_key, 1)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _child(self, labels):
+        return _HistogramChild(self.name, labels, self.buckets)
+
+
+REQUESTS = Counter(
+    "http_requests", "Число HTTP-запросов", ("action", "method", "status")
+)
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ("action", "method"),
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Число SQL-запросов на HTTP-запрос",
+    ("action",),
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests", "Обращения к кешам приложения", ("cache", "result")
+)
+USECASE_DURATION = Histogram(
+    "usecase_duration_seconds",
+    "Время выполнения сценариев использования",
+    ("usecase", "outcome"),
+)
+
+PASSWORD_HASHING_DURATION = Histogram(
+    "password_hashing_seconds",
+    "Время хеширования и проверки паролей в пуле",
+    ("operation",),
+)
+PASSWORD_HASHING_WAIT = Histogram(
+    "password_hashing_wait_seconds",
+    "Ожидание свободного потока пула хеширования",
+    ("operation",),
+)
+PASSWORD_HASHING_REJECTED = Counter(
+    "password_hashing_rejected",
+    "Операции хеширования, отклонённые при переполнении очереди",
+    ("operation",),
+)
+
+
+def record_cache(cache, hit):
+    """Учитывает попадание или промах кеша."""
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def timed(usecase, lazy=None):
+    """
+    Декоратор: замеряет время выполнения метода сценария использования.
+
+    lazy - ключ словаря-результата, значение которого может быть итератором
+    (потоковый режим): тогда запросы выполняются при его чтении, и время
+    фиксируется, когда итератор исчерпан.
+    """
+
+    def decorator(function):
+        ok = USECASE_DURATION.labels(usecase, "ok")
+        error = USECASE_DURATION.labels(usecase, "error")
+
+        def consume(iterator, started):
+            try:
+                yield from iterator
+            except Exception:
+                error.observe(time.perf_counter() - started)
+                raise
+            ok.observe(time.perf_counter() - started)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            except Exception:
+                error.observe(time.perf_counter() - started)
+                raise
+            if lazy is not None and isinstance(result.get(lazy), Iterator):
+                result[lazy] = consume(result[lazy], started)
+                return result
+            ok.observe(time.perf_counter() - started)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def collect():
+    """Суммирует значения метрик из файлов всех процессов."""
+    totals = defaultdict(float)
+    directory = Path(settings.METRICS["DIR"])
+    for path in directory.glob("*.db"):
+        with open(path, "rb") as metrics_file:
+            header = metrics_file.read(_HEADER.size)
+            if len(header) < _HEADER.size or _HEADER.unpack(header)[0] <= _HEADER.size:
+                continue
+            data = header + metrics_file.read(_HEADER.unpack(header)[0] - _HEADER.size)
+        for key, _, value in read_entries(data):
+            totals[key] += value
+    return totals
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for name, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def render():
+    """Возвращает метрики всех процессов в текстовом формате Prometheus."""
+    samples = defaultdict(lambda: defaultdict(dict))
+    for key, value in collect().items():
+        name, suffix, labels = json.loads(key)
+        if suffix == "_bucket":
+            bound = float(labels[-1][1])
+            group = tuple(map(tuple, labels[:-1]))
+            samples[name][group].setdefault("_bucket", []).append((bound, value))
+        else:
+            samples[name][tuple(map(tuple, labels))][suffix] = value
+
+    lines = []
+    for name in sorted(samples):
+        metric = REGISTRY.get(name)
+        exposed = name + "_total" if isinstance(metric, Counter) else name
+        if metric is not None:
+            lines.append(f"# HELP {exposed} {metric.documentation}")
+            lines.append(f"# TYPE {exposed} {metric.type}")
+
+        for labels, values in sorted(samples[name].items()):
+            labels = list(labels)
+            counts = dict(values.pop("_bucket", []))
+            bounds = sorted(counts)
+            if isinstance(metric, Histogram):
+                bounds = [*metric.buckets, float("inf")]
+            cumulative = 0.0
+            for bound in bounds:
+                cumulative += counts.get(bound, 0.0)
+                bucket_labels = _format_labels(labels + [("le", _format_bound(bound))])
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative:g}")
+            for suffix, value in sorted(values.items()):
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {value!r}")
+
+    return "\n".join(lines) + "\n"
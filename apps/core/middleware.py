@@ -0,0 +1,364 @@
+import cProfile
+import json
+import logging
+import random
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.db import connection
+from django.middleware.clickjacking import XFrameOptionsMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.cache import patch_vary_headers
+
+from apps.core import metrics
+from apps.core.compression import (
+    compress,
+    compress_stream,
+    compressed_bodies,
+    encoded_etag,
+    negotiate,
+)
+from apps.core.profiling import RequestProfile, StackSampler, current_profile
+from apps.core.slow_queries import SlowQueryRecorder, slow_query_log
+from apps.core.traffic import anonymize, traffic_writer, user_alias
+
+logger = logging.getLogger("apps.core.profiling")
+
+
+def endpoint_name(request):
+    """Имя маршрута запроса (например, survey-list) для логов и метрик."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    return match.view_name or match.func.__name__
+
+
+class ProfilingMiddleware:
+    """
+    Замеряет время обработки запроса и его составляющие.
+
+    Добавляет заголовок Server-Timing (total, view, db, serialize, render) и
+    пишет структурированную строку лога. Для доли запросов SAMPLE_RATE
+    сохраняет профиль cProfile, а для запросов дольше SLOW_THRESHOLD_MS -
+    стеки, собранные семплирующим профилировщиком.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sampler = None
+
+    @property
+    def config(self):
+        return settings.REQUEST_PROFILING
+
+    def __call__(self, request):
+        config = self.config
+        if not config["ENABLED"]:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        profiler = None
+        thread_id = None
+
+        if config["SAMPLE_RATE"] and random.random() < config["SAMPLE_RATE"]:
+            profiler = cProfile.Profile()
+        elif config["SLOW_THRESHOLD_MS"] is not None:
+            if self.sampler is None:
+                self.sampler = StackSampler(config["SAMPLER_INTERVAL_MS"] / 1000)
+            thread_id = threading.get_ident()
+            self.sampler.start(thread_id)
+
+        try:
+            with connection.execute_wrapper(profile):
+                if profiler is not None:
+                    response = profiler.runcall(self.get_response, request)
+                else:
+                    response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+            stacks = self.sampler.stop(thread_id) if thread_id is not None else None
+
+        total = time.perf_counter() - profile.started
+        timings = self._timings(profile, total)
+        if not response.streaming:
+            response["Server-Timing"] = self._server_timing(profile, timings)
+
+        name = endpoint_name(request)
+        logger.info(
+            json.dumps(
+                {
+                    "event": "request",
+                    "method": request.method,
+                    "path": request.path,
+                    "endpoint": name,
+                    "status": response.status_code,
+                    "queries": profile.query_count,
+                    **{
+                        f"{key}_ms": round(value * 1000, 3)
+                        for key, value in timings.items()
+                    },
+                },
+                ensure_ascii=False,
+            )
+        )
+
+        if profiler is not None:
+            self._write(name, total, ".prof", profiler.dump_stats)
+        elif stacks and total * 1000 >= config["SLOW_THRESHOLD_MS"]:
+            self._write(
+                name, total, ".folded", lambda path: self._dump_stacks(path, stacks)
+            )
+
+        return response
+
+    def process_template_response(self, request, response):
+        """Отмечает окончание работы view и замеряет рендеринг ответа."""
+        profile = current_profile.get()
+        if profile is None:
+            return response
+
+        profile.view_end = time.perf_counter()
+
+        def rendered(response):
+            profile.render_time = time.perf_counter() - profile.view_end
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def _timings(profile, total):
+        view_end = profile.view_end or profile.started + total
+        return {
+            "total": total,
+            "view": view_end - profile.started,
+            "db": profile.db_time,
+            "serialize": profile.serializer_time,
+            "render": profile.render_time,
+        }
+
+    @staticmethod
+    def _server_timing(profile, timings):
+        parts = []
+        for key, value in timings.items():
+            part = f"{key};dur={value * 1000:.3f}"
+            if key == "db":
+                part += f';desc="{profile.query_count} queries"'
+            parts.append(part)
+        return ", ".join(parts)
+
+    def _write(self, name, total, suffix, dump):
+        directory = Path(self.config["DIR"])
+        directory.mkdir(parents=True, exist_ok=True)
+        filename = (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{name.replace(':', '_')}-"
+            f"{total * 1000:.0f}ms-{threading.get_ident()}{suffix}"
+        )
+        dump(str(directory / filename))
+
+    @staticmethod
+    def _dump_stacks(path, stacks):
+        with open(path, "w") as output:
+            for stack, count in stacks.most_common():
+                output.write(f"{stack} {count}\n")
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Записывает время, статус и число SQL-запросов в метрики /metrics."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS["ENABLED"]:
+            return self.get_response(request)
+
+        queries = _QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        action = endpoint_name(request)
+        metrics.REQUESTS.labels(action, request.method, response.status_code).inc()
+        metrics.REQUEST_DURATION.labels(action, request.method).observe(duration)
+        metrics.REQUEST_QUERIES.labels(action).observe(queries.count)
+        return response
+
+
+class SlowQueryMiddleware:
+    """Записывает медленные SQL-запросы запроса в журнал slow_query_log."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = settings.SLOW_QUERY_LOG
+        self.recorder = SlowQueryRecorder(slow_query_log, self.config)
+
+    def __call__(self, request):
+        if not self.config["ENABLED"]:
+            return self.get_response(request)
+
+        with connection.execute_wrapper(self.recorder):
+            return self.get_response(request)
+
+
+class TrafficCaptureMiddleware:
+    """Записывает обезличенный API-трафик для команды replay_traffic."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = settings.TRAFFIC_CAPTURE
+        if (
+            not config["ENABLED"]
+            or not request.path.startswith(config["PATH_PREFIX"])
+            or random.random() >= config["SAMPLE_RATE"]
+        ):
+            return self.get_response(request)
+
+        # Тело читается до view: после обработки поток запроса уже прочитан
+        body = None
+        if request.content_type == "application/json" and request.body:
+            try:
+                body = anonymize(json.loads(request.body))
+            except ValueError:
+                body = None
+
+        timestamp = time.time()
+        started = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        user = getattr(request, "user", None)
+        authenticated = user is not None and user.is_authenticated
+        traffic_writer.write(
+            {
+                "ts": round(timestamp, 6),
+                "method": request.method,
+                "path": request.path,
+                "query": request.META.get("QUERY_STRING", ""),
+                "endpoint": endpoint_name(request),
+                "user": user_alias(user.get_username()) if authenticated else None,
+                "is_author": bool(authenticated and user.is_author),
+                "body": body,
+                "status": response.status_code,
+                "duration_ms": round(duration * 1000, 3),
+            }
+        )
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы API по Accept-Encoding (apps.core.compression).
+
+    Ответы с Content-Encoding (опубликованные gzip-файлы опросов), короче
+    MIN_LENGTH, ответы эндпоинтов SKIP_ENDPOINTS и ответы, устанавливающие
+    cookie, не сжимаются: в последних двух есть учётные данные. ETag сжатого ответа получает суффикс кодировки,
+    а его тело берётся из кеша по этому ETag; потоковые ответы сжимаются по
+    мере отдачи частей.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        config = settings.COMPRESSION
+        if not config["ENABLED"] or not request.path.startswith(config["PATH_PREFIX"]):
+            return response
+        if endpoint_name(request) in config["SKIP_ENDPOINTS"] or response.cookies:
+            return response
+
+        # Тело по этому адресу зависит от Accept-Encoding, даже если этот
+        # ответ не сжат
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if (
+            response.has_header("Content-Encoding")
+            or "no-transform" in response.get("Cache-Control", "")
+            or (not response.streaming and len(response.content) < config["MIN_LENGTH"])
+        ):
+            return response
+
+        encoding = negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        levels = config["LEVELS"]
+        level = levels.get(endpoint_name(request), levels["default"])[encoding]
+        etag = response.get("ETag")
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding, level
+            )
+            # Длина сжатого потока заранее неизвестна (FileResponse её задаёт)
+            del response["Content-Length"]
+        else:
+            response.content = compress(
+                response.content, encoding, level, etag, compressed_bodies
+            )
+            response["Content-Length"] = str(len(response.content))
+        response["Content-Encoding"] = encoding
+        if etag:
+            response["ETag"] = encoded_etag(etag, encoding)
+        return response
+
+
+def is_api_request(request):
+    """Запрос к API в режиме API_MODE: обслуживается без сессий и cookie."""
+    config = settings.API_MODE
+    return config["ENABLED"] and request.path_info.startswith(config["PATH_PREFIX"])
+
+
+class ApiExemptMixin:
+    """
+    Пропускает middleware для запросов к API в режиме API_MODE.
+
+    Клиенты API аутентифицируются токенами, поэтому сессии, CSRF, сообщения
+    и X-Frame-Options им не нужны; остальные пути (админка) получают полный
+    стек middleware.
+    """
+
+    def __call__(self, request):
+        if is_api_request(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class ApiExemptSessionMiddleware(ApiExemptMixin, SessionMiddleware):
+    pass
+
+
+class ApiExemptCsrfViewMiddleware(ApiExemptMixin, CsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        # process_view вызывается обработчиком напрямую, минуя __call__
+        if is_api_request(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class ApiExemptAuthenticationMiddleware(ApiExemptMixin, AuthenticationMiddleware):
+    pass
+
+
+class ApiExemptMessageMiddleware(ApiExemptMixin, MessageMiddleware):
+    pass
+
+
+class ApiExemptXFrameOptionsMiddleware(ApiExemptMixin, XFrameOptionsMiddleware):
+    pass
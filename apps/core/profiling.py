@@ -0,0 +1,123 @@
+import contextvars
+import functools
+import sys
+import threading
+import time
+from collections import Counter
+
+from rest_framework import serializers
+
+# Профиль текущего запроса; None вне ProfilingMiddleware
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+
+class RequestProfile:
+    """Накопленные за время запроса показатели."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.view_end = None
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка connection.execute_wrapper для подсчёта запросов и времени БД."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.query_count += 1
+
+
+def timed_serialization(function):
+    """Учитывает время вызова function во времени сериализации запроса."""
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return function(*args, **kwargs)
+
+        # Вложенные вызовы учитываются один раз
+        profile.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profile.serializer_depth -= 1
+            if profile.serializer_depth == 0:
+                profile.serializer_time += time.perf_counter() - started
+
+    return wrapper
+
+
+def _timed_data(data_property):
+    """Оборачивает свойство .data сериализатора замером времени."""
+    return property(timed_serialization(data_property.fget))
+
+
+_serializer_timing_installed = False
+
+
+def install_serializer_timing():
+    """Включает замер времени сериализации для всех сериализаторов DRF."""
+    global _serializer_timing_installed
+    if _serializer_timing_installed:
+        return
+
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        cls.data = _timed_data(cls.data)
+    _serializer_timing_installed = True
+
+
+class StackSampler:
+    """
+    Периодически снимает стеки потоков, обрабатывающих запросы.
+
+    Один фоновый поток на процесс; стеки копятся в свёрнутом виде
+    (формат flamegraph) для каждого зарегистрированного потока.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self, thread_id):
+        with self.lock:
+            self.samples[thread_id] = Counter()
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self._run, name="stack-sampler", daemon=True
+                )
+                self.thread.start()
+
+    def stop(self, thread_id):
+        with self.lock:
+            return self.samples.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.samples:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, counter in self.samples.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        counter[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
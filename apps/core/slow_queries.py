@@ -0,0 +1,215 @@
+"""
+Журнал медленных SQL-запросов с планами выполнения.
+
+SlowQueryRecorder подключается через connection.execute_wrapper и
+записывает запросы дольше порога в журнал, общий для всех воркеров. Для части
+SELECT-запросов (доля EXPLAIN_SAMPLE_RATE, не чаще EXPLAIN_PER_MINUTE)
+сохраняется план: EXPLAIN (ANALYZE, BUFFERS) на PostgreSQL и
+EXPLAIN QUERY PLAN на SQLite.
+"""
+
+import fcntl
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+PROJECT_ROOT = str(Path(settings.BASE_DIR).resolve())
+THIS_FILE = str(Path(__file__).resolve())
+
+# Полное сканирование таблицы в плане запроса
+FULL_SCAN_PATTERNS = {
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    "sqlite": re.compile(r"\bSCAN (\w+)(?! USING (?:COVERING )?INDEX)(?:\s|$)"),
+}
+
+
+class SlowQueryLog:
+    """
+    Журнал последних size записей о медленных запросах в общем файле.
+
+    Воркеры дописывают записи строками JSON под блокировкой flock (она
+    разделяет и процессы, и потоки: у каждого open() своя блокировка), поэтому
+    журнал один для всех процессов. Когда строк становится вдвое больше size,
+    файл усекается до последних size записей.
+    """
+
+    def __init__(self, path, size):
+        self.path = Path(path)
+        self.size = size
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        return open(self.path, "a+", encoding="utf-8")
+
+    def add(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._open() as log:
+            fcntl.flock(log, fcntl.LOCK_EX)
+            log.write(line)
+            log.flush()
+            log.seek(0)
+            lines = log.readlines()
+            if len(lines) > 2 * self.size:
+                log.truncate(0)
+                log.writelines(lines[-self.size :])
+
+    def snapshot(self):
+        """Записи от новых к старым."""
+        try:
+            with open(self.path, encoding="utf-8") as log:
+                fcntl.flock(log, fcntl.LOCK_SH)
+                lines = log.readlines()
+        except FileNotFoundError:
+            return []
+        return [json.loads(line) for line in reversed(lines[-self.size :])]
+
+    def clear(self):
+        with self._open() as log:
+            fcntl.flock(log, fcntl.LOCK_EX)
+            log.truncate(0)
+
+
+class TokenBucket:
+    """Ограничение частоты: не больше rate событий в минуту."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.rate, self.tokens + (now - self.updated) * self.rate / 60
+            )
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+def params_fingerprint(params):
+    """Короткий хеш параметров: одинаковые значения без хранения самих данных."""
+    return hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+
+
+def project_stack(depth):
+    """Кадры стека из кода проекта, от ближайшего к запросу."""
+    frames = []
+    for frame in reversed(traceback.extract_stack()[:-3]):
+        filename = str(Path(frame.filename).resolve())
+        if not filename.startswith(PROJECT_ROOT) or "site-packages" in filename:
+            continue
+        if filename == THIS_FILE or filename.endswith("manage.py"):
+            continue
+        frames.append(
+            f"{filename[len(PROJECT_ROOT) + 1 :]}:{frame.lineno} in {frame.name}"
+        )
+        if len(frames) == depth:
+            break
+    return frames
+
+
+def calling_usecase(stack):
+    """Имя сценария использования (модуль usecases), выполнившего запрос."""
+    for frame in stack:
+        if "/usecases/" in frame:
+            path, _, function = frame.partition(" in ")
+            return f"{Path(path.split(':')[0]).stem}.{function}"
+    return None
+
+
+class SlowQueryRecorder:
+    """Обёртка execute_wrapper, записывающая медленные запросы в журнал."""
+
+    def __init__(self, log, config):
+        self.log = log
+        self.threshold = config["THRESHOLD_MS"] / 1000
+        self.sample_rate = config["EXPLAIN_SAMPLE_RATE"]
+        self.stack_depth = config["STACK_DEPTH"]
+        self.explain_limit = TokenBucket(config["EXPLAIN_PER_MINUTE"])
+        self.local = threading.local()
+
+    def __call__(self, execute, sql, params, many, context):
+        # Запросы EXPLAIN и точек сохранения самого журнала не записываются
+        if getattr(self.local, "explaining", False):
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            if duration >= self.threshold:
+                self._record(sql, params, many, duration, context["connection"])
+
+    def _record(self, sql, params, many, duration, connection):
+        stack = project_stack(self.stack_depth)
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(duration * 1000, 3),
+            "sql": sql,
+            "params_fingerprint": params_fingerprint(params),
+            "many": many,
+            "usecase": calling_usecase(stack),
+            "stack": stack,
+            "plan": None,
+            "full_scans": [],
+        }
+
+        if (
+            not many
+            and sql.lstrip()[:6].upper() == "SELECT"
+            and random.random() < self.sample_rate
+            and self.explain_limit.take()
+        ):
+            record["plan"] = self._explain(connection, sql, params)
+            pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+            if record["plan"] and pattern is not None:
+                record["full_scans"] = sorted(
+                    set(pattern.findall("\n".join(record["plan"])))
+                )
+
+        self.log.add(record)
+
+    def _explain(self, connection, sql, params):
+        if connection.vendor == "postgresql":
+            prefix = "EXPLAIN (ANALYZE, BUFFERS) "
+        elif connection.vendor == "sqlite":
+            prefix = "EXPLAIN QUERY PLAN "
+        else:
+            return None
+
+        self.local.explaining = True
+        try:
+            # Ошибка EXPLAIN не должна прерывать транзакцию запроса
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute(prefix + sql, params)
+                    rows = cursor.fetchall()
+        except DatabaseError:
+            return None
+        finally:
+            self.local.explaining = False
+
+        if connection.vendor == "sqlite":
+            # Строки EXPLAIN QUERY PLAN: (id, parent, notused, detail)
+            return [row[-1] for row in rows]
+        return [row[0] for row in rows]
+
+
+slow_query_log = SlowQueryLog(
+    settings.SLOW_QUERY_LOG["FILE"], settings.SLOW_QUERY_LOG["BUFFER_SIZE"]
+)
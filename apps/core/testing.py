@@ -0,0 +1,132 @@
+import os
+import traceback
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+PROJECT_ROOT = str(Path(settings.BASE_DIR).resolve())
+THIS_FILE = str(Path(__file__).resolve())
+# Кадры ORM и обёрток соединения не указывают на место вызова запроса
+ORM_INTERNALS = (
+    os.path.join("django", "db", ""),
+    os.path.join("django", "utils", "asyncio.py"),
+)
+
+
+def _call_site():
+    """
+    Возвращает ближайший к запросу кадр стека из кода проекта.
+
+    Если запрос выполнен библиотекой (например, аутентификацией DRF) без
+    участия кода проекта, возвращается ближайший кадр вне ORM; кадры самих
+    тестов используются в последнюю очередь.
+    """
+    library_site = None
+    test_site = None
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        filename = str(Path(frame.filename).resolve())
+        if filename == THIS_FILE or any(part in filename for part in ORM_INTERNALS):
+            continue
+
+        in_project = (
+            filename.startswith(PROJECT_ROOT)
+            and "site-packages" not in filename
+            and not filename.endswith("manage.py")
+        )
+        if not in_project:
+            if library_site is None:
+                library_site = f"{filename}:{frame.lineno} in {frame.name}"
+            continue
+
+        site = f"{filename[len(PROJECT_ROOT) + 1 :]}:{frame.lineno} in {frame.name}"
+        if not filename.endswith("tests.py"):
+            return site
+        if test_site is None:
+            test_site = site
+    return library_site or test_site or "<unknown>"
+
+
+class QueryRecorder:
+    """Записывает выполненные SQL-запросы вместе с местом вызова в коде проекта."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((_call_site(), sql))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def grouped(self):
+        """Запросы, сгруппированные по месту вызова, в виде текста для отчёта."""
+        groups = defaultdict(list)
+        for site, sql in self.queries:
+            groups[site].append(sql)
+
+        lines = []
+        for site, statements in sorted(
+            groups.items(), key=lambda item: len(item[1]), reverse=True
+        ):
+            lines.append(f"  {len(statements)} x {site}")
+            for sql in statements[:3]:
+                lines.append(f"      {sql[:200]}")
+            if len(statements) > 3:
+                lines.append(f"      ... ещё {len(statements) - 3}")
+        return "\n".join(lines)
+
+
+def response_body(response):
+    """Тело ответа для сообщений об ошибках, в том числе потокового."""
+    if response.streaming:
+        return b"".join(response.streaming_content)
+    return response.content
+
+
+@contextmanager
+def record_queries():
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        yield recorder
+
+
+class QueryBudgetMixin:
+    """
+    Проверка бюджетов SQL-запросов для эндпоинтов в тестах.
+
+    Класс теста объявляет QUERY_BUDGETS = {"имя действия": максимум запросов}.
+    assertQueryBudget выполняет запрос на малом наборе данных, увеличивает
+    данные функцией grow и выполняет запрос снова: число запросов не должно
+    превышать бюджет и не должно расти вместе с данными. При нарушении
+    выводятся запросы, сгруппированные по месту вызова.
+    """
+
+    QUERY_BUDGETS = {}
+
+    def assertQueryBudget(self, action, make_request, grow, expected_status=200):
+        budget = self.QUERY_BUDGETS[action]
+
+        with record_queries() as small:
+            response = make_request()
+        self.assertEqual(response.status_code, expected_status, response_body(response))
+
+        grow()
+
+        with record_queries() as large:
+            response = make_request()
+        self.assertEqual(response.status_code, expected_status, response_body(response))
+
+        if len(large) > budget or len(small) > budget:
+            self.fail(
+                f"{action}: {max(len(small), len(large))} запросов при бюджете "
+                f"{budget}:\n{large.grouped()}"
+            )
+        if len(large) != len(small):
+            self.fail(
+                f"{action}: число запросов растёт с объёмом данных "
+                f"({len(small)} -> {len(large)}):\n{large.grouped()}"
+            )
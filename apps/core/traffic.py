@@ -0,0 +1,82 @@
+"""
+Запись обезличенного API-трафика в JSONL для последующего воспроизведения.
+
+Каждая строка - один запрос: время, метод, путь, имя маршрута, форма тела,
+статус и длительность. Пользователь заменяется псевдонимом (HMAC имени на
+SECRET_KEY), учётные данные не сохраняются, строки заменяются на строки
+той же длины из символов «x».
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+CREDENTIAL_MARKER = "<credential>"
+EMAIL_MARKER = "<email>"
+CREDENTIAL_FIELDS = {
+    "password",
+    "password_confirm",
+    "old_password",
+    "new_password",
+    "new_password_confirm",
+    "token",
+    "access_token",
+    "refresh_token",
+}
+MAX_STRING_LENGTH = 1000
+
+
+def user_alias(username):
+    """Постоянный псевдоним пользователя, не раскрывающий его имя."""
+    digest = hmac.new(
+        settings.SECRET_KEY.encode(), username.encode(), hashlib.sha256
+    ).hexdigest()
+    return f"user-{digest[:12]}"
+
+
+def anonymize(value, key=None):
+    """Заменяет персональные данные в теле запроса, сохраняя его форму."""
+    if isinstance(value, dict):
+        return {item_key: anonymize(item, item_key) for item_key, item in value.items()}
+    if isinstance(value, list):
+        return [anonymize(item) for item in value]
+    if not isinstance(value, str):
+        return value
+    if key in CREDENTIAL_FIELDS:
+        return CREDENTIAL_MARKER
+    if key == "username":
+        return user_alias(value)
+    if key == "email":
+        return EMAIL_MARKER
+    return "x" * min(len(value), MAX_STRING_LENGTH)
+
+
+class TrafficWriter:
+    """Дописывает записи в JSONL-файл; у каждого процесса свой файл."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.file = None
+        self.owner = None
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self.lock:
+            owner = (os.getpid(), settings.TRAFFIC_CAPTURE["DIR"])
+            if self.owner != owner:
+                if self.file is not None:
+                    self.file.close()
+                directory = Path(owner[1])
+                directory.mkdir(parents=True, exist_ok=True)
+                self.file = open(directory / f"traffic-{owner[0]}.jsonl", "a")
+                self.owner = owner
+            self.file.write(line)
+            self.file.flush()
+
+
+traffic_writer = TrafficWriter()
@@ -0,0 +1,33 @@
+import secrets
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from apps.core import metrics
+
+
+@require_GET
+def metrics_view(request):
+    """Метрики всех воркеров в текстовом формате Prometheus."""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def metrics_allowed(request):
+    """
+    Доступ к /metrics: токен из настроек или адрес из ALLOWED_IPS.
+
+    Запрос, прошедший через прокси (есть X-Forwarded-For или Forwarded), по
+    адресу не пропускается: REMOTE_ADDR у него - адрес прокси.
+    """
+    config = settings.METRICS
+    proxied = "HTTP_X_FORWARDED_FOR" in request.META or "HTTP_FORWARDED" in request.META
+    if not proxied and request.META.get("REMOTE_ADDR") in config["ALLOWED_IPS"]:
+        return True
+    token = config["TOKEN"]
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    return bool(token) and secrets.compare_digest(header, f"Bearer {token}")
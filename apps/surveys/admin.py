@@ -17,17 +17,78 @@ class AnswerOptionInline(admin.TabularInline):
     ordering = ["order"]
 
 
+class SurveyDefinitionAdmin(admin.ModelAdmin):
+    """
+    Админка вопросов и вариантов ответа.
+
+    Правки здесь идут в обход сценариев, поэтому ревизия затронутых опросов
+    увеличивается тут же: от неё зависят опубликованные файлы и ETag.
+    survey_lookup - путь от модели к опросу.
+    """
+
+    survey_lookup = "survey"
+
+    def survey_ids(self, queryset):
+        return set(queryset.values_list(self.survey_lookup, flat=True))
+
+    def save_model(self, request, obj, form, change):
+        previous = (
+            self.survey_ids(self.model.objects.filter(pk=obj.pk)) if change else set()
+        )
+        super().save_model(request, obj, form, change)
+        # Объект перенесён в другой опрос: прежний тоже изменился
+        moved = previous - self.survey_ids(self.model.objects.filter(pk=obj.pk))
+        if moved:
+            Survey.objects.filter(pk__in=moved).bump_revision()
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Ревизия увеличивается после inline, одна на всё сохранение формы
+        Survey.objects.filter(
+            pk__in=self.survey_ids(self.model.objects.filter(pk=form.instance.pk))
+        ).bump_revision()
+
+    def delete_model(self, request, obj):
+        survey_ids = self.survey_ids(self.model.objects.filter(pk=obj.pk))
+        super().delete_model(request, obj)
+        Survey.objects.filter(pk__in=survey_ids).bump_revision()
+
+    def delete_queryset(self, request, queryset):
+        survey_ids = self.survey_ids(queryset)
+        super().delete_queryset(request, queryset)
+        Survey.objects.filter(pk__in=survey_ids).bump_revision()
+
+
 @admin.register(Survey)
 class SurveyAdmin(admin.ModelAdmin):
     list_display = ["title", "author", "created_at", "is_active"]
     list_filter = ["is_active", "created_at"]
     search_fields = ["title", "author__username"]
     inlines = [QuestionInline]
-    readonly_fields = ["created_at", "updated_at"]
+    readonly_fields = [
+        "created_at",
+        "updated_at",
+        "question_count",
+        "session_count",
+        "completed_count",
+    ]
+    actions = ["refresh_counters"]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Вопросы из inline сохраняются в обход сценариев
+        surveys = Survey.objects.filter(pk=form.instance.pk)
+        surveys.refresh_counters()
+        if any(formset.has_changed() for formset in formsets):
+            surveys.bump_revision()
+
+    @admin.action(description="Пересчитать счётчики")
+    def refresh_counters(self, request, queryset):
+        queryset.refresh_counters()
 
 
 @admin.register(Question)
-class QuestionAdmin(admin.ModelAdmin):
+class QuestionAdmin(SurveyDefinitionAdmin):
     list_display = ["text", "survey", "order"]
     list_filter = ["survey"]
     search_fields = ["text", "survey__title"]
@@ -36,7 +97,8 @@ class QuestionAdmin(admin.ModelAdmin):
 
 
 @admin.register(AnswerOption)
-class AnswerOptionAdmin(admin.ModelAdmin):
+class AnswerOptionAdmin(SurveyDefinitionAdmin):
+    survey_lookup = "question__survey"
     list_display = ["text", "question", "order"]
     list_filter = ["question__survey"]
     search_fields = ["text", "question__text"]
@@ -0,0 +1,468 @@
+import csv
+import io
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from apps.surveys.models import (
+    AnswerOption,
+    Question,
+    Survey,
+    SurveySession,
+    UserAnswer,
+)
+
+User = get_user_model()
+
+# Маркер NULL для COPY; сгенерированные строки такого значения не содержат
+NULL_MARKER = "\\N"
+
+
+class BulkLoader:
+    """
+    Накапливает строки таблицы и записывает их пачками.
+
+    На PostgreSQL использует COPY FROM STDIN, на остальных бэкендах -
+    bulk_create. ID задаются явно, поэтому связанные таблицы можно
+    заполнять без чтения вставленных строк обратно. Перед записью пачки
+    сбрасываются загрузчики родительских таблиц, чтобы внешние ключи всегда
+    ссылались на уже записанные строки.
+    """
+
+    def __init__(self, model, fields, batch_size, parents=()):
+        self.model = model
+        self.fields = fields
+        self.batch_size = batch_size
+        self.parents = parents
+        self.rows = []
+        self.total = 0
+        self.elapsed = 0.0
+        self.use_copy = connection.vendor == "postgresql"
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+
+        for parent in self.parents:
+            parent.flush()
+
+        started = time.perf_counter()
+        if self.use_copy:
+            self._copy()
+        else:
+            self.model.objects.bulk_create(
+                [self.model(**dict(zip(self.fields, row))) for row in self.rows],
+                batch_size=self.batch_size,
+            )
+        self.elapsed += time.perf_counter() - started
+        self.total += len(self.rows)
+        self.rows = []
+
+    def _copy(self):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in self.rows:
+            # Пустое поле без кавычек COPY в формате CSV по умолчанию считает
+            # NULL; с явным маркером \N пустые строки остаются пустыми строками
+            writer.writerow([NULL_MARKER if value is None else value for value in row])
+        buffer.seek(0)
+
+        quote = connection.ops.quote_name
+        columns = ", ".join(
+            quote(self.model._meta.get_field(name).column) for name in self.fields
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {quote(self.model._meta.db_table)} ({columns}) "
+                f"FROM STDIN WITH (FORMAT csv, NULL '{NULL_MARKER}')",
+                buffer,
+            )
+
+
+def zipf_cum_weights(count, exponent):
+    """Накопленные веса распределения Ципфа для случайного выбора по рангу."""
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, count + 1):
+        total += 1.0 / rank**exponent
+        cum_weights.append(total)
+    return cum_weights
+
+
+def next_id(model):
+    return (model.objects.aggregate(max_id=Max("id"))["max_id"] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует большой синтетический набор данных для нагрузочного "
+        "тестирования и бенчмарков"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument(
+            "--author-ratio",
+            type=float,
+            default=0.01,
+            help="Доля авторов среди пользователей",
+        )
+        parser.add_argument("--surveys", type=int, default=1_000)
+        parser.add_argument("--min-questions", type=int, default=5)
+        parser.add_argument("--max-questions", type=int, default=40)
+        parser.add_argument("--min-options", type=int, default=2)
+        parser.add_argument("--max-options", type=int, default=6)
+        parser.add_argument("--sessions", type=int, default=100_000)
+        parser.add_argument(
+            "--abandon-rate",
+            type=float,
+            default=0.3,
+            help="Доля незавершённых сессий; у пары пользователь-опрос может "
+            "быть только одна незавершённая сессия, повторные завершаются",
+        )
+        parser.add_argument(
+            "--inactive-rate",
+            type=float,
+            default=0.1,
+            help="Доля неактивных опросов",
+        )
+        parser.add_argument(
+            "--zipf",
+            type=float,
+            default=1.1,
+            help="Показатель распределения Ципфа для популярности опросов "
+            "и активности респондентов",
+        )
+        parser.add_argument(
+            "--seconds-per-question",
+            type=float,
+            default=8.0,
+            help="Медианное время ответа на один вопрос",
+        )
+        parser.add_argument("--days", type=int, default=180)
+        parser.add_argument(
+            "--end",
+            default="2025-01-01",
+            help="Дата (ISO), которой заканчивается сгенерированная история",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--password", default="password123")
+        parser.add_argument("--prefix", default="load")
+
+    def handle(self, *args, **options):
+        if options["min_questions"] < 1:
+            # У незавершённой сессии отвечена случайная часть вопросов опроса
+            raise CommandError("--min-questions должно быть не меньше 1")
+        if options["min_questions"] > options["max_questions"]:
+            raise CommandError("--min-questions не может превышать --max-questions")
+        if (
+            options["min_options"] < 1
+            or options["min_options"] > options["max_options"]
+        ):
+            raise CommandError("Некорректный диапазон --min-options/--max-options")
+        if options["users"] < 2:
+            raise CommandError("Нужно как минимум два пользователя")
+
+        self.options = options
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.end = datetime.fromisoformat(options["end"]).replace(
+            tzinfo=dt_timezone.utc
+        )
+        self.start = self.end - timedelta(days=options["days"])
+        self.loaders = []
+
+        started = time.perf_counter()
+        self.stdout.write(
+            f"Генерация данных (seed={options['seed']}, "
+            f"backend={connection.vendor})..."
+        )
+
+        self._generate_users()
+        self._generate_surveys()
+        self._generate_sessions()
+        self._reset_sequences()
+        # Строки вставлены в обход сценариев, счётчики опросов считаются разом
+        Survey.objects.refresh_counters()
+
+        elapsed = time.perf_counter() - started
+        for loader in self.loaders:
+            rate = loader.total / loader.elapsed if loader.elapsed else 0
+            self.stdout.write(
+                f"  {loader.model._meta.db_table}: {loader.total} строк, "
+                f"{rate:,.0f} строк/с при записи"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Данные сгенерированы за {elapsed:.1f} с")
+        )
+
+    def _loader(self, model, fields, parents=()):
+        loader = BulkLoader(model, fields, self.batch_size, parents)
+        self.loaders.append(loader)
+        return loader
+
+    def _random_time(self, start, end):
+        return start + (end - start) * self.rng.random()
+
+    def _generate_users(self):
+        options = self.options
+        first_id = next_id(User)
+        author_count = max(1, int(options["users"] * options["author_ratio"]))
+        # Один хеш на весь набор: PBKDF2 для миллионов строк занял бы часы
+        password = make_password(options["password"])
+
+        loader = self._loader(
+            User,
+            [
+                "id",
+                "password",
+                "is_superuser",
+                "username",
+                "first_name",
+                "last_name",
+                "email",
+                "is_staff",
+                "is_active",
+                "date_joined",
+                "is_author",
+            ],
+        )
+        for offset in range(options["users"]):
+            user_id = first_id + offset
+            username = f"{options['prefix']}_user_{user_id}"
+            loader.add(
+                (
+                    user_id,
+                    password,
+                    False,
+                    username,
+                    "",
+                    "",
+                    f"{username}@example.com",
+                    False,
+                    True,
+                    self._random_time(self.start, self.end),
+                    offset < author_count,
+                )
+            )
+        loader.flush()
+
+        self.author_ids = range(first_id, first_id + author_count)
+        self.respondent_ids = range(
+            first_id + author_count, first_id + options["users"]
+        )
+
+    def _generate_surveys(self):
+        options = self.options
+        survey_id = next_id(Survey)
+        question_id = next_id(Question)
+        option_id = next_id(AnswerOption)
+
+        surveys = self._loader(
+            Survey,
+            [
+                "id",
+                "title",
+                "author_id",
+                "created_at",
+                "updated_at",
+                "is_active",
+                "revision",
+                "version",
+            ],
+        )
+        questions = self._loader(
+            Question, ["id", "survey_id", "text", "order", "created_at"], [surveys]
+        )
+        answer_options = self._loader(
+            AnswerOption,
+            ["id", "question_id", "text", "order", "created_at"],
+            [questions],
+        )
+
+        # Для каждого опроса: (id, created_at, is_active, [(question_id, [option_id])])
+        self.surveys = []
+        for index in range(options["surveys"]):
+            created_at = self._random_time(self.start, self.end)
+            is_active = self.rng.random() >= options["inactive_rate"]
+            surveys.add(
+                (
+                    survey_id,
+                    f"Опрос {survey_id}",
+                    self.rng.choice(self.author_ids),
+                    created_at,
+                    created_at,
+                    is_active,
+                    1,
+                    1,
+                )
+            )
+
+            structure = []
+            question_count = self.rng.randint(
+                options["min_questions"], options["max_questions"]
+            )
+            for order in range(question_count):
+                questions.add(
+                    (question_id, survey_id, f"Вопрос {order + 1}", order, created_at)
+                )
+                option_ids = []
+                for option_order in range(
+                    self.rng.randint(options["min_options"], options["max_options"])
+                ):
+                    answer_options.add(
+                        (
+                            option_id,
+                            question_id,
+                            f"Вариант {option_order + 1}",
+                            option_order,
+                            created_at,
+                        )
+                    )
+                    option_ids.append(option_id)
+                    option_id += 1
+                structure.append((question_id, option_ids))
+                question_id += 1
+
+            self.surveys.append((survey_id, created_at, is_active, structure))
+            survey_id += 1
+
+        answer_options.flush()
+
+    def _generate_sessions(self):
+        options = self.options
+        rng = self.rng
+        active_surveys = [survey for survey in self.surveys if survey[2]]
+        if not active_surveys or not self.respondent_ids:
+            return
+
+        # Ранги популярности перемешаны, чтобы популярность не зависела от ID
+        rng.shuffle(active_surveys)
+        respondents = list(self.respondent_ids)
+        rng.shuffle(respondents)
+        survey_weights = zipf_cum_weights(len(active_surveys), options["zipf"])
+        respondent_weights = zipf_cum_weights(len(respondents), options["zipf"])
+
+        session_id = next_id(SurveySession)
+        answer_id = next_id(UserAnswer)
+        sessions = self._loader(
+            SurveySession,
+            [
+                "id",
+                "survey_id",
+                "user_id",
+                "started_at",
+                "completed_at",
+                "is_completed",
+            ],
+        )
+        answers = self._loader(
+            UserAnswer,
+            [
+                "id",
+                "session_id",
+                "question_id",
+                "selected_option_id",
+                "survey_id",
+                "user_id",
+                "answered_at",
+            ],
+            [sessions],
+        )
+        # Пары (пользователь, опрос) с незавершённой сессией: открытая сессия
+        # у пары может быть только одна
+        open_pairs = set()
+        median = options["seconds_per_question"]
+
+        remaining = options["sessions"]
+        while remaining > 0:
+            chunk = min(remaining, self.batch_size)
+            remaining -= chunk
+            picked_surveys = rng.choices(
+                active_surveys, cum_weights=survey_weights, k=chunk
+            )
+            picked_users = rng.choices(
+                respondents, cum_weights=respondent_weights, k=chunk
+            )
+
+            for (survey_id, created_at, _, structure), user_id in zip(
+                picked_surveys, picked_users
+            ):
+                started_at = self._random_time(created_at, self.end)
+                abandoned = rng.random() < options["abandon_rate"]
+                if abandoned and (user_id, survey_id) in open_pairs:
+                    abandoned = False
+
+                if abandoned:
+                    open_pairs.add((user_id, survey_id))
+                    answered = structure[: rng.randrange(len(structure))]
+                else:
+                    answered = structure
+
+                # Время ответа на вопрос распределено логнормально
+                moment = started_at
+                answer_times = []
+                for _ in answered:
+                    moment += timedelta(
+                        seconds=rng.lognormvariate(math.log(median), 0.75)
+                    )
+                    answer_times.append(moment)
+
+                sessions.add(
+                    (
+                        session_id,
+                        survey_id,
+                        user_id,
+                        started_at,
+                        None if abandoned else moment,
+                        not abandoned,
+                    )
+                )
+                for (question_id, option_ids), answered_at in zip(
+                    answered, answer_times
+                ):
+                    # Первые варианты выбирают чаще последних
+                    option = option_ids[
+                        min(int(rng.paretovariate(1.5)) - 1, len(option_ids) - 1)
+                    ]
+                    answers.add(
+                        (
+                            answer_id,
+                            session_id,
+                            question_id,
+                            option,
+                            survey_id,
+                            user_id,
+                            answered_at,
+                        )
+                    )
+                    answer_id += 1
+                session_id += 1
+
+            answers.flush()
+            self.stdout.write(f"  сессий: {sessions.total}, ответов: {answers.total}")
+
+    def _reset_sequences(self):
+        """Сдвигает последовательности ID за явно вставленные значения."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(),
+            [User, Survey, Question, AnswerOption, SurveySession, UserAnswer],
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -108,6 +108,10 @@ class Command(BaseCommand):
 
                 self.stdout.write(f"  Создан вопрос {order + 1}: {question.text}")
 
+            Survey.objects.filter(id=survey.id).update(
+                question_count=len(questions_data)
+            )
+
             self.stdout.write(self.style.SUCCESS("Примеры данных успешно созданы!"))
         else:
             self.stdout.write(
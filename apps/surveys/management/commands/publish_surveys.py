@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.surveys.artifacts import publish_survey
+from apps.surveys.models import Survey
+
+
+class Command(BaseCommand):
+    help = (
+        "Публикует ответы retrieve активных опросов в SURVEY_ARTIFACTS['DIR'], "
+        "чтобы первые респонденты не ждали сериализации"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--survey",
+            type=int,
+            action="append",
+            dest="surveys",
+            help="ID опроса (можно повторять); по умолчанию - все активные",
+        )
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        surveys = Survey.objects.filter(is_active=True).prefetch_related(
+            "questions__answer_options"
+        )
+        if options["surveys"]:
+            surveys = surveys.filter(id__in=options["surveys"])
+
+        started = time.perf_counter()
+        published = 0
+        size = 0
+        for survey in surveys.order_by("id").iterator(chunk_size=options["batch_size"]):
+            size += len(publish_survey(survey))
+            published += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Опубликовано опросов: {published} ({size / 1024:.1f} КиБ JSON) "
+                f"за {time.perf_counter() - started:.1f} с"
+            )
+        )
@@ -0,0 +1,283 @@
+import multiprocessing
+import statistics
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+
+from apps.core.management.commands.benchmark import percentile
+from apps.surveys.models import (
+    AnswerOption,
+    Question,
+    Survey,
+    SurveySession,
+    UserAnswer,
+)
+from apps.surveys.usecases.get_next_question import GetNextQuestionUseCase
+from apps.surveys.usecases.submit_answer import SubmitAnswerUseCase
+
+User = get_user_model()
+
+
+class LockWaitRecorder:
+    """Время SQL-запросов, ожидающих блокировок строк (FOR UPDATE, INSERT)."""
+
+    def __init__(self):
+        self.waits = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if " FOR UPDATE" not in sql and not sql.startswith("INSERT"):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.waits.append(time.perf_counter() - started)
+
+
+def run_worker(worker, plan, barrier, with_next):
+    """
+    Выполняет раунды одного воркера; все воркеры раунда стартуют одновременно.
+
+    plan - список (user_id, survey_id, question_id, option_id) по раундам.
+    Возвращает результаты вызовов и времена ожидания блокировок.
+    """
+    results = []
+    recorder = LockWaitRecorder()
+    users = {user.id: user for user in User.objects.filter(id__in={p[0] for p in plan})}
+    try:
+        with connection.execute_wrapper(recorder):
+            for user_id, survey_id, question_id, option_id in plan:
+                barrier.wait()
+                started = time.perf_counter()
+                try:
+                    if with_next:
+                        GetNextQuestionUseCase(users[user_id], survey_id).execute()
+                    answer = SubmitAnswerUseCase(users[user_id], survey_id).execute(
+                        question_id, option_id
+                    )
+                    results.append(
+                        (worker, answer.id, None, time.perf_counter() - started)
+                    )
+                except Exception as error:
+                    results.append(
+                        (
+                            worker,
+                            None,
+                            f"{type(error).__name__}: {error}",
+                            time.perf_counter() - started,
+                        )
+                    )
+    finally:
+        connection.close()
+    return results, recorder.waits
+
+
+def _process_worker(worker, plan, barrier, with_next, queue):
+    # Родитель закрывает соединения перед fork, дочерний процесс открывает свои
+    queue.put(run_worker(worker, plan, barrier, with_next))
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагружает создание сессий и отправку ответов одновременными запросами "
+        "одного пользователя и проверяет отсутствие дублей сессий и потерянных ответов"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--rounds", type=int, default=20)
+        parser.add_argument(
+            "--mode",
+            choices=["thread", "process"],
+            default="thread",
+            help="Параллелизм потоками или процессами",
+        )
+        parser.add_argument(
+            "--users-per-round",
+            type=int,
+            default=1,
+            help="Сколько пользователей делят воркеров раунда",
+        )
+        parser.add_argument("--questions", type=int, default=5)
+        parser.add_argument(
+            "--skip-next",
+            action="store_true",
+            help="Не запрашивать следующий вопрос перед отправкой ответа",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Не удалять созданные данные"
+        )
+
+    def handle(self, *args, **options):
+        if options["mode"] == "process" and connection.vendor == "sqlite":
+            raise CommandError("Режим process требует PostgreSQL.")
+
+        self.options = options
+        self._create_fixtures()
+        try:
+            report = self._run()
+            self._print(report)
+        finally:
+            if not options["keep"]:
+                self.author.delete()
+                User.objects.filter(id__in=self.user_ids).delete()
+
+        if (
+            report["duplicate_open_sessions"]
+            or report["lost_answers"]
+            or report["counter_drift"]
+        ):
+            raise CommandError(
+                "Обнаружены дубли сессий, потерянные ответы или расхождение счётчиков."
+            )
+
+    def _create_fixtures(self):
+        """Опрос и свежие пользователи: в каждом раунде сессия ещё не создана."""
+        options = self.options
+        stamp = time.strftime("%Y%m%d%H%M%S")
+        self.author = User.objects.create_user(
+            username=f"stress-author-{stamp}", is_author=True
+        )
+        self.survey = Survey.objects.create(title="Stress", author=self.author)
+        self.questions = []
+        for order in range(1, options["questions"] + 1):
+            question = Question.objects.create(
+                survey=self.survey, text=f"Вопрос {order}", order=order
+            )
+            option = AnswerOption.objects.create(
+                question=question, text="Вариант", order=1
+            )
+            self.questions.append((question.id, option.id))
+
+        users = User.objects.bulk_create(
+            [
+                User(username=f"stress-{stamp}-{round_}-{index}")
+                for round_ in range(options["rounds"])
+                for index in range(options["users_per_round"])
+            ]
+        )
+        self.user_ids = [user.id for user in users]
+
+        # plans[worker] - задания воркера по раундам
+        self.plans = [[] for _ in range(options["workers"])]
+        per_round = options["users_per_round"]
+        for round_ in range(options["rounds"]):
+            round_users = self.user_ids[round_ * per_round : (round_ + 1) * per_round]
+            for worker in range(options["workers"]):
+                question_id, option_id = self.questions[worker % len(self.questions)]
+                self.plans[worker].append(
+                    (
+                        round_users[worker % len(round_users)],
+                        self.survey.id,
+                        question_id,
+                        option_id,
+                    )
+                )
+
+    def _run(self):
+        options = self.options
+        with_next = not options["skip_next"]
+        started = time.perf_counter()
+
+        if options["mode"] == "thread":
+            barrier = threading.Barrier(options["workers"])
+            outputs = [None] * options["workers"]
+
+            def target(worker):
+                outputs[worker] = run_worker(
+                    worker, self.plans[worker], barrier, with_next
+                )
+
+            threads = [
+                threading.Thread(target=target, args=(worker,))
+                for worker in range(options["workers"])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        else:
+            context = multiprocessing.get_context("fork")
+            barrier = context.Barrier(options["workers"])
+            queue = context.Queue()
+            connections.close_all()
+            processes = [
+                context.Process(
+                    target=_process_worker,
+                    args=(worker, self.plans[worker], barrier, with_next, queue),
+                )
+                for worker in range(options["workers"])
+            ]
+            for process in processes:
+                process.start()
+            outputs = [queue.get() for _ in processes]
+            for process in processes:
+                process.join()
+
+        elapsed = time.perf_counter() - started
+        results = [result for output, _ in outputs for result in output]
+        waits = sorted(wait for _, output in outputs for wait in output)
+        return self._verify(results, waits, elapsed)
+
+    def _verify(self, results, waits, elapsed):
+        """Сверяет результаты вызовов с состоянием базы."""
+        answer_ids = {answer_id for _, answer_id, _, _ in results if answer_id}
+        stored = set(
+            UserAnswer.objects.filter(id__in=answer_ids).values_list("id", flat=True)
+        )
+        duplicates = (
+            SurveySession.objects.filter(
+                survey=self.survey, user_id__in=self.user_ids, is_completed=False
+            )
+            .values("user_id")
+            .annotate(total=Count("id"))
+            .filter(total__gt=1)
+            .count()
+        )
+        # Сессия со всеми ответами, не отмеченная завершённой
+        total_questions = len(self.questions)
+        unfinished = (
+            SurveySession.objects.filter(survey=self.survey, is_completed=False)
+            .annotate(answered=Count("answers"))
+            .filter(answered__gte=total_questions)
+            .count()
+        )
+        # Расхождение счётчиков опроса с фактическим числом сессий: счётчики
+        # увеличиваются в транзакции ответа и откатываются вместе с ней
+        sessions = SurveySession.objects.filter(survey=self.survey)
+        self.survey.refresh_from_db(fields=["session_count", "completed_count"])
+        counter_drift = abs(self.survey.session_count - sessions.count()) + abs(
+            self.survey.completed_count - sessions.filter(is_completed=True).count()
+        )
+
+        latencies = sorted(duration for _, _, _, duration in results)
+        succeeded = [result for result in results if result[1]]
+        return {
+            "mode": self.options["mode"],
+            "database": connection.vendor,
+            "calls": len(results),
+            "succeeded": len(succeeded),
+            "errors": dict(Counter(error for _, _, error, _ in results if error)),
+            "throughput_rps": len(succeeded) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "lock_wait_total_ms": sum(waits) * 1000,
+            "lock_wait_p95_ms": percentile(waits, 0.95) * 1000,
+            "lock_wait_mean_ms": statistics.fmean(waits) * 1000 if waits else 0.0,
+            "duplicate_open_sessions": duplicates,
+            "lost_answers": len(answer_ids - stored),
+            "unfinished_complete_sessions": unfinished,
+            "counter_drift": counter_drift,
+        }
+
+    def _print(self, report):
+        for key, value in report.items():
+            if isinstance(value, float):
+                value = f"{value:.2f}"
+            self.stdout.write(f"{key:<30} {value}")
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0003_alter_answeroption_options_alter_question_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='revision',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
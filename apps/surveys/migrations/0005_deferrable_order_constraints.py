@@ -0,0 +1,70 @@
+# Generated by Django 5.1.3 on 2026-10-19 01:20
+
+import django.db.models.constraints
+from django.db import migrations, models
+
+# Django не создаёт отложенные ограничения на бэкендах без их поддержки
+# (SQLite), поэтому там сохраняется прежнее немедленное ограничение, а
+# перестановка выполняется двухфазным сдвигом (apps.surveys.ordering).
+ORDER_CONSTRAINTS = [
+    ("questions", "unique_question_order_per_survey", ["survey_id", "order"]),
+    ("answer_options", "unique_answer_order_per_question", ["question_id", "order"]),
+]
+
+
+def _recreate_constraints(schema_editor, deferrable):
+    connection = schema_editor.connection
+    if not connection.features.supports_deferrable_unique_constraints:
+        return
+
+    quote = schema_editor.quote_name
+    suffix = " DEFERRABLE INITIALLY DEFERRED" if deferrable else ""
+    for table, name, columns in ORDER_CONSTRAINTS:
+        schema_editor.execute(
+            f"ALTER TABLE {quote(table)} DROP CONSTRAINT {quote(name)}"
+        )
+        schema_editor.execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} "
+            f"UNIQUE ({', '.join(quote(column) for column in columns)}){suffix}"
+        )
+
+
+def make_deferrable(apps, schema_editor):
+    _recreate_constraints(schema_editor, deferrable=True)
+
+
+def make_immediate(apps, schema_editor):
+    _recreate_constraints(schema_editor, deferrable=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0004_survey_revision'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(make_deferrable, make_immediate),
+            ],
+            state_operations=[
+                migrations.RemoveConstraint(
+                    model_name='answeroption',
+                    name='unique_answer_order_per_question',
+                ),
+                migrations.RemoveConstraint(
+                    model_name='question',
+                    name='unique_question_order_per_survey',
+                ),
+                migrations.AddConstraint(
+                    model_name='answeroption',
+                    constraint=models.UniqueConstraint(deferrable=django.db.models.constraints.Deferrable['DEFERRED'], fields=('question', 'order'), name='unique_answer_order_per_question'),
+                ),
+                migrations.AddConstraint(
+                    model_name='question',
+                    constraint=models.UniqueConstraint(deferrable=django.db.models.constraints.Deferrable['DEFERRED'], fields=('survey', 'order'), name='unique_question_order_per_survey'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.3 on 2026-10-19 01:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("surveys", "0005_deferrable_order_constraints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="survey",
+            name="original",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="versions",
+                to="surveys.survey",
+            ),
+        ),
+        migrations.AddField(
+            model_name="survey",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
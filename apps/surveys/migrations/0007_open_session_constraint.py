@@ -0,0 +1,63 @@
+# Generated by Django 5.1.3 on 2026-10-19 01:50
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_open_sessions(apps, schema_editor):
+    """
+    Оставляет одну незавершённую сессию на пару (пользователь, опрос).
+
+    Сохраняется самая ранняя сессия; ответы остальных переносятся в неё,
+    если вопрос в ней ещё не отвечен, остальные ответы и сессии удаляются.
+    """
+    SurveySession = apps.get_model("surveys", "SurveySession")
+    UserAnswer = apps.get_model("surveys", "UserAnswer")
+
+    duplicates = (
+        SurveySession.objects.filter(is_completed=False)
+        .values("user_id", "survey_id")
+        .annotate(total=Count("id"))
+        .filter(total__gt=1)
+    )
+    for pair in list(duplicates):
+        sessions = list(
+            SurveySession.objects.filter(
+                user_id=pair["user_id"], survey_id=pair["survey_id"], is_completed=False
+            ).order_by("started_at", "id")
+        )
+        keep, extra = sessions[0], sessions[1:]
+        answered = set(
+            UserAnswer.objects.filter(session=keep).values_list(
+                "question_id", flat=True
+            )
+        )
+        for answer in UserAnswer.objects.filter(session__in=extra).order_by(
+            "-answered_at"
+        ):
+            if answer.question_id not in answered:
+                answered.add(answer.question_id)
+                answer.session = keep
+                answer.save(update_fields=["session"])
+        SurveySession.objects.filter(id__in=[session.id for session in extra]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("surveys", "0006_survey_versions"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_open_sessions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="surveysession",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_completed", False)),
+                fields=("user", "survey"),
+                name="unique_open_session_per_user",
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.3 on 2026-10-19 03:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    """Заполняет счётчики существующих опросов."""
+    Survey = apps.get_model("surveys", "Survey")
+    Question = apps.get_model("surveys", "Question")
+    SurveySession = apps.get_model("surveys", "SurveySession")
+
+    def count(model, **filters):
+        return Coalesce(
+            Subquery(
+                model.objects.filter(survey=OuterRef("pk"), **filters)
+                .order_by()
+                .values("survey")
+                .annotate(total=Count("pk"))
+                .values("total")
+            ),
+            0,
+        )
+
+    Survey.objects.update(
+        question_count=count(Question),
+        session_count=count(SurveySession),
+        completed_count=count(SurveySession, is_completed=True),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("surveys", "0007_open_session_constraint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="survey",
+            name="question_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="survey",
+            name="session_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="survey",
+            name="completed_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,47 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connections, models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 User = get_user_model()
 
 
+class SurveyQuerySet(models.QuerySet):
+    def refresh_counters(self):
+        """
+        Пересчитывает денормализованные счётчики опросов одним UPDATE.
+
+        Нужен после массовой загрузки данных в обход сценариев, правки
+        вопросов в админке и для исправления расхождений, например после
+        каскадного удаления сессий вместе с пользователями.
+        """
+
+        def count(model, **filters):
+            return Coalesce(
+                Subquery(
+                    model.objects.filter(survey=OuterRef("pk"), **filters)
+                    .order_by()
+                    .values("survey")
+                    .annotate(total=Count("pk"))
+                    .values("total")
+                ),
+                0,
+            )
+
+        return self.update(
+            question_count=count(Question),
+            session_count=count(SurveySession),
+            completed_count=count(SurveySession, is_completed=True),
+        )
+
+    def bump_revision(self):
+        """Увеличивает ревизию опросов, изменённых в обход сценариев (админка)."""
+        return self.update(revision=F("revision") + 1, updated_at=timezone.now())
+
+
 class Survey(models.Model):
     """
     Модель опроса, представляющая анкету, созданную автором.
@@ -20,6 +56,25 @@ class Survey(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True, db_index=True)
+    # Ревизия определения опроса: увеличивается один раз на каждое изменение
+    # вопросов или вариантов, служит маркером для инвалидации кэшей
+    revision = models.PositiveIntegerField(default=1)
+    # Исходный опрос для версий, созданных клонированием, и номер версии
+    original = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="versions",
+    )
+    version = models.PositiveIntegerField(default=1)
+    # Денормализованные счётчики для списка опросов: поддерживаются
+    # сценариями создания, изменения и прохождения опроса
+    question_count = models.PositiveIntegerField(default=0)
+    session_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+
+    objects = SurveyQuerySet.as_manager()
 
     class Meta:
         db_table = "surveys"
@@ -60,8 +115,11 @@ class Question(models.Model):
             models.Index(fields=["survey", "order"]),
         ]
         constraints = [
+            # На PostgreSQL проверка отложена до COMMIT: порядок меняется одним UPDATE
             models.UniqueConstraint(
-                fields=["survey", "order"], name="unique_question_order_per_survey"
+                fields=["survey", "order"],
+                name="unique_question_order_per_survey",
+                deferrable=models.Deferrable.DEFERRED,
             )
         ]
 
@@ -93,7 +151,9 @@ class AnswerOption(models.Model):
         ]
         constraints = [
             models.UniqueConstraint(
-                fields=["question", "order"], name="unique_answer_order_per_question"
+                fields=["question", "order"],
+                name="unique_answer_order_per_question",
+                deferrable=models.Deferrable.DEFERRED,
             )
         ]
 
@@ -101,6 +161,59 @@ class AnswerOption(models.Model):
         return f"{self.question.text[:30]} - {self.text}"
 
 
+class SurveySessionManager(models.Manager):
+    def get_or_create_open(self, user, survey, lock=False):
+        """
+        Возвращает незавершённую сессию пользователя, создавая её при отсутствии.
+
+        Сессия создаётся одним INSERT ... ON CONFLICT DO NOTHING: при
+        одновременных первых запросах частичный уникальный индекс
+        unique_open_session_per_user оставляет ровно одну сессию, а
+        проигравший запрос читает её. При lock=True строка сессии
+        блокируется до конца транзакции (SELECT ... FOR UPDATE).
+        Возвращает (сессия, создана).
+        """
+        sessions = self.filter(user=user, survey=survey, is_completed=False)
+        if lock:
+            sessions = sessions.select_for_update()
+
+        connection = connections[self.db]
+        if connection.vendor not in ("postgresql", "sqlite"):
+            return sessions.get_or_create(user=user, survey=survey, is_completed=False)
+
+        opts = self.model._meta
+        quote = connection.ops.quote_name
+        columns = [
+            opts.get_field(name).column
+            for name in ("user", "survey", "started_at", "is_completed")
+        ]
+        while True:
+            session = sessions.first()
+            if session is not None:
+                return session, False
+
+            started_at = timezone.now()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {quote(opts.db_table)} "
+                    f"({', '.join(map(quote, columns))}) VALUES (%s, %s, %s, %s) "
+                    f"ON CONFLICT DO NOTHING RETURNING {quote(opts.pk.column)}",
+                    [user.pk, survey.pk, started_at, False],
+                )
+                row = cursor.fetchone()
+
+            if row is not None:
+                # Вставленная строка уже заблокирована текущей транзакцией
+                session = self.model(
+                    pk=row[0], user=user, survey=survey, started_at=started_at
+                )
+                session._state.adding = False
+                session._state.db = self.db
+                return session, True
+            # Сессию создал параллельный запрос (или успел её завершить):
+            # читаем заново
+
+
 class SurveySession(models.Model):
     """
     Модель сессии опроса, отслеживающая попытку пользователя завершить опрос.
@@ -118,6 +231,8 @@ class SurveySession(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True, db_index=True)
     is_completed = models.BooleanField(default=False, db_index=True)
 
+    objects = SurveySessionManager()
+
     class Meta:
         db_table = "survey_sessions"
         verbose_name = "Сессия опроса"
@@ -129,6 +244,14 @@ class SurveySession(models.Model):
             models.Index(fields=["user", "started_at"]),
             models.Index(fields=["survey", "completed_at"]),
         ]
+        constraints = [
+            # У пользователя не больше одной незавершённой сессии опроса
+            models.UniqueConstraint(
+                fields=["user", "survey"],
+                condition=models.Q(is_completed=False),
+                name="unique_open_session_per_user",
+            )
+        ]
 
     def __str__(self):
         status = "Завершён" if self.is_completed else "В процессе"
@@ -0,0 +1,52 @@
+from django.db import connection
+from django.db.models import F, Max
+
+
+def park_orders(queryset, ids, final_orders):
+    """
+    Временно переносит строки с указанными ID за пределы занятых значений order.
+
+    Ограничения unique_question_order_per_survey и unique_answer_order_per_question
+    на бэкендах без отложенных ограничений (SQLite) проверяются построчно,
+    поэтому перестановка порядка одним UPDATE может нарушить их на
+    промежуточном шаге. Сдвиг на смещение, превышающее как текущие, так и
+    итоговые значения, освобождает все целевые позиции одним запросом, после
+    чего итоговый порядок записывается вторым запросом. На PostgreSQL
+    ограничения проверяются при COMMIT, и сдвиг не нужен.
+
+    queryset - строки одной области уникальности (вопросы опроса или варианты
+    вопроса), final_orders - итоговые значения order, которые будут записаны.
+    """
+    if not ids or connection.features.supports_deferrable_unique_constraints:
+        return
+
+    current_max = queryset.aggregate(max_order=Max("order"))["max_order"] or 0
+    offset = max([current_max, *final_orders]) + 1
+
+    queryset.filter(id__in=ids).update(order=F("order") + offset)
+
+
+def apply_order(queryset, ordered_ids):
+    """
+    Записывает полный новый порядок строк: order равен позиции ID в списке.
+
+    ordered_ids должен содержать ровно все ID строк queryset, иначе
+    выбрасывается ValueError. Обновляются только строки, чья позиция
+    изменилась, одним UPDATE ... CASE. Возвращает количество обновлённых строк.
+    """
+    current_orders = dict(queryset.values_list("id", "order"))
+    if len(ordered_ids) != len(current_orders) or set(ordered_ids) != set(
+        current_orders
+    ):
+        raise ValueError("Необходимо передать полный список элементов без повторов.")
+
+    moved = [
+        queryset.model(id=item_id, order=position)
+        for position, item_id in enumerate(ordered_ids)
+        if current_orders[item_id] != position
+    ]
+    if not moved:
+        return 0
+
+    park_orders(queryset, [item.id for item in moved], [item.order for item in moved])
+    return queryset.model.objects.bulk_update(moved, ["order"])
@@ -0,0 +1,81 @@
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from apps.surveys.models import AnswerOption, Question, Survey
+
+
+class CloneSurveyUseCase:
+    def __init__(self, author, survey_id):
+        self.author = author
+        self.survey_id = survey_id
+
+    @transaction.atomic
+    def execute(self, title=None, as_version=False, is_active=True):
+        """
+        Копирует опрос вместе с вопросами и вариантами ответов.
+
+        Вопросы и варианты копируются на стороне базы двумя запросами
+        INSERT ... SELECT, независимо от размера опроса. При as_version=True
+        копия становится следующей версией исходного опроса.
+        """
+        try:
+            source = Survey.objects.get(id=self.survey_id)
+        except Survey.DoesNotExist:
+            raise ValueError("Опрос не существует.")
+
+        # Проверяем права автора
+        if not self.author.is_author or source.author_id != self.author.id:
+            raise PermissionError("Только автор опроса может копировать его.")
+
+        original = None
+        version = 1
+        if as_version:
+            # Все версии ссылаются на корневой опрос семейства
+            original = Survey.objects.select_for_update().get(
+                id=source.original_id or source.id
+            )
+            version = (
+                Survey.objects.filter(
+                    Q(id=original.id) | Q(original=original)
+                ).aggregate(max_version=Max("version"))["max_version"]
+                + 1
+            )
+
+        clone = Survey.objects.create(
+            title=title or source.title,
+            author=self.author,
+            is_active=is_active,
+            original=original,
+            version=version,
+            question_count=source.question_count,
+        )
+        self._copy_definition(source, clone)
+
+        return clone
+
+    def _copy_definition(self, source, clone):
+        """Копирует вопросы и варианты запросами INSERT ... SELECT."""
+        quote = connection.ops.quote_name
+        questions = quote(Question._meta.db_table)
+        options = quote(AnswerOption._meta.db_table)
+        order = quote("order")
+        now = timezone.now()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {questions} (survey_id, text, {order}, created_at) "
+                f"SELECT %s, text, {order}, %s FROM {questions} WHERE survey_id = %s",
+                [clone.id, now, source.id],
+            )
+            # Новые вопросы сопоставляются с исходными по уникальному order
+            cursor.execute(
+                f"INSERT INTO {options} (question_id, text, {order}, created_at) "
+                f"SELECT new_q.id, opt.text, opt.{order}, %s "
+                f"FROM {options} opt "
+                f"JOIN {questions} src_q ON src_q.id = opt.question_id "
+                f"JOIN {questions} new_q "
+                f"ON new_q.survey_id = %s AND new_q.{order} = src_q.{order} "
+                f"WHERE src_q.survey_id = %s",
+                [now, clone.id, source.id],
+            )
@@ -1,5 +1,6 @@
 from django.db import transaction
 
+from apps.core.metrics import timed
 from apps.surveys.models import AnswerOption, Question, Survey
 
 
@@ -7,6 +8,7 @@ class CreateSurveyUseCase:
     def __init__(self, author):
         self.author = author
 
+    @timed("create_survey")
     @transaction.atomic
     def execute(self, title, questions_data):
         """
@@ -19,7 +21,9 @@ class CreateSurveyUseCase:
             )
 
         # Создаём опрос
-        survey = Survey.objects.create(title=title, author=self.author)
+        survey = Survey.objects.create(
+            title=title, author=self.author, question_count=len(questions_data)
+        )
 
         # Создаём вопросы и варианты ответов
         for question_data in questions_data:
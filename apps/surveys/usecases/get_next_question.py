@@ -1,3 +1,7 @@
+from django.db import transaction
+from django.db.models import F
+
+from apps.core.metrics import timed
 from apps.surveys.models import Question, Survey, SurveySession, UserAnswer
 
 
@@ -6,6 +10,7 @@ class GetNextQuestionUseCase:
         self.user = user
         self.survey_id = survey_id
 
+    @timed("get_next_question")
     def execute(self):
         """
         Получает следующий вопрос для пользователя в опросе вместе с прогрессом.
@@ -15,10 +20,17 @@ class GetNextQuestionUseCase:
         except Survey.DoesNotExist:
             raise ValueError("Опрос не существует или неактивен.")
 
-        # Получаем или создаём сессию опроса
-        session, created = SurveySession.objects.get_or_create(
-            user=self.user, survey=survey, is_completed=False
-        )
+        # Получаем или создаём сессию опроса; счётчик увеличивается в той же
+        # транзакции, что и создание сессии, последним запросом перед COMMIT.
+        # Ошибки здесь не перехватываются, поэтому точка сохранения не нужна
+        with transaction.atomic(savepoint=False):
+            session, created = SurveySession.objects.get_or_create_open(
+                self.user, survey
+            )
+            if created:
+                Survey.objects.filter(id=survey.id).update(
+                    session_count=F("session_count") + 1
+                )
 
         # Получаем все ID отвеченных вопросов для этой сессии
         answered_question_ids = set(
@@ -60,4 +72,5 @@ class GetNextQuestionUseCase:
             "progress": progress,
             "is_completed": is_completed,
             "session": session,
+            "survey": survey,
         }
@@ -1,5 +1,6 @@
 from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q
 
+from apps.core.metrics import timed
 from apps.surveys.models import (
     Question,
     Survey,
@@ -12,9 +13,14 @@ class GetStatisticsUseCase:
     def __init__(self, survey_id):
         self.survey_id = survey_id
 
-    def execute(self):
+    @timed("get_statistics", lazy="questions_statistics")
+    def execute(self, stream=False):
         """
         Получает подробную статистику по опросу.
+
+        С stream=True questions_statistics возвращается генератором:
+        статистика вопросов вычисляется по мере чтения, и в памяти находится
+        только текущий вопрос (см. api.streaming.StreamingJSONRenderer).
         """
         # Проверяем существование опроса
         try:
@@ -22,77 +28,211 @@ class GetStatisticsUseCase:
         except Survey.DoesNotExist:
             raise ValueError("Опрос не существует.")
 
-        # Получаем общее количество и завершённые ответы
-        total_sessions = SurveySession.objects.filter(survey=survey).count()
-        completed_sessions = SurveySession.objects.filter(
-            survey=survey, is_completed=True
-        ).count()
+        # Общее количество, завершённые ответы и среднее время прохождения
+        # вычисляем одним агрегирующим запросом
+        session_stats = SurveySession.objects.filter(survey=survey).aggregate(
+            total=Count("id"),
+            completed=Count("id", filter=Q(is_completed=True)),
+            avg_duration=Avg(
+                ExpressionWrapper(
+                    F("completed_at") - F("started_at"),
+                    output_field=DurationField(),
+                ),
+                filter=Q(
+                    is_completed=True,
+                    completed_at__isnull=False,
+                    started_at__isnull=False,
+                ),
+            ),
+        )
+        total_sessions = session_stats["total"]
+        completed_sessions = session_stats["completed"]
 
-        # Вычисляем среднее время прохождения, используя агрегацию базы данных
         avg_completion_time = None
-        completed_sessions_with_time = SurveySession.objects.filter(
-            survey=survey,
-            is_completed=True,
-            completed_at__isnull=False,
-            started_at__isnull=False,
-        ).annotate(
-            duration=ExpressionWrapper(
-                F("completed_at") - F("started_at"),
-                output_field=DurationField(),
-            )
-        )
+        if session_stats["avg_duration"]:
+            avg_completion_time = session_stats["avg_duration"].total_seconds()
+
+        questions_statistics = self.iter_questions_statistics(survey)
+        if not stream:
+            questions_statistics = list(questions_statistics)
 
-        if completed_sessions_with_time.exists():
-            # Вычисляем среднюю продолжительность
-            avg_duration = completed_sessions_with_time.aggregate(
-                avg_duration=Avg("duration")
-            )["avg_duration"]
+        return {
+            "survey_id": survey.id,
+            "survey_title": survey.title,
+            "total_responses": total_sessions,
+            "completed_responses": completed_sessions,
+            "average_completion_time": avg_completion_time,
+            "questions_statistics": questions_statistics,
+        }
 
-            if avg_duration:
-                avg_completion_time = avg_duration.total_seconds()
+    def iter_questions_statistics(self, survey):
+        """
+        Статистика вопросов опроса по одному в порядке order.
 
-        # Получаем статистику по каждому вопросу
-        questions = Question.objects.filter(survey=survey).order_by("order")
-        questions_statistics = []
+        Вопросы и распределение ответов читаются двумя курсорами в одном
+        порядке и сливаются, поэтому ответы всех вопросов в памяти не
+        собираются; запросов по-прежнему два.
+        """
+        answer_stats = (
+            UserAnswer.objects.filter(survey=survey)
+            .values("question_id", "selected_option", "selected_option__text")
+            .annotate(count=Count("id"))
+            .order_by("question__order", "-count")
+            .iterator()
+        )
+        pending = next(answer_stats, None)
 
+        questions = (
+            Question.objects.filter(survey=survey)
+            .order_by("order")
+            .values_list("id", "text", "order", named=True)
+            .iterator()
+        )
         for question in questions:
-            # Получаем количество ответов для этого вопроса
-            answer_stats = (
-                UserAnswer.objects.filter(question=question)
-                .values("selected_option", "selected_option__text")
-                .annotate(count=Count("id"))
-                .order_by("-count")
-            )
+            stats = []
+            while pending is not None and pending["question_id"] == question.id:
+                stats.append(pending)
+                pending = next(answer_stats, None)
+            yield self.question_statistics(question, stats)
+
+    @staticmethod
+    def question_statistics(question, answer_stats):
+        total_answers = sum(stat["count"] for stat in answer_stats)
 
-            total_answers = sum(stat["count"] for stat in answer_stats)
+        popular_answers = [
+            {
+                "answer_option_id": stat["selected_option"],
+                "answer_text": stat["selected_option__text"],
+                "count": stat["count"],
+                "percentage": (stat["count"] / total_answers * 100)
+                if total_answers > 0
+                else 0,
+            }
+            for stat in answer_stats
+        ]
 
-            popular_answers = [
+        return {
+            "question_id": question.id,
+            "question_text": question.text,
+            "question_order": question.order,
+            "total_answers": total_answers,
+            "popular_answers": popular_answers,
+        }
+
+
+class GetVersionStatisticsUseCase:
+    def __init__(self, survey_id):
+        self.survey_id = survey_id
+
+    def execute(self):
+        """
+        Сравнивает статистику всех версий опроса.
+
+        Вопросы и варианты разных версий сопоставляются по полю order.
+        Количество запросов не зависит от числа версий и вопросов.
+        """
+        try:
+            survey = Survey.objects.get(id=self.survey_id)
+        except Survey.DoesNotExist:
+            raise ValueError("Опрос не существует.")
+
+        root_id = survey.original_id or survey.id
+        versions = list(
+            Survey.objects.filter(Q(id=root_id) | Q(original_id=root_id))
+            .order_by("version")
+            .values("id", "title", "version", "is_active")
+        )
+        version_by_survey = {row["id"]: row["version"] for row in versions}
+
+        # Сводка по сессиям всех версий одним запросом
+        session_stats = {
+            row["survey_id"]: row
+            for row in SurveySession.objects.filter(survey_id__in=version_by_survey)
+            .values("survey_id")
+            .annotate(
+                total=Count("id"),
+                completed=Count("id", filter=Q(is_completed=True)),
+                avg_duration=Avg(
+                    ExpressionWrapper(
+                        F("completed_at") - F("started_at"),
+                        output_field=DurationField(),
+                    ),
+                    filter=Q(is_completed=True, completed_at__isnull=False),
+                ),
+            )
+            .order_by()
+        }
+
+        versions_statistics = []
+        for row in versions:
+            stats = session_stats.get(row["id"], {})
+            total = stats.get("total", 0)
+            completed = stats.get("completed", 0)
+            avg_duration = stats.get("avg_duration")
+            versions_statistics.append(
                 {
-                    "answer_option_id": stat["selected_option"],
-                    "answer_text": stat["selected_option__text"],
-                    "count": stat["count"],
-                    "percentage": (stat["count"] / total_answers * 100)
-                    if total_answers > 0
-                    else 0,
+                    "survey_id": row["id"],
+                    "version": row["version"],
+                    "title": row["title"],
+                    "is_active": row["is_active"],
+                    "total_responses": total,
+                    "completed_responses": completed,
+                    "completion_rate": (completed / total * 100) if total > 0 else 0,
+                    "average_completion_time": avg_duration.total_seconds()
+                    if avg_duration
+                    else None,
                 }
-                for stat in answer_stats
-            ]
+            )
 
-            questions_statistics.append(
+        # Вопросы всех версий, сгруппированные по порядку
+        questions = {}
+        for row in (
+            Question.objects.filter(survey_id__in=version_by_survey)
+            .values("survey_id", "order", "text")
+            .order_by("order", "survey__version")
+        ):
+            questions.setdefault(row["order"], {})[row["survey_id"]] = {
+                "survey_id": row["survey_id"],
+                "version": version_by_survey[row["survey_id"]],
+                "question_text": row["text"],
+                "total_answers": 0,
+                "answers": [],
+            }
+
+        # Распределение ответов по всем версиям одним запросом
+        for row in (
+            UserAnswer.objects.filter(survey_id__in=version_by_survey)
+            .values(
+                "survey_id",
+                "question__order",
+                "selected_option__order",
+                "selected_option__text",
+            )
+            .annotate(count=Count("id"))
+            .order_by("question__order", "selected_option__order")
+        ):
+            entry = questions[row["question__order"]][row["survey_id"]]
+            entry["total_answers"] += row["count"]
+            entry["answers"].append(
                 {
-                    "question_id": question.id,
-                    "question_text": question.text,
-                    "question_order": question.order,
-                    "total_answers": total_answers,
-                    "popular_answers": popular_answers,
+                    "answer_order": row["selected_option__order"],
+                    "answer_text": row["selected_option__text"],
+                    "count": row["count"],
                 }
             )
 
+        for by_version in questions.values():
+            for entry in by_version.values():
+                for answer in entry["answers"]:
+                    answer["percentage"] = (
+                        answer["count"] / entry["total_answers"] * 100
+                    )
+
         return {
-            "survey_id": survey.id,
-            "survey_title": survey.title,
-            "total_responses": total_sessions,
-            "completed_responses": completed_sessions,
-            "average_completion_time": avg_completion_time,
-            "questions_statistics": questions_statistics,
+            "original_survey_id": root_id,
+            "versions": versions_statistics,
+            "questions": [
+                {"question_order": order, "versions": list(by_version.values())}
+                for order, by_version in sorted(questions.items())
+            ],
         }
@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.surveys.models import AnswerOption, Question, Survey
+from apps.surveys.ordering import apply_order
+
+
+class ReorderUseCase:
+    def __init__(self, author, survey_id):
+        self.author = author
+        self.survey_id = survey_id
+
+    def _get_survey(self):
+        """Блокирует опрос и проверяет, что пользователь является его автором."""
+        try:
+            survey = Survey.objects.select_for_update().get(id=self.survey_id)
+        except Survey.DoesNotExist:
+            raise ValueError("Опрос не существует.")
+
+        if survey.author_id != self.author.id:
+            raise PermissionError("Только автор опроса может изменять его.")
+
+        return survey
+
+    def _touch(self, survey):
+        """Увеличивает ревизию опроса, чтобы инвалидировать кэши."""
+        Survey.objects.filter(id=survey.id).update(
+            revision=F("revision") + 1, updated_at=timezone.now()
+        )
+        survey.refresh_from_db(fields=["revision", "updated_at"])
+
+    @transaction.atomic
+    def reorder_questions(self, question_ids):
+        """
+        Устанавливает порядок вопросов опроса согласно полному списку ID.
+        """
+        survey = self._get_survey()
+
+        if apply_order(Question.objects.filter(survey=survey), question_ids):
+            self._touch(survey)
+
+        return survey
+
+    @transaction.atomic
+    def reorder_answer_options(self, question_id, option_ids):
+        """
+        Устанавливает порядок вариантов ответа вопроса согласно полному списку ID.
+        """
+        survey = self._get_survey()
+
+        if not Question.objects.filter(id=question_id, survey=survey).exists():
+            raise ValueError("Вопрос не принадлежит этому опросу.")
+
+        if apply_order(
+            AnswerOption.objects.filter(question_id=question_id), option_ids
+        ):
+            self._touch(survey)
+
+        return survey
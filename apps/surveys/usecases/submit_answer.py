@@ -1,6 +1,8 @@
 from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 
+from apps.core.metrics import timed
 from apps.surveys.models import (
     AnswerOption,
     Question,
@@ -15,10 +17,17 @@ class SubmitAnswerUseCase:
         self.user = user
         self.survey_id = survey_id
 
+    @timed("submit_answer")
     @transaction.atomic
-    def execute(self, question_id, answer_option_id):
+    def execute(self, question_id, answer_option_id, include_next=False):
         """
         Отправляет ответ на вопрос в опросе.
+
+        С include_next=True возвращает словарь с ответом и следующим вопросом
+        в формате GetNextQuestionUseCase ("answer", "question", "progress",
+        "is_completed", "session", "survey"). Следующий вопрос выбирается в
+        той же транзакции по уже загруженным опросу, сессии и счётчикам, что
+        избавляет клиента от отдельного запроса next-question.
         """
         # Проверяем существование опроса
         try:
@@ -40,12 +49,11 @@ class SubmitAnswerUseCase:
         except AnswerOption.DoesNotExist:
             raise ValueError("Вариант ответа не принадлежит этому вопросу.")
 
-        # Получаем или создаём сессию опроса
-        session, created = SurveySession.objects.get_or_create(
-            user=self.user,
-            survey=survey,
-            is_completed=False,
-            defaults={"started_at": timezone.now()},
+        # Получаем или создаём сессию опроса и блокируем её до конца транзакции:
+        # параллельные ответы пользователя обрабатываются по очереди, и
+        # проверка завершения ниже видит все ответы сессии
+        session, session_created = SurveySession.objects.get_or_create_open(
+            self.user, survey, lock=True
         )
 
         # Создаём или обновляем ответ
@@ -59,13 +67,51 @@ class SubmitAnswerUseCase:
             },
         )
 
-        # Проверяем, завершён ли опрос
+        # Проверяем, завершён ли опрос. Вопросы считаются по таблице, а не по
+        # question_count: вопросы, добавленные через админку, учитываются сразу
         total_questions = survey.questions.count()
         answered_questions = session.answers.count()
+        completed = answered_questions >= total_questions
 
-        if answered_questions >= total_questions:
+        if completed:
             session.is_completed = True
             session.completed_at = timezone.now()
             session.save()
 
-        return answer
+        # Первый неотвеченный вопрос сессии с вариантами ответа
+        next_question = None
+        if include_next and not completed:
+            next_question = (
+                Question.objects.filter(survey=survey)
+                .exclude(id__in=session.answers.values("question_id"))
+                .prefetch_related("answer_options")
+                .order_by("order")
+                .first()
+            )
+
+        # Счётчики опроса обновляются одним UPDATE, только когда меняются, и
+        # последним запросом транзакции: блокировка строки опроса держится
+        # лишь до COMMIT, а увеличение фиксируется вместе с ответом
+        counters = {}
+        if session_created:
+            counters["session_count"] = F("session_count") + 1
+        if completed:
+            counters["completed_count"] = F("completed_count") + 1
+        if counters:
+            Survey.objects.filter(id=survey.id).update(**counters)
+
+        if not include_next:
+            return answer
+
+        return {
+            "answer": answer,
+            "question": next_question,
+            "progress": {
+                "answered": answered_questions,
+                "total": total_questions,
+                "percentage": answered_questions / total_questions * 100,
+            },
+            "is_completed": completed,
+            "session": session,
+            "survey": survey,
+        }
@@ -0,0 +1,226 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.surveys.models import AnswerOption, Question, Survey
+from apps.surveys.ordering import park_orders
+
+
+class UpdateSurveyUseCase:
+    def __init__(self, author, survey_id):
+        self.author = author
+        self.survey_id = survey_id
+
+    @transaction.atomic
+    def execute(self, fields, questions_data=None):
+        """
+        Обновляет опрос, сравнивая переданные вопросы и варианты с сохранёнными.
+
+        Выполняет только необходимые массовые вставки, обновления и удаления.
+        Если questions_data равно None, вопросы не затрагиваются; вопрос без
+        ключа answer_options сохраняет свои варианты без изменений. При
+        частичном обновлении (PATCH) существующий вопрос или вариант без text
+        или order сохраняет свои значения, а новый элемент без text
+        отклоняется.
+        """
+        try:
+            survey = Survey.objects.select_for_update().get(id=self.survey_id)
+        except Survey.DoesNotExist:
+            raise ValueError("Опрос не существует.")
+
+        # Проверяем права автора
+        if survey.author_id != self.author.id:
+            raise PermissionError("Только автор опроса может изменять его.")
+
+        changed_fields = {
+            name: value
+            for name, value in fields.items()
+            if getattr(survey, name) != value
+        }
+
+        definition_changed = False
+        if questions_data is not None:
+            definition_changed = self._sync_questions(survey, questions_data)
+
+        if not changed_fields and not definition_changed:
+            return survey
+
+        if definition_changed:
+            # После синхронизации вопросы опроса - ровно переданный список
+            changed_fields["question_count"] = len(questions_data)
+
+        # Одним UPDATE записываем поля опроса и увеличиваем ревизию, чтобы
+        # кэши, завязанные на неё, инвалидировались ровно один раз
+        Survey.objects.filter(id=survey.id).update(
+            revision=F("revision") + 1,
+            updated_at=timezone.now(),
+            **changed_fields,
+        )
+        survey.refresh_from_db()
+        return survey
+
+    def _sync_questions(self, survey, questions_data):
+        """Приводит вопросы опроса к переданному списку. Возвращает True при изменениях."""
+        existing_questions = {
+            question.id: question
+            for question in Question.objects.filter(survey=survey).only(
+                "id", "text", "order"
+            )
+        }
+
+        submitted_ids = {data["id"] for data in questions_data if "id" in data}
+        unknown_ids = submitted_ids - existing_questions.keys()
+        if unknown_ids:
+            raise ValueError(
+                f"Вопросы {sorted(unknown_ids)} не принадлежат этому опросу."
+            )
+
+        changed = False
+
+        # Удаляем вопросы, отсутствующие в запросе
+        removed_ids = existing_questions.keys() - submitted_ids
+        if removed_ids:
+            Question.objects.filter(id__in=removed_ids).delete()
+            changed = True
+
+        question_orders = [
+            resolved_order(data, existing_questions.get(data.get("id")))
+            for data in questions_data
+        ]
+        validate_orders(question_orders, "вопросов")
+
+        questions_to_create = []
+        questions_to_update = []
+        moved_question_ids = []
+        # Пары (вопрос, данные вариантов) для вопросов с переданными answer_options
+        options_to_sync = []
+
+        for data, order in zip(questions_data, question_orders):
+            question = existing_questions.get(data.get("id"))
+
+            if question is None:
+                question = Question(
+                    survey=survey, text=required_text(data, "вопроса"), order=order
+                )
+                questions_to_create.append(question)
+            elif (
+                question.text != data.get("text", question.text)
+                or question.order != order
+            ):
+                if question.order != order:
+                    moved_question_ids.append(question.id)
+                question.text = data.get("text", question.text)
+                question.order = order
+                questions_to_update.append(question)
+
+            if "answer_options" in data:
+                options_to_sync.append((question, data["answer_options"]))
+
+        # Загружаем существующие варианты одним запросом
+        existing_question_ids = [
+            question.id for question, _ in options_to_sync if question.pk is not None
+        ]
+        existing_options = {}
+        for option in AnswerOption.objects.filter(
+            question_id__in=existing_question_ids
+        ).only("id", "question", "text", "order"):
+            existing_options.setdefault(option.question_id, {})[option.id] = option
+
+        options_to_create = []
+        options_to_update = []
+        moved_option_ids = []
+        removed_option_ids = []
+
+        for question, options_data in options_to_sync:
+            stored = existing_options.get(question.pk, {})
+            submitted_option_ids = {data["id"] for data in options_data if "id" in data}
+            unknown_ids = submitted_option_ids - stored.keys()
+            if unknown_ids:
+                raise ValueError(
+                    f"Варианты ответа {sorted(unknown_ids)} не принадлежат вопросу."
+                )
+
+            removed_option_ids.extend(stored.keys() - submitted_option_ids)
+
+            option_orders = [
+                resolved_order(data, stored.get(data.get("id")))
+                for data in options_data
+            ]
+            validate_orders(option_orders, "вариантов ответа")
+
+            for data, order in zip(options_data, option_orders):
+                option = stored.get(data.get("id"))
+
+                if option is None:
+                    options_to_create.append(
+                        AnswerOption(
+                            question=question,
+                            text=required_text(data, "варианта ответа"),
+                            order=order,
+                        )
+                    )
+                elif (
+                    option.text != data.get("text", option.text)
+                    or option.order != order
+                ):
+                    if option.order != order:
+                        moved_option_ids.append(option.id)
+                    option.text = data.get("text", option.text)
+                    option.order = order
+                    options_to_update.append(option)
+
+        if removed_option_ids:
+            AnswerOption.objects.filter(id__in=removed_option_ids).delete()
+
+        # Освобождаем целевые позиции перед вставкой новых строк
+        park_orders(
+            Question.objects.filter(survey=survey),
+            moved_question_ids,
+            question_orders,
+        )
+        park_orders(
+            AnswerOption.objects.filter(question_id__in=existing_question_ids),
+            moved_option_ids,
+            [option.order for option in options_to_update + options_to_create],
+        )
+
+        if questions_to_create:
+            Question.objects.bulk_create(questions_to_create)
+        if questions_to_update:
+            Question.objects.bulk_update(questions_to_update, ["text", "order"])
+
+        if options_to_create:
+            # question_id новых вопросов подставляется из уже сохранённых объектов
+            AnswerOption.objects.bulk_create(options_to_create)
+        if options_to_update:
+            AnswerOption.objects.bulk_update(options_to_update, ["text", "order"])
+
+        return changed or any(
+            [
+                questions_to_create,
+                questions_to_update,
+                options_to_create,
+                options_to_update,
+                removed_option_ids,
+            ]
+        )
+
+
+def required_text(data, name):
+    """Текст нового элемента: при PATCH вложенные поля необязательны."""
+    if "text" not in data:
+        raise ValueError(f"Для нового {name} необходимо поле text.")
+    return data["text"]
+
+
+def resolved_order(data, stored):
+    """order элемента: при PATCH без order существующий элемент сохраняет свой."""
+    if stored is None:
+        return data.get("order", 0)
+    return data.get("order", stored.order)
+
+
+def validate_orders(orders, name):
+    """Итоговые значения order элементов одной области не должны повторяться."""
+    if len(orders) != len(set(orders)):
+        raise ValueError(f"Значения order {name} не должны повторяться.")
@@ -0,0 +1,146 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import signing
+from rest_framework.authentication import (
+    BaseAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.exceptions import AuthenticationFailed
+
+from apps.core.metrics import record_cache
+from apps.users.tokens import current_epoch, read_access_token, token_user
+
+
+class TokenCache:
+    """
+    Ограниченный LRU-кеш «токен -> (пользователь, токен)» с TTL в памяти процесса.
+
+    Хранит снимки объектов и отдаёт их копии, чтобы изменения request.user
+    в одном запросе не попадали в другие. Инвалидация действует только в
+    текущем процессе; в остальных запись устаревает по TTL.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.keys_by_user = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, user, token = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+
+        user = copy.copy(user)
+        token = copy.copy(token)
+        token.user = user
+        return user, token
+
+    def set(self, key, user, token):
+        snapshot_user = copy.copy(user)
+        snapshot_token = copy.copy(token)
+        snapshot_token.user = snapshot_user
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (
+                time.monotonic() + self.ttl,
+                snapshot_user,
+                snapshot_token,
+            )
+            self.keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self.entries) > self.max_size:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate_user(self, user_id):
+        """Удаляет все токены пользователя из кеша."""
+        with self.lock:
+            for key in list(self.keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_user.clear()
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self.keys_by_user.get(entry[1].pk)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_user[entry[1].pk]
+
+
+token_cache = TokenCache(
+    settings.TOKEN_AUTH_CACHE["MAX_SIZE"], settings.TOKEN_AUTH_CACHE["TTL"]
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, кеширующая результат проверки токена.
+
+    Повторные запросы с тем же токеном в течение TTL не обращаются к базе.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        record_cache("auth_token", cached is not None)
+        if cached is not None:
+            return cached
+
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token)
+        return user, token
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Аутентификация подписанным токеном доступа: «Authorization: Bearer <token>».
+
+    Подпись и срок действия проверяются без базы, эпоха отзыва берётся из
+    кеша apps.users.tokens.epoch_cache. request.user - пользователь с
+    отложенными полями, кроме id и is_author.
+    """
+
+    keyword = "Bearer"
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed("Неверный заголовок авторизации.")
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed("Неверный заголовок авторизации.")
+        return self.authenticate_credentials(token)
+
+    def authenticate_credentials(self, token):
+        try:
+            user_id, is_author, epoch = read_access_token(token)
+        except (signing.BadSignature, ValueError, TypeError):
+            raise AuthenticationFailed("Недействительный или просроченный токен.")
+
+        current, is_active = current_epoch(user_id)
+        if not is_active or current != epoch:
+            raise AuthenticationFailed("Токен отозван.")
+        return token_user(user_id, is_author, epoch), token
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,168 @@
+import asyncio
+import fcntl
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework.exceptions import APIException
+
+from apps.core.metrics import (
+    PASSWORD_HASHING_DURATION,
+    PASSWORD_HASHING_REJECTED,
+    PASSWORD_HASHING_WAIT,
+)
+
+
+class HashingPoolBusy(APIException):
+    """Очередь пула хеширования переполнена; клиенту стоит повторить позже."""
+
+    status_code = 503
+    default_detail = "Сервер перегружен входами, повторите запрос позже."
+    default_code = "hashing_pool_busy"
+
+    def __init__(self, wait):
+        super().__init__()
+        # DRF выставляет по этому атрибуту заголовок Retry-After
+        self.wait = wait
+
+
+class HashingPool:
+    """
+    Ограниченный пул потоков для хеширования паролей.
+
+    hashlib.pbkdf2_hmac отпускает GIL, поэтому хеши считаются параллельно, а
+    WORKERS ограничивает долю CPU, которую может занять всплеск входов.
+    Одновременно ждут или выполняются не более MAX_PENDING операций,
+    остальные сразу отклоняются HashingPoolBusy вместо ожидания в очереди.
+
+    Предел общий для всех процессов, открывших файл path: каждая операция
+    держит блокировку одного байта файла (слота), а блокировки fcntl
+    снимаются ядром и при падении процесса. Без path предел действует только
+    внутри процесса.
+    """
+
+    def __init__(self, workers, max_pending, retry_after, path=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.path = path
+        self.file = None
+        self.reset()
+
+    def acquire(self):
+        """Занимает свободный слот и возвращает его номер или None."""
+        with self.lock:
+            for slot in range(self.max_pending):
+                # Блокировки fcntl принадлежат процессу, поэтому слоты,
+                # занятые потоками этого процесса, учитываются отдельно
+                if slot in self.held:
+                    continue
+                if self.path is not None:
+                    if self.file is None:
+                        self.file = open(self.path, "ab")
+                    try:
+                        fcntl.lockf(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, slot)
+                    except OSError:
+                        continue
+                self.held.add(slot)
+                return slot
+        return None
+
+    def release(self, slot):
+        with self.lock:
+            if self.path is not None:
+                fcntl.lockf(self.file, fcntl.LOCK_UN, 1, slot)
+            self.held.discard(slot)
+
+    def submit(self, operation, function, *args):
+        """Ставит операцию в очередь и возвращает concurrent.futures.Future."""
+        slot = self.acquire()
+        if slot is None:
+            PASSWORD_HASHING_REJECTED.labels(operation).inc()
+            raise HashingPoolBusy(self.retry_after)
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="password-hashing"
+                )
+        queued = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            PASSWORD_HASHING_WAIT.labels(operation).observe(started - queued)
+            try:
+                return function(*args)
+            finally:
+                PASSWORD_HASHING_DURATION.labels(operation).observe(
+                    time.perf_counter() - started
+                )
+                self.release(slot)
+
+        return self.executor.submit(task)
+
+    def run(self, operation, function, *args):
+        """Выполняет операцию в пуле, блокируя вызывающий поток до результата."""
+        return self.submit(operation, function, *args).result()
+
+    async def arun(self, operation, function, *args):
+        """Выполняет операцию в пуле, не занимая цикл событий."""
+        return await asyncio.wrap_future(self.submit(operation, function, *args))
+
+    def reset(self):
+        # Потоки пула и блокировки слотов не переживают fork: дочерний процесс
+        # создаёт свой пул и открывает файл слотов заново
+        self.lock = threading.Lock()
+        self.executor = None
+        self.held = set()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+hashing_pool = HashingPool(
+    settings.PASSWORD_HASHING["WORKERS"],
+    settings.PASSWORD_HASHING["MAX_PENDING"],
+    settings.PASSWORD_HASHING["RETRY_AFTER"],
+    settings.PASSWORD_HASHING["SLOTS_FILE"],
+)
+os.register_at_fork(after_in_child=hashing_pool.reset)
+
+
+def verify_password(raw_password, encoded):
+    """
+    Проверяет пароль по хешу.
+
+    Возвращает (верен, новый хеш), где новый хеш не None, если хеш устарел
+    (сменился алгоритм или число итераций) и его нужно сохранить.
+    """
+    upgraded = []
+    valid = hashers.check_password(
+        raw_password,
+        encoded,
+        setter=lambda raw: upgraded.append(hashers.make_password(raw)),
+    )
+    return valid, upgraded[0] if upgraded else None
+
+
+def check_user_password(user, raw_password):
+    """
+    User.check_password в пуле хеширования для эндпоинтов API.
+
+    Модель считает хеши в потоке вызывающего, поэтому админка и команды
+    управления не зависят от пула и не получают HashingPoolBusy.
+    """
+    valid, upgraded = hashing_pool.run(
+        "check_password", verify_password, raw_password, user.password
+    )
+    if upgraded is not None:
+        user.password = upgraded
+        user.save(update_fields=["password"])
+    return valid
+
+
+def make_user_password(raw_password):
+    """Хеш пароля, посчитанный в пуле хеширования."""
+    return hashing_pool.run("make_password", hashers.make_password, raw_password)
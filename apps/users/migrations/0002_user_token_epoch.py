@@ -0,0 +1,22 @@
+# Generated by Django 5.1.3 on 2026-10-19 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="token_epoch",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Увеличивается при выходе и смене пароля, отзывая подписанные токены",
+                verbose_name="Token Epoch",
+            ),
+        ),
+    ]
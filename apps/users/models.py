@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from apps.users.tokens import epoch_cache
+
 
 class User(AbstractUser):
     """
@@ -11,6 +13,11 @@ class User(AbstractUser):
         default=False,
         verbose_name="Is Author",
     )
+    token_epoch = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Token Epoch",
+        help_text="Увеличивается при выходе и смене пароля, отзывая подписанные токены",
+    )
 
     class Meta:
         db_table = "users"
@@ -21,5 +28,39 @@ class User(AbstractUser):
             models.Index(fields=["email"]),
         ]
 
+    # Поля, которые подписанный токен доступа переносит как утверждения
+    TOKEN_CLAIM_FIELDS = ("is_author", "is_active")
+
     def __str__(self):
         return self.username
+
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет пользователя; смена is_author или is_active увеличивает
+        token_epoch, и выданные подписанные токены с прежними утверждениями
+        перестают приниматься. Массовый QuerySet.update эпоху не меняет.
+        """
+        update_fields = kwargs.get("update_fields")
+        claims = set(self.TOKEN_CLAIM_FIELDS) - self.get_deferred_fields()
+        if update_fields is not None:
+            claims &= set(update_fields)
+
+        revoked = False
+        if claims and not self._state.adding:
+            stored = (
+                type(self)
+                .objects.filter(pk=self.pk)
+                .values(*claims, "token_epoch")
+                .first()
+            )
+            if stored is not None and any(
+                stored[name] != getattr(self, name) for name in claims
+            ):
+                self.token_epoch = stored["token_epoch"] + 1
+                if update_fields is not None:
+                    kwargs["update_fields"] = {*update_fields, "token_epoch"}
+                revoked = True
+
+        super().save(*args, **kwargs)
+        if revoked:
+            epoch_cache.invalidate(self.pk)
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import router
+from django.db.models import F
+
+from apps.core.metrics import record_cache
+
+ACCESS_SALT = "apps.users.tokens.access"
+REFRESH_SALT = "apps.users.tokens.refresh"
+
+
+class EpochCache:
+    """
+    Ограниченный LRU-кеш «пользователь -> (эпоха токенов, активен)» с TTL.
+
+    Отзыв токенов через эпоху виден другим процессам не позже чем через TTL.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user_id, state):
+        with self.lock:
+            self.entries.pop(user_id, None)
+            self.entries[user_id] = (time.monotonic() + self.ttl, state)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+epoch_cache = EpochCache(
+    settings.SIGNED_TOKENS["EPOCH_CACHE_SIZE"],
+    settings.SIGNED_TOKENS["EPOCH_CACHE_TTL"],
+)
+
+
+def issue_tokens(user):
+    """
+    Выдаёт пару подписанных токенов пользователя.
+
+    Токен доступа содержит id, is_author и эпоху и проверяется без обращения
+    к базе; токен обновления содержит id и эпоху и обменивается на новую пару.
+    """
+    return {
+        "access_token": signing.dumps(
+            [user.pk, int(user.is_author), user.token_epoch], salt=ACCESS_SALT
+        ),
+        "refresh_token": signing.dumps([user.pk, user.token_epoch], salt=REFRESH_SALT),
+        "expires_in": settings.SIGNED_TOKENS["ACCESS_TTL"],
+    }
+
+
+def read_access_token(token):
+    """
+    Возвращает (id, is_author, эпоха) токена доступа.
+
+    Бросает signing.BadSignature для поддельного или просроченного токена.
+    """
+    user_id, is_author, epoch = signing.loads(
+        token, salt=ACCESS_SALT, max_age=settings.SIGNED_TOKENS["ACCESS_TTL"]
+    )
+    return user_id, bool(is_author), epoch
+
+
+def read_refresh_token(token):
+    """Возвращает (id, эпоха) токена обновления или бросает signing.BadSignature."""
+    user_id, epoch = signing.loads(
+        token, salt=REFRESH_SALT, max_age=settings.SIGNED_TOKENS["REFRESH_TTL"]
+    )
+    return user_id, epoch
+
+
+def current_epoch(user_id):
+    """Возвращает (эпоха, активен) пользователя; (None, False), если его нет."""
+    state = epoch_cache.get(user_id)
+    record_cache("token_epoch", state is not None)
+    if state is None:
+        row = (
+            get_user_model()
+            .objects.filter(pk=user_id)
+            .values_list("token_epoch", "is_active")
+            .first()
+        )
+        state = row or (None, False)
+        epoch_cache.set(user_id, state)
+    return state
+
+
+def revoke_tokens(user):
+    """Отзывает все подписанные токены пользователя, увеличивая его эпоху."""
+    User = get_user_model()
+    User.objects.filter(pk=user.pk).update(token_epoch=F("token_epoch") + 1)
+    user.refresh_from_db(fields=["token_epoch"])
+    epoch_cache.invalidate(user.pk)
+
+
+def token_user(user_id, is_author, epoch):
+    """
+    Пользователь из утверждений токена доступа, без запроса к базе.
+
+    Остальные поля отложены: обращение к ним загружает поле из базы, поэтому
+    представления, которым нужен весь профиль, вызывают load_user.
+    """
+    User = get_user_model()
+    values = {
+        "id": user_id,
+        "is_active": True,
+        "is_author": is_author,
+        "token_epoch": epoch,
+    }
+    names = [
+        field.attname for field in User._meta.concrete_fields if field.attname in values
+    ]
+    return User.from_db(
+        router.db_for_read(User), names, [values[name] for name in names]
+    )
+
+
+def load_user(user):
+    """
+    Загружает отложенные поля пользователя одним запросом.
+
+    Утверждения токена (is_author, is_active, эпоха) перечитываются тоже:
+    иначе сохранение профиля записало бы в базу устаревшие права.
+    """
+    if not user.is_authenticated:
+        return
+    deferred = user.get_deferred_fields()
+    if deferred:
+        user.refresh_from_db(
+            fields=[*deferred, *user.TOKEN_CLAIM_FIELDS, "token_epoch"]
+        )
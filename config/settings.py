@@ -1,5 +1,6 @@
 import os
 import sys
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -30,20 +31,34 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "rest_framework",
     "rest_framework.authtoken",
+    "apps.core",
     "apps.users",
     "apps.surveys",
 ]
 
 MIDDLEWARE = [
+    "apps.core.middleware.MetricsMiddleware",
+    "apps.core.middleware.ProfilingMiddleware",
+    "apps.core.middleware.SlowQueryMiddleware",
+    "apps.core.middleware.TrafficCaptureMiddleware",
+    "apps.core.middleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    "apps.core.middleware.ApiExemptSessionMiddleware",
     "django.middleware.common.CommonMiddleware",
-    "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
-    "django.contrib.messages.middleware.MessageMiddleware",
-    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "apps.core.middleware.ApiExemptCsrfViewMiddleware",
+    "apps.core.middleware.ApiExemptAuthenticationMiddleware",
+    "apps.core.middleware.ApiExemptMessageMiddleware",
+    "apps.core.middleware.ApiExemptXFrameOptionsMiddleware",
 ]
 
+# Режим API: запросы с префиксом PATH_PREFIX проходят без middleware сессий,
+# CSRF, сообщений и X-Frame-Options, а вход по токену не создаёт сессию.
+# Аутентификация по сессии в API при этом недоступна.
+API_MODE = {
+    "ENABLED": os.getenv("API_MODE", "True") == "True",
+    "PATH_PREFIX": "/api/",
+}
+
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
@@ -116,6 +131,10 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# SQLite не поддерживает отложенные ограничения уникальности порядка вопросов;
+# там перестановка выполняется двухфазным сдвигом (apps.surveys.ordering)
+SILENCED_SYSTEM_CHECKS = ["models.W038"]
+
 AUTH_USER_MODEL = "users.User"
 
 REST_FRAMEWORK = {
@@ -128,7 +147,201 @@ REST_FRAMEWORK = {
         "rest_framework.parsers.JSONParser",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "apps.users.authentication.CachedTokenAuthentication",
+        "apps.users.authentication.SignedTokenAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
 }
+
+# Кеш проверки токенов (apps.users.authentication); после выхода или смены
+# пароля в других процессах токен действует не дольше TTL секунд
+TOKEN_AUTH_CACHE = {
+    "MAX_SIZE": int(os.getenv("TOKEN_AUTH_CACHE_SIZE", "10000")),
+    "TTL": float(os.getenv("TOKEN_AUTH_CACHE_TTL", "30")),
+}
+
+# Пул хеширования паролей (apps.users.hashing): число потоков в процессе,
+# предел ожидающих операций и значение Retry-After для отклонённых запросов.
+# Предел общий для всех воркеров, которые видят файл слотов SLOTS_FILE; с
+# синхронными воркерами gunicorn одновременно хешируется не больше паролей,
+# чем воркеров, и 503 возможен, только если MAX_PENDING меньше их числа
+PASSWORD_HASHING = {
+    "WORKERS": int(os.getenv("PASSWORD_HASHING_WORKERS", "2")),
+    "MAX_PENDING": int(os.getenv("PASSWORD_HASHING_MAX_PENDING", "32")),
+    "RETRY_AFTER": int(os.getenv("PASSWORD_HASHING_RETRY_AFTER", "1")),
+    "SLOTS_FILE": os.getenv(
+        "PASSWORD_HASHING_SLOTS_FILE",
+        os.path.join(
+            tempfile.gettempdir(),
+            (
+                f"password-hashing-{os.getpid()}.slots"
+                if "test" in sys.argv
+                else "password-hashing.slots"
+            ),
+        ),
+    ),
+}
+
+# Подписанные токены доступа (apps.users.tokens): время жизни в секундах и
+# кеш эпох отзыва, задающий задержку отзыва в других процессах
+SIGNED_TOKENS = {
+    "ACCESS_TTL": int(os.getenv("ACCESS_TOKEN_TTL", "900")),
+    "REFRESH_TTL": int(os.getenv("REFRESH_TOKEN_TTL", str(14 * 24 * 3600))),
+    "EPOCH_CACHE_SIZE": int(os.getenv("TOKEN_EPOCH_CACHE_SIZE", "10000")),
+    "EPOCH_CACHE_TTL": float(os.getenv("TOKEN_EPOCH_CACHE_TTL", "30")),
+}
+
+# Рендеринг list/retrieve/next-question без ModelSerializer (api.rendering);
+# построители кешируются по сериализатору и параметрам ?fields=/?expand=
+FAST_RENDERING = {
+    "ENABLED": os.getenv("FAST_RENDERING", "True") == "True",
+    "CACHE_SIZE": int(os.getenv("FAST_RENDERING_CACHE_SIZE", "256")),
+}
+
+# Опубликованные ответы retrieve активных опросов (api.surveys.artifacts);
+# ACCEL_REDIRECT - префикс internal-location nginx, отдающей файлы из DIR
+SURVEY_ARTIFACTS = {
+    "ENABLED": os.getenv("SURVEY_ARTIFACTS", "True") == "True",
+    "DIR": os.getenv(
+        "SURVEY_ARTIFACTS_DIR",
+        (
+            os.path.join(tempfile.gettempdir(), f"survey-artifacts-{os.getpid()}")
+            if "test" in sys.argv
+            else str(BASE_DIR / "artifacts")
+        ),
+    ),
+    "ACCEL_REDIRECT": os.getenv("SURVEY_ARTIFACTS_ACCEL_REDIRECT") or None,
+}
+
+# Cache-Control ответов с ETag (api.conditional) по действиям SurveyViewSet.
+# Определение опроса можно хранить в общем кеше перед приложением (ключ
+# учитывает Authorization), перепроверяя по If-None-Match через
+# SURVEY_DETAIL_MAX_AGE секунд
+HTTP_CACHING = {
+    "RETRIEVE": {
+        "public": True,
+        "max_age": int(os.getenv("SURVEY_DETAIL_MAX_AGE", "0")),
+        "must_revalidate": True,
+    },
+    "LIST": {"private": True, "no_cache": True},
+    "NEXT_QUESTION": {"private": True, "no_cache": True},
+}
+
+# Сжатие ответов API (apps.core.middleware.CompressionMiddleware): brotli (если
+# установлен пакет brotli) или gzip для тел от MIN_LENGTH байт. Уровни задаются
+# по имени маршрута, "default" - для остальных; сжатые тела ответов с ETag
+# кешируются в памяти процесса в пределах CACHE_MAX_BYTES
+COMPRESSION = {
+    "ENABLED": os.getenv("COMPRESSION", "True") == "True",
+    "PATH_PREFIX": "/api/",
+    "MIN_LENGTH": int(os.getenv("COMPRESSION_MIN_LENGTH", "1024")),
+    "LEVELS": {
+        "default": {"gzip": 6, "br": 4},
+        # Определение опроса не меняется до новой ревизии и сжимается один раз
+        "survey-detail": {"gzip": 9, "br": 9},
+        # Статистика считается заново на каждый запрос
+        "survey-statistics": {"gzip": 4, "br": 3},
+        "survey-versions-statistics": {"gzip": 4, "br": 3},
+    },
+    "CACHE_MAX_BYTES": int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(32 << 20))),
+    # Ответы с токенами не сжимаются: они повторяют данные из запроса, и
+    # длина сжатого тела выдавала бы токен (атака BREACH)
+    "SKIP_ENDPOINTS": {
+        "auth-login",
+        "auth-register",
+        "auth-refresh",
+        "auth-change-password",
+        "auth-async-login",
+        "auth-async-register",
+        "auth-async-change-password",
+    },
+}
+
+# Потоковая отдача статистики опроса (api.streaming): опросы от MIN_QUESTIONS
+# вопросов отдаются частями, не собирая весь ответ в памяти
+STATISTICS_STREAMING = {
+    "MIN_QUESTIONS": int(os.getenv("STATISTICS_STREAM_MIN_QUESTIONS", "500")),
+}
+
+# Профилирование запросов (apps.core.middleware.ProfilingMiddleware)
+REQUEST_PROFILING = {
+    "ENABLED": os.getenv("REQUEST_PROFILING", "True") == "True",
+    # Доля запросов, для которых сохраняется профиль cProfile
+    "SAMPLE_RATE": float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+    # Порог в мс для сохранения стеков медленных запросов; None - отключено
+    "SLOW_THRESHOLD_MS": (
+        float(os.getenv("PROFILE_SLOW_THRESHOLD_MS"))
+        if os.getenv("PROFILE_SLOW_THRESHOLD_MS")
+        else None
+    ),
+    "SAMPLER_INTERVAL_MS": float(os.getenv("PROFILE_SAMPLER_INTERVAL_MS", "5")),
+    "DIR": os.getenv("PROFILE_DIR", str(BASE_DIR / "profiles")),
+}
+
+# Метрики Prometheus (apps.core.metrics); каталог общий для всех воркеров.
+# /metrics отдаётся запросам с заголовком «Authorization: Bearer TOKEN» или
+# адресам из ALLOWED_IPS. По умолчанию оба способа выключены и /metrics
+# отвечает 403. REMOTE_ADDR за обратным прокси - адрес прокси, поэтому
+# запросы с X-Forwarded-For или Forwarded по адресу не пропускаются
+METRICS = {
+    "ENABLED": os.getenv("METRICS_ENABLED", "True") == "True",
+    "ALLOWED_IPS": [
+        address.strip()
+        for address in os.getenv("METRICS_ALLOWED_IPS", "").split(",")
+        if address.strip()
+    ],
+    "TOKEN": os.getenv("METRICS_TOKEN", ""),
+    "DIR": os.getenv(
+        "METRICS_DIR",
+        (
+            os.path.join(tempfile.gettempdir(), f"survey-metrics-{os.getpid()}")
+            if "test" in sys.argv
+            else str(BASE_DIR / "metrics")
+        ),
+    ),
+}
+
+# Журнал медленных SQL-запросов (apps.core.slow_queries)
+SLOW_QUERY_LOG = {
+    "ENABLED": os.getenv("SLOW_QUERY_LOG", "True") == "True",
+    "THRESHOLD_MS": float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100")),
+    "BUFFER_SIZE": int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "200")),
+    # Файл журнала, общий для всех воркеров
+    "FILE": os.getenv(
+        "SLOW_QUERY_LOG_FILE",
+        (
+            os.path.join(tempfile.gettempdir(), f"slow-queries-{os.getpid()}.jsonl")
+            if "test" in sys.argv
+            else str(BASE_DIR / "slow_queries.jsonl")
+        ),
+    ),
+    # EXPLAIN ANALYZE повторно выполняет запрос, поэтому планы семплируются
+    "EXPLAIN_SAMPLE_RATE": float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "1")),
+    "EXPLAIN_PER_MINUTE": int(os.getenv("SLOW_QUERY_EXPLAIN_PER_MINUTE", "10")),
+    "STACK_DEPTH": 15,
+}
+
+# Запись обезличенного трафика для replay_traffic (apps.core.traffic)
+TRAFFIC_CAPTURE = {
+    "ENABLED": os.getenv("TRAFFIC_CAPTURE", "False") == "True",
+    "DIR": os.getenv("TRAFFIC_CAPTURE_DIR", str(BASE_DIR / "traffic")),
+    "SAMPLE_RATE": float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "1")),
+    "PATH_PREFIX": "/api/",
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "apps.core.profiling": {
+            "handlers": ["console"],
+            "level": os.getenv(
+                "REQUEST_LOG_LEVEL", "WARNING" if "test" in sys.argv else "INFO"
+            ),
+            "propagate": False,
+        },
+    },
+}
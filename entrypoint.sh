@@ -23,5 +23,8 @@ if [ "$DJANGO_ENV" = "production" ]; then
   python manage.py collectstatic --noinput
 fi
 
+# Метрики прошлого запуска не должны суммироваться с текущими
+rm -rf "${METRICS_DIR:-/app/metrics}"
+
 echo "Запуск приложения..."
 exec "$@"